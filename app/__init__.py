@@ -1,5 +1,5 @@
-def init_app(argv=None):
+def init_app(argv=None, worker=0):
     # Import inside function to avoid circular imports
     from app.auth import init_app as _init_app
 
-    return _init_app(argv)
+    return _init_app(argv, worker=worker)
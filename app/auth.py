@@ -7,33 +7,67 @@ except ImportError:
 
 from aiohttp import web
 
+from app.docs import setup_docs
+from app.metrics import setup_metrics
 from app.middlewares import setup_middlewares
-from app.settings import dsn, redis_location
+from app.settings import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_STREAM_CHUNK_SIZE,
+    DOCS_ENABLED,
+    DOCS_SPEC_FILE,
+    EMAIL_FILTER_ENABLED,
+    EMAIL_FILTER_ERROR_RATE,
+    EMAIL_FILTER_MAX_BYTES,
+    EMAIL_FILTER_REBUILD_SECONDS,
+    HASH_EXECUTOR,
+    HASH_MAX_PENDING,
+    HASH_WORKERS,
+    LAST_LOGIN_BATCH_SIZE,
+    LAST_LOGIN_FLUSH_SECONDS,
+    LAST_LOGIN_MAX_PENDING,
+    METRICS_HOST,
+    METRICS_PORT,
+    RATE_LIMIT_LOCAL_SIZE,
+    RATE_LIMIT_PROXY_COUNT,
+    RATE_LIMITS,
+    REDIS_MAX_CONNECTIONS,
+    USER_CACHE_ENABLED,
+    USER_CACHE_LOCAL_SIZE,
+    USER_CACHE_LOCAL_TTL,
+    USER_CACHE_TTL,
+    dsn,
+    redis_location,
+)
 from backends.db import setup_db
+from backends.denylist import setup_token_denylist
+from backends.email_filter import setup_email_filter
+from backends.hashing import setup_hashing
+from backends.last_login import setup_last_login_buffer
+from backends.ratelimit import parse_rate_limits, setup_rate_limiter
 from backends.redis import setup_redis
+from backends.user_cache import setup_user_cache
 from routes.auth import setup_routes
 
 
-def init_app(argv=None):
+def init_app(argv=None, worker=0):
     app = web.Application()
 
     setup_routes(app)
+    # every worker process exposes its own metrics on the next port
+    setup_metrics(
+        app,
+        host=METRICS_HOST,
+        port=int(METRICS_PORT) + worker if METRICS_PORT else None,
+    )
 
-    # Only setup API documentation if aiohttp_apispec is available
-    try:
-        from aiohttp_apispec import setup_aiohttp_apispec
-
-        setup_aiohttp_apispec(
-            app=app,
-            title="Auth documentation",
-            version="v1",
-            url="/auth/v1/docs/swagger.json",
-            swagger_path="/auth/v1/docs",
-            static_path="/auth/static",
-        )
-    except ImportError:
-        # aiohttp-apispec not available (e.g. due to distutils removal in Python 3.14)
-        pass
+    # the spec is built ahead of time, workers only serve the file
+    if DOCS_ENABLED:
+        setup_docs(app, DOCS_SPEC_FILE)
 
     setup_middlewares(app)
 
@@ -43,7 +77,55 @@ def init_app(argv=None):
         if not dsn.startswith("postgresql+asyncpg://")
         else dsn
     )
-    setup_db(app, dsn=db_dsn)
-    setup_redis(app, redis_location=redis_location)
+    setup_db(
+        app,
+        dsn=db_dsn,
+        pool_options={
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        },
+    )
+    setup_redis(
+        app, redis_location=redis_location, max_connections=REDIS_MAX_CONNECTIONS
+    )
+    setup_token_denylist(app)
+    setup_hashing(
+        app,
+        kind=HASH_EXECUTOR,
+        max_workers=HASH_WORKERS,
+        max_pending=HASH_MAX_PENDING,
+    )
+    if RATE_LIMITS:
+        setup_rate_limiter(
+            app,
+            parse_rate_limits(RATE_LIMITS),
+            local_size=RATE_LIMIT_LOCAL_SIZE,
+            proxy_count=RATE_LIMIT_PROXY_COUNT,
+        )
+    if EMAIL_FILTER_ENABLED:
+        setup_email_filter(
+            app,
+            error_rate=EMAIL_FILTER_ERROR_RATE,
+            max_bytes=EMAIL_FILTER_MAX_BYTES,
+            rebuild_seconds=EMAIL_FILTER_REBUILD_SECONDS,
+            chunk_size=DB_STREAM_CHUNK_SIZE,
+        )
+    setup_last_login_buffer(
+        app,
+        flush_seconds=LAST_LOGIN_FLUSH_SECONDS,
+        batch_size=LAST_LOGIN_BATCH_SIZE,
+        max_pending=LAST_LOGIN_MAX_PENDING,
+    )
+    if USER_CACHE_ENABLED:
+        setup_user_cache(
+            app,
+            ttl=USER_CACHE_TTL,
+            local_size=USER_CACHE_LOCAL_SIZE,
+            local_ttl=USER_CACHE_LOCAL_TTL,
+        )
 
     return app
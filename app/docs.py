@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from aiohttp import web
+
+from views.docs import OpenAPISpecView, SwaggerUIView, swagger_ui_static
+
+DOCS_PREFIX = "/auth/v1/docs"
+
+
+def build_spec():
+    """OpenAPI document of every documented route, needs aiohttp-apispec"""
+    from aiohttp_apispec import AiohttpApiSpec
+
+    from routes.auth import setup_routes
+
+    app = web.Application()
+    setup_routes(app)
+    spec = AiohttpApiSpec(
+        url=None, app=app, in_place=True, title="Auth documentation", version="v1"
+    )
+    return spec.swagger_dict()
+
+
+def create_docs_app(spec_file):
+    docs_app = web.Application()
+    docs_app["docs_spec_file"] = Path(spec_file)
+    # spec and index page are read on first use, not at startup
+    docs_app["docs_cache"] = {}
+    docs_app.router.add_route("GET", "/swagger.json", OpenAPISpecView, name="docs_spec")
+    static = swagger_ui_static()
+    if static is not None:
+        docs_app["docs_static"] = static
+        docs_app.router.add_static("/static", static, name="docs_static")
+        docs_app.router.add_route("GET", "", SwaggerUIView, name="docs")
+    return docs_app
+
+
+def setup_docs(app, spec_file):
+    """Mounts Swagger UI and the prebuilt spec under /auth/v1/docs"""
+    app.add_subapp(DOCS_PREFIX, create_docs_app(spec_file))
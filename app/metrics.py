@@ -0,0 +1,32 @@
+from aiohttp import web
+
+from views.metrics import MetricsView
+
+
+async def start_metrics_server(app):
+    metrics_app = web.Application()
+    metrics_app.router.add_route("GET", "/metrics", MetricsView, name="metrics")
+    runner = web.AppRunner(metrics_app, access_log=None)
+    await runner.setup()
+    host, port = app["metrics_address"]
+    await web.TCPSite(runner, host, port).start()
+    app["metrics_runner"] = runner
+
+
+async def stop_metrics_server(app):
+    if "metrics_runner" in app:
+        await app["metrics_runner"].cleanup()
+
+
+def setup_metrics(app, host=None, port=None):
+    """Serves /metrics without authentication
+
+    With a port the endpoint gets its own listener (e.g. bound to an internal
+    interface only), otherwise it is added to the main router.
+    """
+    if port:
+        app["metrics_address"] = (host or "127.0.0.1", int(port))
+        app.on_startup.append(start_metrics_server)
+        app.on_cleanup.append(stop_metrics_server)
+    else:
+        app.router.add_route("GET", "/metrics", MetricsView, name="metrics")
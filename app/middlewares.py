@@ -1,26 +1,123 @@
+import hashlib
+import re
 from json import JSONDecodeError
+from time import perf_counter
 
 from aiohttp import web
 from aiohttp.web_middlewares import middleware
 from aiohttp_jwt import JWTMiddleware
 from pydantic import ValidationError as PydanticValidationError
 
-from app.settings import SECRET_KEY
-from helpers.errors import BadRequest, NotFound, UserIsNotActivated
+from app.settings import JWT_CACHE_SIZE
+from helpers.cache import ExpiringLRUCache
+from helpers.errors import (
+    BadRequest,
+    NotFound,
+    PreconditionFailed,
+    ServiceOverloaded,
+    TooManyRequests,
+    UserIsNotActivated,
+)
+from helpers.json_codec import json_response
+from helpers.jwt_keys import keyring
+from helpers.metrics import (
+    HTTP_REQUEST_DURATION,
+    HTTP_REQUESTS,
+    HTTP_REQUESTS_IN_PROGRESS,
+)
+from helpers.utils import get_data_from_request
 
 
 async def handle_http_error(request, e, status):
-    return web.json_response(
-        {"message": f"{type(e).__name__}: {str(e)}"}, status=status
+    return json_response({"message": f"{type(e).__name__}: {str(e)}"}, status=status)
+
+
+def is_revoked(request, claims):
+    # local copy of the Redis denylist, no round trip per request
+    denylist = request.app.get("token_denylist")
+    return denylist is not None and claims.get("jti") in denylist
+
+
+# one aiohttp_jwt middleware per verification key, picked by the token's kid
+jwt_verifiers = {
+    key.kid: JWTMiddleware(
+        secret_or_pub_key=key.pem,
+        request_property="user",
+        algorithms=[key.algorithm],
+        credentials_required=False,
+        is_revoked=is_revoked,
     )
+    for key in keyring.keys.values()
+}
+jwt_middleware = jwt_verifiers[keyring.default.kid]
 
+jwt_cache = ExpiringLRUCache(maxsize=JWT_CACHE_SIZE)
 
-jwt_middleware = JWTMiddleware(
-    secret_or_pub_key=SECRET_KEY,
-    request_property="user",
-    algorithms=["HS256"],
-    credentials_required=False,
-)
+
+def get_bearer_token(request):
+    # same header parsing as aiohttp_jwt, anything unusual is left to it
+    if request.method == "OPTIONS":
+        return None
+    header = request.headers.get("Authorization")
+    if header is None:
+        return None
+    try:
+        scheme, token = header.strip().split(" ")
+    except ValueError:
+        return None
+    if not re.match("Bearer", scheme):
+        return None
+    return token
+
+
+@middleware
+async def cached_jwt_middleware(request, handler):
+    """Skips signature verification for tokens already verified by jwt_middleware
+
+    Claims are cached under the token digest until the token's ``exp``,
+    misses and every failure path go through the aiohttp_jwt middleware of
+    the token's key unchanged.
+    """
+    token = get_bearer_token(request)
+    if token is None:
+        return await jwt_middleware(request, handler)
+
+    key = hashlib.sha256(token.encode()).digest()
+    claims = jwt_cache.get(key)
+    if claims is not None:
+        if is_revoked(request, claims):
+            raise web.HTTPForbidden(reason="Token is revoked")
+        request["user"] = dict(claims)
+        return await handler(request)
+
+    async def cache_claims(request):
+        claims = request.get("user")
+        if claims and "exp" in claims and "nbf" not in claims:
+            jwt_cache.set(key, dict(claims), claims["exp"])
+        return await handler(request)
+
+    verifier = jwt_verifiers[keyring.get_key(token).kid]
+    return await verifier(request, cache_claims)
+
+
+@middleware
+async def metrics_middleware(request, handler):
+    # unnamed routes are collapsed into one label to keep cardinality bounded
+    route = request.match_info.route.name or "unmatched"
+    HTTP_REQUESTS_IN_PROGRESS.inc(route)
+    start = perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        HTTP_REQUESTS_IN_PROGRESS.dec(route)
+        HTTP_REQUEST_DURATION.observe(perf_counter() - start, route, status)
+        HTTP_REQUESTS.inc(route, request.method, status)
 
 
 @middleware
@@ -35,10 +132,51 @@ async def error_middleware(request, handler):
         return await handle_http_error(request, e, status=403)
     except NotFound as e:
         return await handle_http_error(request, e, status=404)
+    except PreconditionFailed as e:
+        return await handle_http_error(request, e, status=412)
+    except TooManyRequests as e:
+        response = await handle_http_error(request, e, status=429)
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response
+    except ServiceOverloaded as e:
+        return await handle_http_error(request, e, status=503)
     except Exception as e:
         return await handle_http_error(request, e, status=500)
 
 
+async def get_request_email(request):
+    # the decoded body stays on the request, validate_request reuses it
+    try:
+        data = await get_data_from_request(request)
+        email = data.get("email")
+    except Exception:
+        return None
+    return email.strip().lower() if isinstance(email, str) else None
+
+
+@middleware
+async def rate_limit_middleware(request, handler):
+    limiter = request.app.get("rate_limiter")
+    route = request.match_info.route.name
+    if limiter is None or not limiter.applies(route) or request.method == "OPTIONS":
+        return await handler(request)
+
+    identities = {"ip": limiter.client_ip(request)}
+    if limiter.needs_email(route):
+        identities["email"] = await get_request_email(request)
+
+    retry_after = await limiter.check(route, identities)
+    if retry_after:
+        raise TooManyRequests(
+            f"Rate limit of {route} exceeded, retry in {retry_after} seconds",
+            retry_after,
+        )
+    return await handler(request)
+
+
 def setup_middlewares(app):
+    app.middlewares.append(metrics_middleware)
     app.middlewares.append(error_middleware)
-    app.middlewares.append(jwt_middleware)
+    app.middlewares.append(rate_limit_middleware)
+    # with JWT_CACHE_SIZE=0 nothing is cached, every token is verified
+    app.middlewares.append(cached_jwt_middleware)
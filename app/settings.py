@@ -5,14 +5,54 @@ BASE_PATH = pathlib.Path(__file__).parent.parent
 
 APP_PORT = env.get("APP_PORT", 8080)
 APP_HOST = env.get("APP_HOST", "0.0.0.0")
+# worker processes forked by main.py, DB/Redis/hashing pools are per worker
+APP_WORKERS = int(env.get("APP_WORKERS", 1))
 
 access_log_format = '%r %s %b %t "%a"'
 
+# Swagger UI under /auth/v1/docs, serving the spec built ahead of time with
+# python scripts/build_openapi.py
+DOCS_ENABLED = env.get("DOCS_ENABLED", "false").lower() in ("1", "true", "yes")
+DOCS_SPEC_FILE = pathlib.Path(env.get("DOCS_SPEC_FILE", BASE_PATH / "openapi.json"))
+
+# Prometheus /metrics, served on its own listener when METRICS_PORT is set,
+# otherwise on the main one
+METRICS_HOST = env.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = env.get("METRICS_PORT")
+
+# JSON encoder/decoder for requests and responses: "json" (stdlib), "orjson"
+# or any importable module with compatible dumps/loads
+JSON_CODEC = env.get("JSON_CODEC", "json")
+
 # Provide a default secret key for testing environments
 SECRET_KEY = env.get("SECRET_KEY", "test-secret-key-for-testing")
 JWT_EXP_ACCESS_SECONDS = env.get("JWT_EXP_ACCESS_SECONDS", 300)
 JWT_EXP_REFRESH_SECONDS = env.get("JWT_EXP_REFRESH_SECONDS", 86400)
 JWT_ALGORITHM = env.get("JWT_ALGORITHM", "HS256")
+# RS256/ES256/EdDSA sign with this PEM private key instead of SECRET_KEY,
+# its public key and JWT_PUBLIC_KEY_FILES (comma separated PEM files of
+# rotated out or upcoming keys) are served at /auth/v1/.well-known/jwks.json
+JWT_PRIVATE_KEY_FILE = env.get("JWT_PRIVATE_KEY_FILE")
+JWT_PUBLIC_KEY_FILES = [
+    path.strip()
+    for path in env.get("JWT_PUBLIC_KEY_FILES", "").split(",")
+    if path.strip()
+]
+JWKS_MAX_AGE = int(env.get("JWKS_MAX_AGE", 300))
+# tokens accepted by one POST /auth/v1/introspect call
+INTROSPECT_MAX_TOKENS = int(env.get("INTROSPECT_MAX_TOKENS", 100))
+# verified bearer token claims kept in process until the token expires, 0 disables
+JWT_CACHE_SIZE = int(env.get("JWT_CACHE_SIZE", 4096))
+
+# Stored password hashes are re-encoded on login when these change,
+# run scripts/calibrate_hasher.py to pick iterations for the hardware
+PASSWORD_HASHER = env.get("PASSWORD_HASHER", "pbkdf2_sha256")
+PASSWORD_HASH_ITERATIONS = int(env.get("PASSWORD_HASH_ITERATIONS", 260000))
+
+# Password hashing runs in a worker pool: "thread" (default) or "process"
+HASH_EXECUTOR = env.get("HASH_EXECUTOR", "thread")
+HASH_WORKERS = int(env["HASH_WORKERS"]) if env.get("HASH_WORKERS") else None
+HASH_MAX_PENDING = int(env.get("HASH_MAX_PENDING", 64))
 
 conf = {
     "engine": env.get("ENGINE", "postgresql+asyncpg"),  # Use asyncpg engine
@@ -28,5 +68,63 @@ dsn = (
     f"@{conf['host']}:{conf['port']}/{conf['database']}"
 )
 
+# connection pool of every worker process, see GET /auth/v1/stats/db for usage
+DB_POOL_SIZE = int(env.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(env.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = float(env.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(env.get("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = env.get("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+# asyncpg prepared statement cache, set to 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(env.get("DB_STATEMENT_CACHE_SIZE", 100))
+
+# GET /auth/v1/users keyset pagination and streamed responses
+USERS_PAGE_SIZE = int(env.get("USERS_PAGE_SIZE", 100))
+USERS_MAX_PAGE_SIZE = int(env.get("USERS_MAX_PAGE_SIZE", 1000))
+DB_STREAM_CHUNK_SIZE = int(env.get("DB_STREAM_CHUNK_SIZE", 1000))
+# POST /auth/v1/users/import lines hashed and copied to the database at a time
+USERS_IMPORT_BATCH_SIZE = int(env.get("USERS_IMPORT_BATCH_SIZE", 1000))
+
+# Bloom filter of registered emails, logins for unknown emails skip the database
+EMAIL_FILTER_ENABLED = env.get("EMAIL_FILTER_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+EMAIL_FILTER_ERROR_RATE = float(env.get("EMAIL_FILTER_ERROR_RATE", 0.001))
+EMAIL_FILTER_MAX_BYTES = int(env.get("EMAIL_FILTER_MAX_BYTES", 8 * 1024 * 1024))
+EMAIL_FILTER_REBUILD_SECONDS = int(env.get("EMAIL_FILTER_REBUILD_SECONDS", 3600))
+
+# Login columns of users read through an in-process LRU and Redis, every
+# write invalidates both
+USER_CACHE_ENABLED = env.get("USER_CACHE_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+USER_CACHE_TTL = int(env.get("USER_CACHE_TTL", 300))
+USER_CACHE_LOCAL_SIZE = int(env.get("USER_CACHE_LOCAL_SIZE", 1024))
+USER_CACHE_LOCAL_TTL = float(env.get("USER_CACHE_LOCAL_TTL", 5))
+
+# last_login is written behind logins, every LAST_LOGIN_FLUSH_SECONDS or once
+# LAST_LOGIN_BATCH_SIZE users logged in, at most LAST_LOGIN_MAX_PENDING users
+# wait for a write in each worker
+LAST_LOGIN_FLUSH_SECONDS = float(env.get("LAST_LOGIN_FLUSH_SECONDS", 5))
+LAST_LOGIN_BATCH_SIZE = int(env.get("LAST_LOGIN_BATCH_SIZE", 1000))
+LAST_LOGIN_MAX_PENDING = int(env.get("LAST_LOGIN_MAX_PENDING", 100000))
+
+# Sliding window rate limits per route name, "route:scope=limit/seconds" entries
+# separated by commas, scope is "ip" or "email". Counters live in Redis, an
+# in-process token bucket per key rejects floods before the Redis call.
+RATE_LIMITS = env.get(
+    "RATE_LIMITS",
+    "login:ip=30/60,login:email=10/300,register:ip=10/3600,refresh:ip=60/60",
+)
+RATE_LIMIT_LOCAL_SIZE = int(env.get("RATE_LIMIT_LOCAL_SIZE", 10000))
+# reverse proxies in front of the app, the client IP is then taken from
+# X-Forwarded-For
+RATE_LIMIT_PROXY_COUNT = int(env.get("RATE_LIMIT_PROXY_COUNT", 0))
 
 redis_location = env.get("REDIS_LOCATION")
+REDIS_MAX_CONNECTIONS = (
+    int(env["REDIS_MAX_CONNECTIONS"]) if env.get("REDIS_MAX_CONNECTIONS") else None
+)
@@ -0,0 +1,78 @@
+import logging
+import os
+import signal
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Supervisor:
+    """Pre-forks ``workers`` processes running ``target(index)`` and keeps them up
+
+    Workers are forked before any event loop or connection pool exists, so
+    every worker builds its own. SIGTERM/SIGINT are forwarded to the workers
+    as SIGTERM, which aiohttp turns into a graceful shutdown.
+    """
+
+    def __init__(self, workers, target, restart_delay=1.0):
+        self.workers = workers
+        self.target = target
+        self.restart_delay = restart_delay
+        self.children = {}
+        self.stopping = False
+
+    def spawn(self, index):
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                self.target(index)
+            except BaseException:
+                logger.exception("worker %d crashed", index)
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = (index, time.monotonic())
+        logger.info("started worker %d with pid %d", index, pid)
+
+    def terminate(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.terminate)
+        signal.signal(signal.SIGINT, self.terminate)
+
+        for index in range(self.workers):
+            self.spawn(index)
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            if pid not in self.children:
+                continue
+
+            index, started = self.children.pop(pid)
+            if self.stopping:
+                logger.info("worker %d with pid %d stopped", index, pid)
+                continue
+
+            logger.warning(
+                "worker %d with pid %d exited with status %d, restarting",
+                index,
+                pid,
+                os.waitstatus_to_exitcode(status),
+            )
+            # don't spin when a worker dies right after start
+            if time.monotonic() - started < self.restart_delay:
+                time.sleep(self.restart_delay)
+            if not self.stopping:
+                self.spawn(index)
@@ -1,12 +1,121 @@
-from sqlalchemy import insert, select
+import logging
+from time import perf_counter
+from typing import NamedTuple
+
+from sqlalchemy import (
+    Delete,
+    Integer,
+    Select,
+    Update,
+    bindparam,
+    column,
+    delete,
+    event,
+    func,
+    insert,
+    make_url,
+    or_,
+    select,
+    update,
+    values,
+)
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from helpers.errors import BadRequest, RecordNotFound, UserAlreadyExists
+from helpers.metrics import DB_QUERY_DURATION
+
+
+class PoolStatsMixin:
+    """Records how long callers wait to check a connection out of the pool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.overflow_peak = 0
+
+    def connect(self):
+        start = perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        wait = perf_counter() - start
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.overflow_peak = max(self.overflow_peak, self.overflow())
+        return connection
+
+    def stats(self):
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(0, self.overflow()),
+            "overflow_peak": self.overflow_peak,
+            "max_overflow": self._max_overflow,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": self.wait_total / self.checkouts * 1000
+            if self.checkouts
+            else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+
+
+class InstrumentedQueuePool(PoolStatsMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+# pool loggers are named after the pool class, keep this one as quiet as
+# SQLAlchemy keeps its own ones
+logging.getLogger(f"{__name__}.{InstrumentedQueuePool.__name__}").setLevel(
+    logging.WARNING
+)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info["query_start"].pop()
+    DB_QUERY_DURATION.observe(elapsed, statement.lstrip().split(None, 1)[0].upper())
+
+
+def handle_error(context):
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+
+def observe_queries(engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
 
 
 async def init_pg(app):
-    engine = create_async_engine(app["dsn"], pool_size=10, max_overflow=20)
+    options = dict(app["db_pool_options"])
+    statement_cache_size = options.pop("statement_cache_size", None)
+    dsn = make_url(app["dsn"])
+    connect_args = {}
+    if statement_cache_size is not None:
+        # both asyncpg's own cache and the one of the SQLAlchemy dialect
+        connect_args["statement_cache_size"] = statement_cache_size
+        dsn = dsn.update_query_dict(
+            {"prepared_statement_cache_size": str(statement_cache_size)}
+        )
+    engine = create_async_engine(
+        dsn, poolclass=InstrumentedQueuePool, connect_args=connect_args, **options
+    )
+    observe_queries(engine.sync_engine)
     app["engine"] = engine
     app["db_session"] = async_sessionmaker(engine, expire_on_commit=False)
 
@@ -16,12 +125,21 @@ async def close_pg(app):
         await app["engine"].dispose()
 
 
-def setup_db(app, dsn):
+def setup_db(app, dsn, pool_options=None):
     app["dsn"] = dsn
+    app["db_pool_options"] = {
+        "pool_size": 10,
+        "max_overflow": 20,
+        **(pool_options or {}),
+    }
     app.on_startup.append(init_pg)
     app.on_cleanup.append(close_pg)
 
 
+def get_pool_stats(engine):
+    return engine.pool.stats()
+
+
 async def create_user(session, obj, values):
     try:
         stmt = insert(obj).values(**values).returning(*obj.__table__.columns)
@@ -34,22 +152,58 @@ async def create_user(session, obj, values):
         raise UserAlreadyExists("User with this email already exists") from e
 
 
-async def get_user_by_email(session, obj, email):
-    stmt = select(obj).where(obj.email == email)
-    result = await session.execute(stmt)
-    record = result.scalar_one_or_none()
+async def get_user_by_email(session, obj, email, columns=None):
+    if columns:
+        # Core select of the given columns, returns a lightweight Row
+        stmt = select(*columns).where(obj.email == email)
+        result = await session.execute(stmt)
+        record = result.first()
+    else:
+        stmt = select(obj).where(obj.email == email)
+        result = await session.execute(stmt)
+        record = result.scalar_one_or_none()
     if not record:
         raise RecordNotFound(f"{obj.__name__} with email={email} is not found")
     return record
 
 
-async def get_objects(session, obj):
-    stmt = select(obj)
+def keyset_query(obj, after=None, limit=None, columns=None, filters=()):
+    stmt = select(*columns) if columns else select(obj)
+    stmt = stmt.order_by(obj.id)
+    if after is not None:
+        stmt = stmt.where(obj.id > after)
+    if filters:
+        stmt = stmt.where(*filters)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+async def get_objects(session, obj, after=None, limit=None, columns=None):
+    stmt = keyset_query(obj, after=after, limit=limit, columns=columns)
     result = await session.execute(stmt)
-    records = result.scalars().all()
+    records = result.all() if columns else result.scalars().all()
     return records
 
 
+async def count_objects(session, obj):
+    return await session.scalar(select(func.count()).select_from(obj))
+
+
+async def stream_objects(
+    session, obj, after=None, limit=None, columns=None, chunk_size=1000, filters=()
+):
+    # server-side cursor, only ``chunk_size`` rows are held in memory at a time
+    stmt = keyset_query(obj, after=after, limit=limit, columns=columns, filters=filters)
+    stmt = stmt.execution_options(yield_per=chunk_size)
+    if columns:
+        result = await session.stream(stmt)
+    else:
+        result = await session.stream_scalars(stmt)
+    async for record in result:
+        yield record
+
+
 async def insert_object(session, obj, values):
     try:
         stmt = insert(obj).values(**values).returning(*obj.__table__.columns)
@@ -60,3 +214,110 @@ async def insert_object(session, obj, values):
     except Exception as e:
         await session.rollback()
         raise BadRequest(str(e)) from e
+
+
+async def update_latest_values(session, obj, attribute, rows):
+    """Sets ``attribute`` of many rows in one ``UPDATE ... FROM (VALUES ...)``
+
+    ``rows`` are ``(id, value)`` pairs, stored values that are already newer
+    are kept, so batches from several workers can land in any order.
+    """
+    target = obj.__table__.c[attribute]
+    new_values = values(
+        column("id", Integer), column("value", target.type), name="new_values"
+    ).data(list(rows))
+    stmt = (
+        update(obj)
+        .where(obj.id == new_values.c.id)
+        .where(or_(target.is_(None), target < new_values.c.value))
+        .values({attribute: new_values.c.value})
+        .execution_options(synchronize_session=False)
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.rowcount
+
+
+async def copy_insert_objects(session, obj, columns, records, conflict, returning):
+    """Loads ``records`` with COPY and inserts the ones that don't conflict
+
+    Rows go through a temporary table, so a duplicate ``conflict`` key is
+    skipped instead of failing the whole batch. Returns the ``returning``
+    columns of the inserted rows. Needs the asyncpg driver.
+    """
+    table = f'"{obj.__table__.name}"'
+    temp = f"{obj.__table__.name}_import"
+    names = ", ".join(f'"{column}"' for column in columns)
+    connection = await session.connection()
+    driver = (await connection.get_raw_connection()).driver_connection
+    async with driver.transaction():
+        await driver.execute(
+            f"CREATE TEMPORARY TABLE {temp} ON COMMIT DROP AS "
+            f"SELECT {names} FROM {table} WITH NO DATA"
+        )
+        await driver.copy_records_to_table(temp, records=records, columns=columns)
+        return await driver.fetch(
+            f"INSERT INTO {table} ({names}) SELECT {names} FROM {temp} "
+            f'ON CONFLICT ("{conflict}") DO NOTHING '
+            f"RETURNING {', '.join(returning)}"
+        )
+
+
+async def update_object(session, obj, object_id, values):
+    try:
+        stmt = update(obj).where(obj.id == object_id).values(**values)
+        await session.execute(stmt)
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        raise BadRequest(str(e)) from e
+
+
+class PrimaryKeyStatements(NamedTuple):
+    select: Select
+    select_for_update: Select
+    update: Update
+    delete: Delete
+
+
+def primary_key_statements(obj, columns):
+    """Statements on one row by its ``pk`` parameter, built once and reused
+
+    The update sets the columns named by the other parameters it is executed
+    with and returns ``columns`` like the selects.
+    """
+    pk = bindparam("pk")
+    return PrimaryKeyStatements(
+        select=select(*columns).where(obj.id == pk),
+        select_for_update=select(*columns).where(obj.id == pk).with_for_update(),
+        update=update(obj).where(obj.id == pk).returning(*columns),
+        delete=delete(obj).where(obj.id == pk),
+    )
+
+
+async def get_object_by_pk(session, obj, statement, pk):
+    result = await session.execute(statement, {"pk": pk})
+    record = result.first()
+    if not record:
+        raise RecordNotFound(f"{obj.__name__} with id={pk} is not found")
+    return record
+
+
+async def update_object_by_pk(session, obj, statement, pk, values):
+    try:
+        result = await session.execute(statement, {**values, "pk": pk})
+        record = result.first()
+        await session.commit()
+    except IntegrityError as e:
+        await session.rollback()
+        raise UserAlreadyExists("User with this email already exists") from e
+    if not record:
+        raise RecordNotFound(f"{obj.__name__} with id={pk} is not found")
+    return record
+
+
+async def delete_object_by_pk(session, obj, statement, pk):
+    result = await session.execute(statement, {"pk": pk})
+    await session.commit()
+    if not result.rowcount:
+        raise RecordNotFound(f"{obj.__name__} with id={pk} is not found")
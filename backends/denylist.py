@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from time import time
+
+from backends.redis import REVOKED_TOKENS_CHANNEL, load_revoked_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class TokenDenylist:
+    """In-process copy of the revoked access token jtis
+
+    Entries are dropped once the token has expired, a revoked token can't be
+    used after that anyway. Membership checks never leave the process.
+    """
+
+    def __init__(self):
+        self._tokens = {}
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def __contains__(self, jti):
+        exp = self._tokens.get(jti)
+        return exp is not None and exp > time()
+
+    def add(self, jti, exp):
+        self._tokens[jti] = exp
+
+    def update(self, tokens):
+        self._tokens.update(tokens)
+
+    def purge(self, now=None):
+        now = time() if now is None else now
+        self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+
+
+def parse_revocation(data):
+    if isinstance(data, bytes):
+        data = data.decode()
+    jti, exp = data.split(" ")
+    return jti, int(exp)
+
+
+async def sync_token_denylist(app, retry_delay=1.0):
+    """Mirrors Redis revocations into this worker's denylist
+
+    Subscribes before loading the snapshot, so nothing revoked in between is
+    missed. After a lost connection it subscribes and loads everything again.
+    """
+    denylist = app["token_denylist"]
+    redis_client = app["redis"]
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(REVOKED_TOKENS_CHANNEL)
+                denylist.update(await load_revoked_tokens(redis_client))
+                denylist.purge()
+                purged = time()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    denylist.add(*parse_revocation(message["data"]))
+                    if time() - purged > 60:
+                        denylist.purge()
+                        purged = time()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("token denylist sync failed, resubscribing", exc_info=True)
+        await asyncio.sleep(retry_delay)
+
+
+async def init_token_denylist(app):
+    app["token_denylist"] = TokenDenylist()
+    app["token_denylist_task"] = asyncio.create_task(sync_token_denylist(app))
+
+
+async def close_token_denylist(app):
+    task = app.get("token_denylist_task")
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def setup_token_denylist(app):
+    app.on_startup.append(init_token_denylist)
+    app.on_cleanup.append(close_token_denylist)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+
+from backends.db import count_objects, stream_objects
+from backends.redis import is_recent_email, mark_recent_emails
+from helpers.bloom import BloomFilter
+from models.users import User
+
+logger = logging.getLogger(__name__)
+
+
+class EmailFilter:
+    """Tells logins for emails that were never registered apart without the DB
+
+    Every worker holds a Bloom filter of the registered emails, rebuilt from
+    the ``user`` table periodically. Emails registered since the last rebuild,
+    possibly on another worker, are also marked in Redis for two rebuild
+    intervals, so a miss in the filter is only definite when Redis doesn't
+    know the email either. Until the first build finishes every email may exist.
+    """
+
+    def __init__(self, redis_client, error_rate=0.001, max_bytes=None, recent=7200):
+        self.redis = redis_client
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+        self.recent = recent
+        self.bloom = None
+
+    async def may_exist(self, email):
+        if self.bloom is None or email in self.bloom:
+            return True
+        try:
+            recent = await is_recent_email(self.redis, email)
+        except Exception:
+            # without Redis a miss isn't definite, let the database decide
+            logger.warning(
+                "recent email check failed, using the database", exc_info=True
+            )
+            return True
+        if recent:
+            self.bloom.add(email)
+            return True
+        return False
+
+    async def add(self, *emails):
+        if self.bloom is not None:
+            for email in emails:
+                self.bloom.add(email)
+        try:
+            await mark_recent_emails(self.redis, emails, self.recent)
+        except Exception:
+            # called after the insert, other workers find out on the next rebuild
+            logger.warning("marking recent emails failed", exc_info=True)
+
+    async def rebuild(self, session_factory, chunk_size=1000):
+        async with session_factory() as session:
+            # headroom for registrations until the next rebuild
+            capacity = max(1024, 2 * await count_objects(session, User))
+            bloom = BloomFilter(capacity, self.error_rate, self.max_bytes)
+            async for row in stream_objects(
+                session, User, columns=(User.email,), chunk_size=chunk_size
+            ):
+                bloom.add(row.email)
+        self.bloom = bloom
+        logger.info(
+            "email filter rebuilt: %d emails, %d bytes, %.2g false positive rate",
+            bloom.count,
+            bloom.nbytes,
+            bloom.error_rate(),
+        )
+        return bloom
+
+
+async def rebuild_email_filter(app):
+    config = app["email_filter_config"]
+    while True:
+        try:
+            await app["email_filter"].rebuild(app["db_session"], config["chunk_size"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("email filter rebuild failed")
+        await asyncio.sleep(config["rebuild_seconds"])
+
+
+async def init_email_filter(app):
+    config = app["email_filter_config"]
+    app["email_filter"] = EmailFilter(
+        app["redis"],
+        error_rate=config["error_rate"],
+        max_bytes=config["max_bytes"],
+        recent=2 * config["rebuild_seconds"],
+    )
+    # built in the background, logins go to the database until it is ready
+    app["email_filter_task"] = asyncio.create_task(rebuild_email_filter(app))
+
+
+async def close_email_filter(app):
+    task = app.get("email_filter_task")
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def setup_email_filter(
+    app, error_rate=0.001, max_bytes=None, rebuild_seconds=3600, chunk_size=1000
+):
+    app["email_filter_config"] = {
+        "error_rate": error_rate,
+        "max_bytes": max_bytes,
+        "rebuild_seconds": rebuild_seconds,
+        "chunk_size": chunk_size,
+    }
+    app.on_startup.append(init_email_filter)
+    app.on_cleanup.append(close_email_filter)
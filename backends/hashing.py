@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+
+from helpers.errors import HashingQueueFull
+from helpers.metrics import PASSWORD_HASH_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+class HashingExecutor:
+    """Runs CPU-bound password hashing off the event loop.
+
+    A thread pool is the default, pbkdf2 releases the GIL while it works.
+    Calls beyond ``max_pending`` are rejected instead of queued, so a login
+    burst can't pile up unbounded work behind the pool.
+    """
+
+    def __init__(self, kind="thread", max_workers=None, max_pending=64):
+        if kind == "thread":
+            self._pool = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="hashing"
+            )
+        elif kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            raise ValueError(f"Unknown hashing executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = self._pool._max_workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    async def run(self, func, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HashingQueueFull("Too many password hashing requests in progress")
+
+        self.pending += 1
+        start = perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, func, *args)
+        finally:
+            elapsed = perf_counter() - start
+            self.pending -= 1
+            self.calls += 1
+            self.total_time += elapsed
+            self.max_time = max(self.max_time, elapsed)
+            PASSWORD_HASH_DURATION.observe(elapsed, func.__name__)
+            logger.debug("%s took %.2f ms", func.__name__, elapsed * 1000)
+
+    async def shutdown(self):
+        await asyncio.to_thread(self._pool.shutdown, wait=True, cancel_futures=True)
+
+
+async def init_hashing(app):
+    app["hashing"] = HashingExecutor(**app["hashing_config"])
+
+
+async def close_hashing(app):
+    if "hashing" in app:
+        await app["hashing"].shutdown()
+
+
+def setup_hashing(app, kind="thread", max_workers=None, max_pending=64):
+    app["hashing_config"] = {
+        "kind": kind,
+        "max_workers": max_workers,
+        "max_pending": max_pending,
+    }
+    app.on_startup.append(init_hashing)
+    app.on_cleanup.append(close_hashing)
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from datetime import UTC, datetime
+
+from backends.db import update_latest_values
+from models.users import User
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginBuffer:
+    """Login times collected in memory and written to the database in batches
+
+    Only the latest login of each user is kept. At most ``max_pending`` users
+    wait for a flush, logins of further users are dropped while the database
+    can't keep up. Reaching ``batch_size`` users wakes the flush loop early.
+    """
+
+    def __init__(self, batch_size=1000, max_pending=100000):
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.full = asyncio.Event()
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, user_id, when=None):
+        if user_id not in self._pending and len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._pending[user_id] = when or datetime.now(UTC)
+        if len(self._pending) >= self.batch_size:
+            self.full.set()
+        return True
+
+    def restore(self, items):
+        # logins recorded during a failed flush are newer, they win
+        for user_id, when in items:
+            if user_id in self._pending:
+                continue
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                continue
+            self._pending[user_id] = when
+
+    async def flush(self, session_factory):
+        """Writes every pending login, unwritten ones are kept on failure"""
+        items = list(self._pending.items())
+        self._pending = {}
+        self.full.clear()
+        flushed = 0
+        try:
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start : start + self.batch_size]
+                async with session_factory() as session:
+                    await update_latest_values(session, User, "last_login", batch)
+                flushed += len(batch)
+        except BaseException:
+            self.restore(items[flushed:])
+            raise
+        return flushed
+
+
+async def flush_last_logins(app):
+    buffer = app["last_login_buffer"]
+    interval = app["last_login_config"]["flush_seconds"]
+    while True:
+        try:
+            await asyncio.wait_for(buffer.full.wait(), interval)
+        except TimeoutError:
+            pass
+        try:
+            await buffer.flush(app["db_session"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("last login flush failed, %d logins pending", len(buffer))
+
+
+async def init_last_login_buffer(app):
+    config = app["last_login_config"]
+    app["last_login_buffer"] = LastLoginBuffer(
+        batch_size=config["batch_size"], max_pending=config["max_pending"]
+    )
+    app["last_login_task"] = asyncio.create_task(flush_last_logins(app))
+
+
+async def close_last_login_buffer(app):
+    task = app.get("last_login_task")
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    # on shutdown, the database is still there until cleanup
+    buffer = app.get("last_login_buffer")
+    if buffer is not None and len(buffer):
+        try:
+            await buffer.flush(app["db_session"])
+        except Exception:
+            logger.exception("final last login flush failed, %d lost", len(buffer))
+
+
+def setup_last_login_buffer(app, flush_seconds=5, batch_size=1000, max_pending=100000):
+    app["last_login_config"] = {
+        "flush_seconds": flush_seconds,
+        "batch_size": batch_size,
+        "max_pending": max_pending,
+    }
+    app.on_startup.append(init_last_login_buffer)
+    app.on_shutdown.append(close_last_login_buffer)
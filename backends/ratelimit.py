@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import math
+from time import time
+
+from helpers.cache import ExpiringLRUCache
+from helpers.metrics import REDIS_CALL_DURATION, timed
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ("ip", "email")
+
+# Sliding window counters, one (current window, previous window) key pair per
+# limit. The previous window is weighted by the part of it that still overlaps
+# the sliding window. Nothing is counted unless every limit allows the request.
+# ARGV: now in ms, then limit and window in ms for every key pair.
+# Returns 0 when allowed, otherwise milliseconds until it would be.
+SLIDING_WINDOW = """
+local now = tonumber(ARGV[1])
+local retry = 0
+for i = 1, #KEYS / 2 do
+    local limit = tonumber(ARGV[i * 2])
+    local window = tonumber(ARGV[i * 2 + 1])
+    local elapsed = now % window
+    local current = tonumber(redis.call('GET', KEYS[i * 2 - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[i * 2]) or '0')
+    if previous * (window - elapsed) / window + current + 1 > limit then
+        local wait = window - elapsed
+        if current + 1 <= limit then
+            wait = wait - (limit - current - 1) * window / previous
+        end
+        retry = math.max(retry, math.ceil(wait), 1)
+    end
+end
+if retry > 0 then
+    return retry
+end
+for i = 1, #KEYS / 2 do
+    redis.call('INCR', KEYS[i * 2 - 1])
+    redis.call('PEXPIRE', KEYS[i * 2 - 1], ARGV[i * 2 + 1] * 2)
+end
+return 0
+"""
+
+
+def parse_rate_limits(value):
+    """Parses ``route:scope=limit/seconds`` entries separated by commas"""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        try:
+            target, _, rate = entry.partition("=")
+            route, scope = target.split(":")
+            limit, seconds = rate.split("/")
+            limit, seconds = int(limit), int(seconds)
+        except ValueError as e:
+            raise ValueError(f"Bad rate limit {entry!r}") from e
+        if scope not in SCOPES:
+            raise ValueError(f"Bad rate limit {entry!r}, scope is one of {SCOPES}")
+        limits.setdefault(route, []).append((scope, limit, seconds))
+    return limits
+
+
+def rate_limit_key(route, scope, identity, seconds):
+    # window index is appended per check, identities are not stored in clear
+    digest = hashlib.blake2b(identity.encode(), digest_size=12).hexdigest()
+    return f"ratelimit:{route}:{scope}:{seconds}:{digest}"
+
+
+@timed(REDIS_CALL_DURATION, "check_rate_limits")
+async def check_rate_limits(redis_client, checks, now=None):
+    """Counts one request against every ``(key prefix, limit, seconds)`` check
+
+    Returns 0 when allowed, otherwise seconds to wait.
+    """
+    now_ms = int((time() if now is None else now) * 1000)
+    keys, args = [], [now_ms]
+    for prefix, limit, seconds in checks:
+        window = seconds * 1000
+        index = now_ms // window
+        keys += [f"{prefix}:{index}", f"{prefix}:{index - 1}"]
+        args += [limit, window]
+    script = redis_client.register_script(SLIDING_WINDOW)
+    retry_ms = await script(keys=keys, args=args)
+    return math.ceil(int(retry_ms) / 1000)
+
+
+class TokenBuckets:
+    """In-process token buckets, one per key, refilled at ``limit`` per ``seconds``
+
+    A bucket only runs dry when this process alone saw more requests than the
+    shared limit allows, so rejecting on it never contradicts Redis.
+    """
+
+    def __init__(self, maxsize=10000):
+        self._buckets = ExpiringLRUCache(maxsize)
+
+    def take(self, key, limit, seconds, now=None):
+        """Returns 0 when a token was taken, otherwise seconds to wait"""
+        now = time() if now is None else now
+        rate = limit / seconds
+        tokens, last = self._buckets.get(key, now) or (limit, now)
+        tokens = min(limit, tokens + (now - last) * rate)
+        retry = 0 if tokens >= 1 else math.ceil((1 - tokens) / rate)
+        if not retry:
+            tokens -= 1
+        # after ``seconds`` idle the bucket is full again, same as no entry
+        self._buckets.set(key, (tokens, now), now + seconds)
+        return retry
+
+
+class RateLimiter:
+    def __init__(self, redis_client, limits, local_size=10000, proxy_count=0):
+        self.redis = redis_client
+        self.limits = limits
+        self.proxy_count = proxy_count
+        self.local = TokenBuckets(local_size)
+        self.rejected_locally = 0
+        self.rejected = 0
+
+    def applies(self, route):
+        return route in self.limits
+
+    def client_ip(self, request):
+        # behind ``proxy_count`` trusted proxies the client is the entry the
+        # outermost one appended to X-Forwarded-For, the rest can be forged
+        if self.proxy_count:
+            forwarded = request.headers.get("X-Forwarded-For", "").split(",")
+            if len(forwarded) >= self.proxy_count:
+                return forwarded[-self.proxy_count].strip()
+        return request.remote
+
+    def needs_email(self, route):
+        return any(scope == "email" for scope, _, _ in self.limits.get(route, ()))
+
+    async def check(self, route, identities, now=None):
+        """Returns 0 when the request is allowed, otherwise seconds to wait
+
+        ``identities`` maps scopes to the client ip and the email, scopes
+        without an identity are not checked.
+        """
+        checks = [
+            (rate_limit_key(route, scope, identities[scope], seconds), limit, seconds)
+            for scope, limit, seconds in self.limits.get(route, ())
+            if identities.get(scope)
+        ]
+        if not checks:
+            return 0
+
+        retry = max(
+            self.local.take(prefix, limit, seconds, now)
+            for prefix, limit, seconds in checks
+        )
+        if retry:
+            self.rejected_locally += 1
+            return retry
+
+        try:
+            retry = await check_rate_limits(self.redis, checks, now)
+        except Exception:
+            # rate limiting must not take logins down with Redis
+            logger.warning("rate limit check failed, allowing request", exc_info=True)
+            return 0
+        if retry:
+            self.rejected += 1
+        return retry
+
+
+async def init_rate_limiter(app):
+    config = app["rate_limit_config"]
+    app["rate_limiter"] = RateLimiter(
+        app["redis"],
+        config["limits"],
+        local_size=config["local_size"],
+        proxy_count=config["proxy_count"],
+    )
+
+
+def setup_rate_limiter(app, limits, local_size=10000, proxy_count=0):
+    app["rate_limit_config"] = {
+        "limits": limits,
+        "local_size": local_size,
+        "proxy_count": proxy_count,
+    }
+    app.on_startup.append(init_rate_limiter)
@@ -1,9 +1,17 @@
+from time import time
+
 import redis.asyncio as redis
 
+from app.settings import JWT_EXP_REFRESH_SECONDS
+from helpers.metrics import REDIS_CALL_DURATION, timed
+
 
 async def init_redis(app):
+    options = {}
+    if app.get("redis_max_connections"):
+        options["max_connections"] = app["redis_max_connections"]
     # Explicitly await the from_url coroutine
-    redis_client = await redis.from_url(app["redis_location"])
+    redis_client = await redis.from_url(app["redis_location"], **options)
     app["redis"] = redis_client
 
 
@@ -11,20 +19,258 @@ async def close_redis(app):
     await app["redis"].close()
 
 
-def setup_redis(app, redis_location):
+def setup_redis(app, redis_location, max_connections=None):
     app["redis_location"] = redis_location
+    app["redis_max_connections"] = max_connections
     app.on_startup.append(init_redis)
     app.on_cleanup.append(close_redis)
 
 
+@timed(REDIS_CALL_DURATION, "get_redis_key")
 async def get_redis_key(redis_client, key):
     val = await redis_client.get(key)
     return val
 
 
+@timed(REDIS_CALL_DURATION, "pop_redis_key")
+async def pop_redis_key(redis_client, key):
+    return await redis_client.getdel(key)
+
+
+@timed(REDIS_CALL_DURATION, "set_redis_key")
 async def set_redis_key(redis_client, key, value, expire=None):
     if expire is None:
         res = await redis_client.set(key, value)
     else:
         res = await redis_client.set(key, value, ex=expire)
     return res
+
+
+def refresh_session_key(jti):
+    return f"refresh:{jti}"
+
+
+def user_sessions_key(user_id):
+    return f"user_refresh:{user_id}"
+
+
+def refresh_family_key(family):
+    return f"refresh_family:{family}"
+
+
+def revoked_token_key(jti):
+    return f"revoked:{jti}"
+
+
+# "<jti> <exp>" of every revoked access token, see backends.denylist
+REVOKED_TOKENS_CHANNEL = "revoked_tokens"
+
+
+def recent_email_key(email):
+    return f"recent_email:{email}"
+
+
+def cached_user_key(email):
+    return f"user:{email}"
+
+
+def cached_user_generation_key(email):
+    return f"user_gen:{email}"
+
+
+# JSON list of the emails whose cached user records were invalidated,
+# see backends.user_cache
+USER_INVALIDATIONS_CHANNEL = "user_invalidations"
+
+# Caches a user record unless it was invalidated since it was read from the
+# database, that is unless the generation counter moved on from ARGV[1].
+CACHE_USER = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+# Checks that ``old jti`` is the live head of its token family, then swaps it
+# for ``new jti`` in one server-side step. Presenting an already rotated token
+# means it leaked, so the whole family is revoked and -1 is returned.
+# Returns 0 when the session does not exist (expired, revoked or unknown).
+ROTATE_REFRESH_SESSION = """
+local current = redis.call('GET', KEYS[3])
+if current and current ~= ARGV[1] then
+    redis.call('DEL', KEYS[3], 'refresh:' .. current)
+    redis.call('SREM', KEYS[4], current)
+    return -1
+end
+if redis.call('DEL', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('SREM', KEYS[4], ARGV[1])
+redis.call('SET', KEYS[2], ARGV[3], 'EX', ARGV[4])
+redis.call('SET', KEYS[3], ARGV[2], 'EX', ARGV[4])
+redis.call('SADD', KEYS[4], ARGV[2])
+redis.call('EXPIRE', KEYS[4], ARGV[5])
+return 1
+"""
+
+
+@timed(REDIS_CALL_DURATION, "store_refresh_session")
+async def store_refresh_session(redis_client, jti, user_id, expire, family=None):
+    # the per-user index is kept alive for a full refresh lifetime,
+    # dead jtis in it are pruned when sessions are listed
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(refresh_session_key(jti), user_id, ex=expire)
+        pipe.set(refresh_family_key(family or jti), jti, ex=expire)
+        pipe.sadd(user_sessions_key(user_id), jti)
+        pipe.expire(user_sessions_key(user_id), int(JWT_EXP_REFRESH_SECONDS))
+        return await pipe.execute()
+
+
+@timed(REDIS_CALL_DURATION, "rotate_refresh_session")
+async def rotate_refresh_session(
+    redis_client, old_jti, new_jti, user_id, family, expire
+):
+    script = redis_client.register_script(ROTATE_REFRESH_SESSION)
+    return await script(
+        keys=[
+            refresh_session_key(old_jti),
+            refresh_session_key(new_jti),
+            refresh_family_key(family),
+            user_sessions_key(user_id),
+        ],
+        args=[old_jti, new_jti, user_id, expire, int(JWT_EXP_REFRESH_SECONDS)],
+    )
+
+
+@timed(REDIS_CALL_DURATION, "get_refresh_session")
+async def get_refresh_session(redis_client, jti):
+    return await redis_client.get(refresh_session_key(jti))
+
+
+@timed(REDIS_CALL_DURATION, "get_refresh_sessions")
+async def get_refresh_sessions(redis_client, jtis):
+    if not jtis:
+        return []
+    return await redis_client.mget([refresh_session_key(jti) for jti in jtis])
+
+
+@timed(REDIS_CALL_DURATION, "delete_refresh_session")
+async def delete_refresh_session(redis_client, jti, user_id):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.delete(refresh_session_key(jti))
+        pipe.srem(user_sessions_key(user_id), jti)
+        return await pipe.execute()
+
+
+@timed(REDIS_CALL_DURATION, "list_user_sessions")
+async def list_user_sessions(redis_client, user_id):
+    jtis = [
+        jti.decode() if isinstance(jti, bytes) else jti
+        for jti in await redis_client.smembers(user_sessions_key(user_id))
+    ]
+    if not jtis:
+        return []
+    values = await redis_client.mget([refresh_session_key(jti) for jti in jtis])
+    stale = [jti for jti, value in zip(jtis, values, strict=True) if value is None]
+    if stale:
+        await redis_client.srem(user_sessions_key(user_id), *stale)
+    return sorted(jti for jti, value in zip(jtis, values, strict=True) if value)
+
+
+@timed(REDIS_CALL_DURATION, "revoke_user_sessions")
+async def revoke_user_sessions(redis_client, user_id):
+    jtis = await redis_client.smembers(user_sessions_key(user_id))
+    keys = [
+        refresh_session_key(jti.decode() if isinstance(jti, bytes) else jti)
+        for jti in jtis
+    ]
+    await redis_client.delete(*keys, user_sessions_key(user_id))
+    return len(keys)
+
+
+@timed(REDIS_CALL_DURATION, "mark_recent_emails")
+async def mark_recent_emails(redis_client, emails, expire):
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for email in emails:
+            pipe.set(recent_email_key(email), 1, ex=expire)
+        return await pipe.execute()
+
+
+@timed(REDIS_CALL_DURATION, "is_recent_email")
+async def is_recent_email(redis_client, email):
+    return bool(await redis_client.exists(recent_email_key(email)))
+
+
+@timed(REDIS_CALL_DURATION, "revoke_token")
+async def revoke_token(redis_client, jti, exp, now=None):
+    # kept until the token would have expired anyway
+    ttl = int(exp - (time() if now is None else now))
+    if ttl <= 0:
+        return False
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.set(revoked_token_key(jti), int(exp), ex=ttl)
+        pipe.publish(REVOKED_TOKENS_CHANNEL, f"{jti} {int(exp)}")
+        await pipe.execute()
+    return True
+
+
+@timed(REDIS_CALL_DURATION, "load_revoked_tokens")
+async def load_revoked_tokens(redis_client, batch_size=1000):
+    """Every revoked jti with its expiry, for a full resync of local copies"""
+    revoked = {}
+    keys = []
+    async for key in redis_client.scan_iter(
+        match=revoked_token_key("*"), count=batch_size
+    ):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            revoked.update(await _revoked_batch(redis_client, keys))
+            keys = []
+    if keys:
+        revoked.update(await _revoked_batch(redis_client, keys))
+    return revoked
+
+
+async def _revoked_batch(redis_client, keys):
+    values = await redis_client.mget(keys)
+    prefix = len(revoked_token_key(""))
+    return {
+        (key.decode() if isinstance(key, bytes) else key)[prefix:]: int(value)
+        for key, value in zip(keys, values, strict=True)
+        if value is not None
+    }
+
+
+@timed(REDIS_CALL_DURATION, "get_cached_user")
+async def get_cached_user(redis_client, email):
+    """Cached record of ``email`` and the generation to cache a fresh one at"""
+    value, generation = await redis_client.mget(
+        [cached_user_key(email), cached_user_generation_key(email)]
+    )
+    if isinstance(generation, bytes):
+        generation = generation.decode()
+    return value, generation or "0"
+
+
+@timed(REDIS_CALL_DURATION, "cache_user")
+async def cache_user(redis_client, email, value, generation, expire):
+    script = redis_client.register_script(CACHE_USER)
+    return await script(
+        keys=[cached_user_key(email), cached_user_generation_key(email)],
+        args=[generation, value, expire],
+    )
+
+
+@timed(REDIS_CALL_DURATION, "invalidate_cached_users")
+async def invalidate_cached_users(redis_client, emails, message, expire):
+    # bumping the generation stops readers that loaded the old row from
+    # caching it, it only has to outlive such a read
+    async with redis_client.pipeline(transaction=True) as pipe:
+        for email in emails:
+            pipe.incr(cached_user_generation_key(email))
+            pipe.expire(cached_user_generation_key(email), expire)
+            pipe.delete(cached_user_key(email))
+        pipe.publish(USER_INVALIDATIONS_CHANNEL, message)
+        return await pipe.execute()
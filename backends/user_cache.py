@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from collections import namedtuple
+from time import time
+
+from backends.redis import (
+    USER_INVALIDATIONS_CHANNEL,
+    cache_user,
+    get_cached_user,
+    invalidate_cached_users,
+)
+from helpers.cache import ExpiringLRUCache
+from helpers.json_codec import dumps, loads
+from models.users import LOGIN_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+CachedUser = namedtuple("CachedUser", [column.key for column in LOGIN_COLUMNS])
+
+
+class UserCache:
+    """Read-through cache of the login columns of users, keyed by email
+
+    Records are shared by all workers in Redis for ``ttl`` seconds and kept
+    for ``local_ttl`` seconds in a small LRU of each worker. Every write
+    deletes the Redis copy and tells each worker over pub/sub to drop its
+    own. A worker whose subscription is down neither serves nor fills its
+    local copy, so it can't hold a record it wasn't told about.
+    """
+
+    def __init__(self, redis_client, ttl=300, local_size=1024, local_ttl=5):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local = ExpiringLRUCache(local_size)
+        self.subscribed = False
+        # bumped on every invalidation, records read before one aren't kept
+        self.generation = 0
+
+    async def get(self, email, load):
+        """Cached record of ``email``, ``load()`` reads it from the database"""
+        if self.subscribed:
+            user = self.local.get(email)
+            if user is not None:
+                return user
+
+        generation = self.generation
+        try:
+            value, redis_generation = await get_cached_user(self.redis, email)
+        except Exception:
+            logger.warning("user cache read failed, using the database", exc_info=True)
+            return await load()
+
+        if value is not None:
+            user = CachedUser(**loads(value))
+        else:
+            # rows are selected with LOGIN_COLUMNS, in the same order
+            user = CachedUser._make(await load())
+            try:
+                await cache_user(
+                    self.redis,
+                    email,
+                    dumps(user._asdict()),
+                    redis_generation,
+                    self.ttl,
+                )
+            except Exception:
+                logger.warning("user cache write failed", exc_info=True)
+
+        if self.subscribed and generation == self.generation:
+            self.local.set(email, user, time() + self.local_ttl)
+        return user
+
+    def forget(self, emails):
+        for email in emails:
+            self.local.delete(email)
+        self.generation += 1
+
+    async def invalidate(self, *emails):
+        """Drops the cached records of ``emails`` everywhere, call after commit"""
+        if not emails:
+            return
+        self.forget(emails)
+        await invalidate_cached_users(self.redis, emails, dumps(list(emails)), self.ttl)
+
+
+async def invalidate_users(app, *emails):
+    """Drops cached records after a write, a Redis failure is raised
+
+    An edited or deleted user must not keep logging in from a stale record,
+    so the request fails even though the write was already committed.
+    """
+    user_cache = app.get("user_cache")
+    if user_cache is not None:
+        await user_cache.invalidate(*emails)
+
+
+async def try_invalidate_users(app, *emails):
+    """``invalidate_users`` for writes a stale record can't get wrong, logs failures
+
+    That is freshly inserted users, who can't be cached yet, and rehashed
+    passwords, since the old hash still verifies the same password.
+    """
+    try:
+        await invalidate_users(app, *emails)
+    except Exception:
+        logger.warning("user cache invalidation failed", exc_info=True)
+
+
+async def sync_user_cache(app, retry_delay=1.0):
+    """Drops local records invalidated by any worker"""
+    user_cache = app["user_cache"]
+    while True:
+        try:
+            async with user_cache.redis.pubsub() as pubsub:
+                await pubsub.subscribe(USER_INVALIDATIONS_CHANNEL)
+                # invalidations sent while unsubscribed are lost
+                user_cache.local.clear()
+                user_cache.subscribed = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        user_cache.forget(loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("user cache sync failed, resubscribing", exc_info=True)
+        finally:
+            user_cache.subscribed = False
+        await asyncio.sleep(retry_delay)
+
+
+async def init_user_cache(app):
+    config = app["user_cache_config"]
+    app["user_cache"] = UserCache(
+        app["redis"],
+        ttl=config["ttl"],
+        local_size=config["local_size"],
+        local_ttl=config["local_ttl"],
+    )
+    app["user_cache_task"] = asyncio.create_task(sync_user_cache(app))
+
+
+async def close_user_cache(app):
+    task = app.get("user_cache_task")
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+def setup_user_cache(app, ttl=300, local_size=1024, local_ttl=5):
+    app["user_cache_config"] = {
+        "ttl": ttl,
+        "local_size": local_size,
+        "local_ttl": local_ttl,
+    }
+    app.on_startup.append(init_user_cache)
+    app.on_cleanup.append(close_user_cache)
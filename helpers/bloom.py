@@ -0,0 +1,47 @@
+import math
+from hashlib import blake2b
+
+
+class BloomFilter:
+    """Set membership with false positives but no false negatives
+
+    Sized for ``capacity`` items at ``error_rate``, optionally capped at
+    ``max_bytes`` of bit array, in which case the false positive rate of a
+    full filter is higher than asked for.
+    """
+
+    def __init__(self, capacity, error_rate=0.001, max_bytes=None):
+        capacity = max(1, int(capacity))
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        if max_bytes:
+            bits = min(bits, int(max_bytes) * 8)
+        self.size = max(8, bits)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        # double hashing, k positions out of two 64-bit hashes
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item)
+        )
+
+    @property
+    def nbytes(self):
+        return len(self._bits)
+
+    def error_rate(self):
+        """Expected false positive rate at the current number of items"""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
@@ -0,0 +1,41 @@
+from collections import OrderedDict
+from time import time
+
+
+class ExpiringLRUCache:
+    """Bounded LRU mapping where each entry also carries its own expiry time"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, now=None):
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires is None or (time() if now is None else now) < expires:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return None
+
+    def set(self, key, value, expires=None):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
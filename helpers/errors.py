@@ -10,6 +10,10 @@ class RefreshTokenNotFound(NotFound):
     """Raised when refresh token is not found in redis storage"""
 
 
+class RefreshTokenReused(RefreshTokenNotFound):
+    """Raised when an already rotated refresh token is presented again"""
+
+
 class BadRequest(Exception):
     """Bad request"""
 
@@ -22,5 +26,25 @@ class UserAlreadyExists(BadRequest):
     """User with given email address already exists"""
 
 
+class PreconditionFailed(Exception):
+    """Conditional request header doesn't match the current resource"""
+
+
 class UserIsNotActivated(Exception):
     """User with given email address is not activated"""
+
+
+class ServiceOverloaded(Exception):
+    """Service is temporarily unable to accept more work"""
+
+
+class HashingQueueFull(ServiceOverloaded):
+    """Too many password hashing calls are waiting for a worker"""
+
+
+class TooManyRequests(Exception):
+    """Client is over a rate limit, retry after ``retry_after`` seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -0,0 +1,47 @@
+import importlib
+import json
+from datetime import date, datetime
+
+from aiohttp import web
+
+from app.settings import JSON_CODEC
+
+
+def default(obj):
+    if isinstance(obj, datetime | date):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, default=default).encode("utf-8")
+
+
+def get_codec(name):
+    """Returns ``(dumps, loads)`` where dumps produces bytes
+
+    ``json`` and ``orjson`` are known, any other name is imported as a module
+    providing orjson-like ``dumps(obj, default=...)`` and ``loads``.
+    """
+    if name == "json":
+        return stdlib_dumps, json.loads
+
+    module = importlib.import_module(name)
+
+    def dumps(obj):
+        res = module.dumps(obj, default=default)
+        return res.encode("utf-8") if isinstance(res, str) else res
+
+    return dumps, module.loads
+
+
+dumps, loads = get_codec(JSON_CODEC)
+
+
+def json_response(data, status=200, headers=None):
+    return web.Response(
+        body=dumps(data),
+        status=status,
+        headers=headers,
+        content_type="application/json",
+    )
@@ -0,0 +1,126 @@
+import hashlib
+import json
+from base64 import urlsafe_b64encode
+from pathlib import Path
+from typing import NamedTuple
+
+import jwt
+
+from app.settings import (
+    JWT_ALGORITHM,
+    JWT_PRIVATE_KEY_FILE,
+    JWT_PUBLIC_KEY_FILES,
+    SECRET_KEY,
+)
+
+# members of each key type hashed for the RFC 7638 thumbprint
+THUMBPRINT_MEMBERS = {
+    "RSA": ("e", "kty", "n"),
+    "EC": ("crv", "kty", "x", "y"),
+    "OKP": ("crv", "kty", "x"),
+}
+
+
+class VerificationKey(NamedTuple):
+    kid: str | None
+    algorithm: str
+    key: object
+    # PEM of the public key, or the secret for HMAC algorithms
+    pem: str
+    jwk: dict | None
+
+
+def jwk_thumbprint(jwk):
+    members = {name: jwk[name] for name in THUMBPRINT_MEMBERS[jwk["kty"]]}
+    canonical = json.dumps(members, separators=(",", ":"), sort_keys=True)
+    digest = hashlib.sha256(canonical.encode()).digest()
+    return urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+
+def default_algorithm(public_key):
+    from cryptography.hazmat.primitives.asymmetric import ec, ed448, ed25519, rsa
+
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        return {256: "ES256", 384: "ES384", 521: "ES512"}[public_key.curve.key_size]
+    if isinstance(public_key, ed25519.Ed25519PublicKey | ed448.Ed448PublicKey):
+        return "EdDSA"
+    raise ValueError(f"Unsupported public key type: {type(public_key).__name__}")
+
+
+def public_verification_key(public_key, algorithm=None):
+    """Verification key with a thumbprint ``kid`` and its JWK"""
+    from cryptography.hazmat.primitives import serialization
+
+    algorithm = algorithm or default_algorithm(public_key)
+    jwk = jwt.get_algorithm_by_name(algorithm).to_jwk(public_key, as_dict=True)
+    kid = jwk_thumbprint(jwk)
+    jwk.update(kid=kid, use="sig", alg=algorithm)
+    pem = public_key.public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode("ascii")
+    return VerificationKey(kid, algorithm, public_key, pem, jwk)
+
+
+class KeyRing:
+    """Signs tokens with one key and verifies them with any key it holds
+
+    Asymmetric keys are identified by the ``kid`` header, tokens without one
+    (or with an unknown one) are checked against the signing key.
+    """
+
+    def __init__(self, algorithm, signing_key, verification_keys):
+        self.algorithm = algorithm
+        self.signing_key = signing_key
+        self.default = verification_keys[0]
+        self.keys = {key.kid: key for key in verification_keys}
+
+    def encode(self, payload):
+        headers = {"kid": self.default.kid} if self.default.kid else None
+        return jwt.encode(payload, self.signing_key, self.algorithm, headers=headers)
+
+    def get_key(self, token):
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.InvalidTokenError:
+            kid = None
+        return self.keys.get(kid, self.default)
+
+    def decode(self, token, **kwargs):
+        key = self.get_key(token)
+        return jwt.decode(token, key.key, algorithms=[key.algorithm], **kwargs)
+
+    def jwks(self):
+        return {"keys": [key.jwk for key in self.keys.values() if key.jwk]}
+
+
+def load_keyring(algorithm, secret, private_key_file=None, public_key_files=()):
+    if algorithm.startswith("HS"):
+        return KeyRing(
+            algorithm, secret, [VerificationKey(None, algorithm, secret, secret, None)]
+        )
+
+    if not private_key_file:
+        raise ValueError(f"JWT_PRIVATE_KEY_FILE is required for {algorithm}")
+    try:
+        from cryptography.hazmat.primitives import serialization
+    except ImportError as e:
+        raise ValueError(
+            f"{algorithm} needs the cryptography package, install the crypto extra"
+        ) from e
+
+    private_key = serialization.load_pem_private_key(
+        Path(private_key_file).read_bytes(), password=None
+    )
+    keys = [public_verification_key(private_key.public_key(), algorithm)]
+    # previous (or upcoming) keys stay valid for verification during rotation
+    for path in public_key_files:
+        public_key = serialization.load_pem_public_key(Path(path).read_bytes())
+        keys.append(public_verification_key(public_key))
+    return KeyRing(algorithm, private_key, keys)
+
+
+keyring = load_keyring(
+    JWT_ALGORITHM, SECRET_KEY, JWT_PRIVATE_KEY_FILE, JWT_PUBLIC_KEY_FILES
+)
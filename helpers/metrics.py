@@ -0,0 +1,191 @@
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def header(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, value=1):
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def get(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = self.header()
+        for labels, value in self._values.items():
+            lines.append(
+                f"{self.name}{format_labels(self.labelnames, labels)} "
+                f"{format_value(value)}"
+            )
+        return lines
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, value=1):
+        self.inc(*labels, value=-value)
+
+    def set(self, *labels, value):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        series = self._values.get(labels)
+        if series is None:
+            # per bucket counts (last one is +Inf), then sum
+            series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labels):
+        series = self._values.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        lines = self.header()
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts, strict=True):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{format_labels(self.labelnames, labels, le)} {cumulative}"
+                )
+            suffix = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def timed(histogram, *labels):
+    """Observes the duration of every call of the decorated coroutine"""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapped(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start, *labels)
+
+        return wrapped
+
+    return decorator
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route name, method and status",
+        ("route", "method", "status"),
+    )
+)
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.register(
+    Gauge(
+        "http_requests_in_progress",
+        "HTTP requests currently being served by route name",
+        ("route",),
+    )
+)
+HTTP_REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route name and status",
+        ("route", "status"),
+    )
+)
+PASSWORD_HASH_DURATION = REGISTRY.register(
+    Histogram(
+        "password_hash_duration_seconds",
+        "Password hashing calls including the wait for a hashing worker",
+        ("operation",),
+    )
+)
+DB_QUERY_DURATION = REGISTRY.register(
+    Histogram(
+        "db_query_duration_seconds",
+        "Database statement execution time by statement type",
+        ("statement",),
+    )
+)
+REDIS_CALL_DURATION = REGISTRY.register(
+    Histogram(
+        "redis_call_duration_seconds",
+        "Redis round trips by backend operation",
+        ("operation",),
+    )
+)
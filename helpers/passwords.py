@@ -0,0 +1,145 @@
+import hashlib
+import hmac
+import secrets
+from base64 import b64encode
+from statistics import median
+from time import perf_counter
+
+from app.settings import PASSWORD_HASH_ITERATIONS, PASSWORD_HASHER, SECRET_KEY
+
+
+class PBKDF2SHA256Hasher:
+    """Encodes hashes as ``<algorithm>$<iterations>$<salt>$<digest>``"""
+
+    algorithm = "pbkdf2_sha256"
+    digest = "sha256"
+
+    def __init__(self, iterations):
+        self.iterations = int(iterations)
+
+    def _digest(self, password, salt, iterations):
+        dk = hashlib.pbkdf2_hmac(
+            self.digest, password.encode("utf-8"), salt.encode("utf-8"), iterations
+        )
+        return b64encode(dk).decode("ascii").strip()
+
+    def encode(self, password, salt=None):
+        salt = salt or secrets.token_hex(16)
+        digest = self._digest(password, salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${salt}${digest}"
+
+    def decode(self, encoded):
+        algorithm, iterations, salt, digest = encoded.split("$", 3)
+        return {
+            "algorithm": algorithm,
+            "iterations": int(iterations),
+            "salt": salt,
+            "digest": digest,
+        }
+
+    def verify(self, password, encoded):
+        decoded = self.decode(encoded)
+        candidate = self._digest(password, decoded["salt"], decoded["iterations"])
+        return hmac.compare_digest(candidate, decoded["digest"])
+
+    def must_update(self, encoded):
+        return self.decode(encoded)["iterations"] != self.iterations
+
+
+class PBKDF2SHA512Hasher(PBKDF2SHA256Hasher):
+    algorithm = "pbkdf2_sha512"
+    digest = "sha512"
+
+
+class LegacyPBKDF2Hasher:
+    """Bare base64 pbkdf2-sha256 digests with 1000 rounds salted by SECRET_KEY"""
+
+    algorithm = "legacy_pbkdf2_sha256"
+
+    def encode(self, password, salt=None):
+        dk = hashlib.pbkdf2_hmac(
+            "sha256", password.encode("utf-8"), SECRET_KEY.encode("utf-8"), 1000
+        )
+        return b64encode(dk).decode("ascii").strip()
+
+    def verify(self, password, encoded):
+        return hmac.compare_digest(self.encode(password), encoded)
+
+    def must_update(self, encoded):
+        return True
+
+
+HASHERS = {
+    hasher.algorithm: hasher for hasher in (PBKDF2SHA256Hasher, PBKDF2SHA512Hasher)
+}
+
+
+def get_hasher(algorithm=PASSWORD_HASHER, iterations=PASSWORD_HASH_ITERATIONS):
+    try:
+        return HASHERS[algorithm](iterations)
+    except KeyError as e:
+        raise ValueError(f"Unknown password hasher: {algorithm}") from e
+
+
+def identify_hasher(encoded):
+    if "$" not in encoded:
+        return LegacyPBKDF2Hasher()
+    algorithm = encoded.split("$", 1)[0]
+    if algorithm not in HASHERS:
+        raise ValueError(f"Unknown password hasher: {algorithm}")
+    return HASHERS[algorithm](encoded.split("$", 2)[1])
+
+
+# module level functions below are what gets shipped to the hashing executor,
+# so they have to stay picklable for the process pool
+
+
+def hash_password(password):
+    return get_hasher().encode(password)
+
+
+def hash_passwords(passwords):
+    hasher = get_hasher()
+    return [hasher.encode(password) for password in passwords]
+
+
+def check_password(password, encoded):
+    """Returns a ``(valid, must_update)`` pair for a stored hash"""
+    # a corrupt stored hash is a failed login, not a server error
+    try:
+        hasher = identify_hasher(encoded)
+        if not hasher.verify(password, encoded):
+            return False, False
+    except ValueError:
+        return False, False
+
+    if hasher.algorithm != PASSWORD_HASHER:
+        return True, True
+    return True, get_hasher().must_update(encoded)
+
+
+def dummy_check_password(password):
+    """Costs as much as ``check_password`` of a current hash, always invalid"""
+    get_hasher().encode(password, "0" * 32)
+    return False, False
+
+
+def calibrate(algorithm=PASSWORD_HASHER, target_seconds=0.25, samples=5):
+    """Find the iteration count that takes ``target_seconds`` per hash here"""
+
+    def measure(iterations):
+        hasher = get_hasher(algorithm, iterations)
+        timings = []
+        for _ in range(samples):
+            start = perf_counter()
+            hasher.encode("calibration-password", "calibration-salt")
+            timings.append(perf_counter() - start)
+        return median(timings)
+
+    iterations = 10_000
+    elapsed = measure(iterations)
+    # pbkdf2 cost is linear in iterations, a couple of passes converge
+    for _ in range(2):
+        iterations = max(1000, round(iterations * target_seconds / elapsed, -3))
+        elapsed = measure(iterations)
+    return int(iterations), elapsed
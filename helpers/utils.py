@@ -1,38 +1,165 @@
-import hashlib
-from base64 import b64encode
+import asyncio
+import os
 from datetime import UTC, datetime, timedelta
+from functools import cache
 from uuid import uuid4
 
-import jwt
-
-from app.settings import (
-    JWT_ALGORITHM,
-    JWT_EXP_ACCESS_SECONDS,
-    JWT_EXP_REFRESH_SECONDS,
-    SECRET_KEY,
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from app.settings import JWT_EXP_ACCESS_SECONDS, JWT_EXP_REFRESH_SECONDS
+from helpers.errors import BadRequest
+from helpers.json_codec import loads
+from helpers.jwt_keys import keyring
+from helpers.passwords import (
+    check_password,
+    dummy_check_password,
+    hash_password,
+    hash_passwords,
 )
 
 
-async def generate_password_hash(passwd: str) -> str:
-    dk = hashlib.pbkdf2_hmac(
-        "sha256", passwd.encode("utf-8"), SECRET_KEY.encode("utf-8"), 1000
-    )
-    return b64encode(dk).decode("ascii").strip()
+async def run_hashing(executor, func, *args):
+    # hashing is CPU-bound, never run it on the event loop itself
+    if executor is None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+    return await executor.run(func, *args)
+
+
+async def generate_password_hash(passwd: str, executor=None) -> str:
+    return await run_hashing(executor, hash_password, passwd)
+
+
+async def generate_password_hashes(passwords, executor=None, chunk_size=8):
+    """Hashes ``passwords`` on every worker of the pool, keeping their order
+
+    Passwords go out in small chunks with at most one chunk per worker in
+    flight, so single logins still get a worker between chunks.
+    """
+    workers = getattr(executor, "max_workers", None) or os.cpu_count() or 1
+    semaphore = asyncio.Semaphore(workers)
+
+    async def hash_chunk(chunk):
+        async with semaphore:
+            return await run_hashing(executor, hash_passwords, chunk)
+
+    chunks = [
+        passwords[i : i + chunk_size] for i in range(0, len(passwords), chunk_size)
+    ]
+    results = await asyncio.gather(*(hash_chunk(chunk) for chunk in chunks))
+    return [encoded for chunk in results for encoded in chunk]
+
+
+async def verify_password(passwd: str, encoded: str, executor=None):
+    return await run_hashing(executor, check_password, passwd, encoded)
+
+
+async def dummy_verify_password(passwd: str, executor=None):
+    # unknown users take as long to reject as a wrong password
+    return await run_hashing(executor, dummy_check_password, passwd)
 
 
 async def get_data_from_request(request):
+    """Decoded body, kept on the request so it's parsed only once"""
+    if "data" in request:
+        return request["data"]
     if request.content_type == "application/json":
-        data = await request.json()
+        data = await request.json(loads=loads)
     else:
         data = await request.post()
+    request["data"] = data
     return data
 
 
-async def gen_token_for_user(user):
+def format_validation_errors(e):
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'body'}: {err['msg']}"
+        for err in e.errors()
+    )
+
+
+@cache
+def get_validator(schema):
+    """``schema`` itself for models, a TypeAdapter built once for other types"""
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return schema
+    return TypeAdapter(schema)
+
+
+def validate_json(schema, body):
+    """Parses and validates JSON ``body`` bytes in one pass, 400 on failure"""
+    validator = get_validator(schema)
+    try:
+        if validator is schema:
+            return schema.model_validate_json(body)
+        return validator.validate_json(body)
+    except ValidationError as e:
+        raise BadRequest(format_validation_errors(e)) from e
+
+
+async def validate_request(request, schema):
+    """Request body validated into ``schema``, JSON or form encoded
+
+    JSON is validated straight from the bytes unless something, like the
+    email rate limit, already decoded it with ``get_data_from_request``.
+    """
+    is_json = request.content_type == "application/json"
+    if is_json and "data" not in request:
+        return validate_json(schema, await request.read())
+
+    validator = get_validator(schema)
+    data = await get_data_from_request(request)
+    if not is_json:
+        data = dict(data)
+    try:
+        if validator is schema:
+            return schema.model_validate(data)
+        return validator.validate_python(data)
+    except ValidationError as e:
+        raise BadRequest(format_validation_errors(e)) from e
+
+
+def get_int_query_param(request, name, default=None, minimum=None, maximum=None):
+    value = request.query.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        value = int(value)
+    except ValueError as e:
+        raise BadRequest(f"{name}: must be an integer") from e
+    if minimum is not None and value < minimum:
+        raise BadRequest(f"{name}: must be greater than or equal to {minimum}")
+    if maximum is not None and value > maximum:
+        raise BadRequest(f"{name}: must be less than or equal to {maximum}")
+    return value
+
+
+def get_bool_query_param(request, name, default=False):
+    value = request.query.get(name)
+    if value is None or value == "":
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def get_datetime_query_param(request, name, default=None):
+    """ISO 8601 date or datetime, naive values are taken as UTC"""
+    value = request.query.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        value = datetime.fromisoformat(value)
+    except ValueError as e:
+        raise BadRequest(f"{name}: must be an ISO 8601 datetime") from e
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value
+
+
+async def gen_token_for_user(user, jti=None):
     token = {
         "user_id": user.get("id"),
         "email": user.get("email"),
-        "jti": uuid4().hex,
+        "jti": jti or uuid4().hex,
     }
 
     if user.get("is_superuser"):
@@ -47,22 +174,25 @@ async def gen_token_for_user(user):
     refresh_token = {
         **token,
         "token_type": "refresh_token",
+        # refresh tokens rotated from this one share its family
+        "fam": token["jti"],
         "exp": datetime.now(UTC) + timedelta(seconds=int(JWT_EXP_REFRESH_SECONDS)),
     }
 
     return {
-        "access_token": jwt.encode(access_token, SECRET_KEY, JWT_ALGORITHM),
-        "refresh_token": jwt.encode(refresh_token, SECRET_KEY, JWT_ALGORITHM),
+        "access_token": keyring.encode(access_token),
+        "refresh_token": keyring.encode(refresh_token),
     }
 
 
 async def decode_token(token):
-    payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    payload = keyring.decode(token)
     return payload
 
 
-async def get_refresh_token(token):
-    token["jti"] = uuid4().hex
+async def get_refresh_token(token, jti=None):
+    token.setdefault("fam", token.get("jti"))
+    token["jti"] = jti or uuid4().hex
     access_token = {
         **token,
         "token_type": "access_token",
@@ -75,6 +205,6 @@ async def get_refresh_token(token):
     }
 
     return {
-        "access_token": jwt.encode(access_token, SECRET_KEY, JWT_ALGORITHM),
-        "refresh_token": jwt.encode(refresh_token, SECRET_KEY, JWT_ALGORITHM),
+        "access_token": keyring.encode(access_token),
+        "refresh_token": keyring.encode(refresh_token),
     }
@@ -1,22 +1,47 @@
+import argparse
 import logging
 import sys
 
 from aiohttp import web
 
 from app import init_app
-from app.settings import APP_HOST, APP_PORT, access_log_format
+from app.settings import APP_HOST, APP_PORT, APP_WORKERS, access_log_format
+from app.workers import Supervisor
 
 
-def main(argv):
-    logging.basicConfig(level=logging.INFO)
-    app = init_app(argv)
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Auth API server")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=APP_WORKERS,
+        help="number of worker processes sharing the port via SO_REUSEPORT",
+    )
+    return parser.parse_args(argv or [])
+
+
+def run_worker(argv, worker=0, reuse_port=None):
+    app = init_app(argv, worker=worker)
     web.run_app(
         app,
         access_log_format=access_log_format,
         host=APP_HOST,
         port=int(APP_PORT),  # Convert to int to satisfy aiohttp
+        reuse_port=reuse_port,
     )
 
 
+def main(argv):
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args(argv)
+    if args.workers > 1:
+        Supervisor(
+            args.workers,
+            lambda worker: run_worker(argv, worker=worker, reuse_port=True),
+        ).run()
+    else:
+        run_worker(argv)
+
+
 if __name__ == "__main__":  # pragma: no cover
     main(sys.argv[1:])
@@ -25,3 +25,24 @@ class User(Base):
         DateTime(timezone=True), nullable=True
     )
     confirmed: Mapped[bool] = mapped_column(Boolean, default=False)
+
+
+# column projections for the hot read paths, selected as plain rows
+# instead of full ORM entities
+LOGIN_COLUMNS = (
+    User.id,
+    User.email,
+    User.password,
+    User.is_active,
+    User.is_superuser,
+)
+
+PUBLIC_COLUMNS = (
+    User.id,
+    User.email,
+    User.is_active,
+    User.is_superuser,
+    User.created,
+    User.last_login,
+    User.confirmed,
+)
@@ -1,10 +1,30 @@
-from views.auth import RefreshToken, UserLogin, UserRegister
-from views.users import UserDetailView, UserListView
+from views.auth import Logout, RefreshToken, UserLogin, UserRegister
+from views.introspect import TokenIntrospection
+from views.jwks import JWKSView
+from views.stats import DatabasePoolStats
+from views.users import (
+    UserDetailView,
+    UserExportView,
+    UserImportView,
+    UserListView,
+)
 
 
 def setup_routes(app):
     app.router.add_route("*", "/auth/v1/register", UserRegister, name="register")
     app.router.add_route("*", "/auth/v1/login", UserLogin, name="login")
     app.router.add_route("*", "/auth/v1/refresh", RefreshToken, name="refresh")
+    app.router.add_route("*", "/auth/v1/logout", Logout, name="logout")
+    app.router.add_route(
+        "*", "/auth/v1/introspect", TokenIntrospection, name="introspect"
+    )
     app.router.add_route("*", "/auth/v1/users", UserListView, name="user_list")
+    app.router.add_route(
+        "*", "/auth/v1/users/export", UserExportView, name="user_export"
+    )
+    app.router.add_route(
+        "*", "/auth/v1/users/import", UserImportView, name="user_import"
+    )
     app.router.add_route("*", "/auth/v1/users/{id}", UserDetailView, name="user_detail")
+    app.router.add_route("GET", "/auth/v1/.well-known/jwks.json", JWKSView, name="jwks")
+    app.router.add_route("*", "/auth/v1/stats/db", DatabasePoolStats, name="db_stats")
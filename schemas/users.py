@@ -1,6 +1,15 @@
 from datetime import datetime
 
-from pydantic import BaseModel, ConfigDict, EmailStr, field_validator, model_validator
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    EmailStr,
+    Field,
+    field_validator,
+    model_validator,
+)
+
+from app.settings import INTROSPECT_MAX_TOKENS
 
 
 class RegistrationSchema(BaseModel):
@@ -72,6 +81,32 @@ class UserResponse(UserBase):
     id: int
 
 
+class UserUpdate(BaseModel):
+    model_config = ConfigDict()  # Use ConfigDict instead of class-based config
+
+    email: EmailStr
+    is_active: bool
+    is_superuser: bool
+    confirmed: bool
+    password: str | None = None
+
+    @field_validator("password")
+    @classmethod
+    def validate_password_length(cls, v):
+        if v is not None and len(v) > 100:
+            raise ValueError("Password must be less than 100 characters")
+        return v
+
+
+class UserPatch(UserUpdate):
+    model_config = ConfigDict()  # Use ConfigDict instead of class-based config
+
+    email: EmailStr | None = None
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+    confirmed: bool | None = None
+
+
 class TokenSchema(BaseModel):
     model_config = ConfigDict()  # Use ConfigDict instead of class-based config
 
@@ -85,6 +120,12 @@ class RefreshTokenSchema(BaseModel):
     refresh_token: str
 
 
+class IntrospectionSchema(BaseModel):
+    model_config = ConfigDict()  # Use ConfigDict instead of class-based config
+
+    tokens: list[str] = Field(min_length=1, max_length=INTROSPECT_MAX_TOKENS)
+
+
 class MessageSchema(BaseModel):
     model_config = ConfigDict()  # Use ConfigDict instead of class-based config
 
@@ -97,8 +138,11 @@ class Schemas:
     login = LoginSchema
     user_create = UserCreate
     user_response = UserResponse
+    user_update = UserUpdate
+    user_patch = UserPatch
     token = TokenSchema
     refresh_token = RefreshTokenSchema
+    introspection = IntrospectionSchema
     message = MessageSchema
 
 
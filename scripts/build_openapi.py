@@ -0,0 +1,30 @@
+"""Write the OpenAPI document of the service to a static JSON file.
+
+Usage: python scripts/build_openapi.py [--output openapi.json]
+
+The app serves the file under /auth/v1/docs when DOCS_ENABLED is set.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.docs import build_spec  # noqa: E402
+from app.settings import DOCS_SPEC_FILE  # noqa: E402
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", type=Path, default=DOCS_SPEC_FILE)
+    args = parser.parse_args(argv)
+
+    spec = build_spec()
+    args.output.write_text(json.dumps(spec, indent=2, sort_keys=True) + "\n")
+    print(f"{len(spec['paths'])} paths written to {args.output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
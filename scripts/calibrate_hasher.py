@@ -0,0 +1,31 @@
+"""Pick PASSWORD_HASH_ITERATIONS that hits a target hashing latency.
+
+Usage: python scripts/calibrate_hasher.py --target-ms 250
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from helpers.passwords import HASHERS, calibrate  # noqa: E402
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--algorithm", default="pbkdf2_sha256", choices=HASHERS)
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    iterations, elapsed = calibrate(
+        args.algorithm, args.target_ms / 1000, samples=args.samples
+    )
+    print(f"# {args.algorithm}: {elapsed * 1000:.1f} ms per hash")
+    print(f"PASSWORD_HASHER={args.algorithm}")
+    print(f"PASSWORD_HASH_ITERATIONS={iterations}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
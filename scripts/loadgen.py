@@ -0,0 +1,326 @@
+"""Drive a running auth-api with a register/login/refresh/list-users traffic mix.
+
+Usage:
+    python scripts/loadgen.py --url http://127.0.0.1:8080 --duration 30 \\
+        --concurrency 50 --admin-email admin@example.com --admin-password secret
+    python scripts/loadgen.py --rate 200 --mix login=70,refresh=25,register=5
+
+Without --rate every one of --concurrency clients sends its next request as
+soon as the previous one finished (closed loop). With --rate requests start
+on a Poisson schedule (open loop) and their latency is measured from the
+scheduled start, so time spent waiting for a free client is included.
+
+Responses rejected by the rate limiter (429) are counted on their own and
+left out of the per-route results, start the server with RATE_LIMITS= to
+measure the real routes.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import Counter, deque
+
+import aiohttp
+
+ROUTES = ("register", "login", "refresh", "users")
+DEFAULT_MIX = "register=5,login=60,refresh=25,users=10"
+PERCENTILES = (50, 95, 99, 99.9)
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in ROUTES:
+            raise argparse.ArgumentTypeError(f"unknown route {route!r} in mix")
+        try:
+            mix[route] = float(weight)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(f"bad weight for {route!r}") from e
+        if not math.isfinite(mix[route]) or mix[route] < 0:
+            raise argparse.ArgumentTypeError(f"bad weight for {route!r}")
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("traffic mix has no weight")
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+
+    def record(self, status, elapsed):
+        self.latencies.append(elapsed)
+        self.statuses[status] += 1
+
+    @property
+    def errors(self):
+        return sum(count for status, count in self.statuses.items() if status >= 400)
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "rps": len(latencies) / duration if duration else 0.0,
+            "statuses": {str(status): n for status, n in self.statuses.items()},
+            **{
+                f"p{pct:g}_ms": percentile(latencies, pct) * 1000 for pct in PERCENTILES
+            },
+            "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+        }
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        session,
+        url,
+        mix,
+        password="loadgen-password",
+        users=50,
+        admin=None,
+    ):
+        self.session = session
+        self.url = url.rstrip("/")
+        self.routes = [route for route in mix if mix[route] > 0]
+        self.weights = [mix[route] for route in self.routes]
+        self.password = password
+        self.users = users
+        self.admin = admin
+        self.admin_token = None
+        self.prefix = f"loadgen-{uuid.uuid4().hex[:8]}"
+        self.emails = []
+        # refresh tokens are single use, each one is handed to one request only
+        self.refresh_tokens = deque(maxlen=users * 4)
+        self.stats = {route: RouteStats() for route in ROUTES}
+        self.rate_limited = 0
+        self.counter = 0
+
+    async def request(self, route, method, path, started=None, **kwargs):
+        started = time.perf_counter() if started is None else started
+        try:
+            async with self.session.request(
+                method, self.url + path, **kwargs
+            ) as response:
+                body = await response.read()
+                status = response.status
+        except aiohttp.ClientError:
+            body, status = b"", 599
+        if status == 429:
+            # the rejection path would skew the route's latencies
+            self.rate_limited += 1
+        else:
+            self.stats[route].record(status, time.perf_counter() - started)
+        return status, json.loads(body) if status < 400 and body else None
+
+    def next_email(self):
+        self.counter += 1
+        return f"{self.prefix}-{self.counter}@example.com"
+
+    async def register(self, started=None):
+        email = self.next_email()
+        status, _ = await self.request(
+            "register",
+            "POST",
+            "/auth/v1/register",
+            started,
+            json={
+                "email": email,
+                "password": self.password,
+                "password2": self.password,
+            },
+        )
+        if status == 200:
+            self.emails.append(email)
+
+    async def login(self, started=None):
+        status, body = await self.request(
+            "login",
+            "POST",
+            "/auth/v1/login",
+            started,
+            json={"email": random.choice(self.emails), "password": self.password},
+        )
+        if status == 200:
+            self.refresh_tokens.append(body["refresh_token"])
+
+    async def refresh(self, started=None):
+        if not self.refresh_tokens:
+            return await self.login(started)
+        status, body = await self.request(
+            "refresh",
+            "POST",
+            "/auth/v1/refresh",
+            started,
+            json={"refresh_token": self.refresh_tokens.popleft()},
+        )
+        if status == 200:
+            self.refresh_tokens.append(body["refresh_token"])
+
+    async def login_admin(self):
+        email, password = self.admin
+        async with self.session.post(
+            self.url + "/auth/v1/login", json={"email": email, "password": password}
+        ) as response:
+            response.raise_for_status()
+            self.admin_token = (await response.json())["access_token"]
+
+    async def list_users(self, started=None):
+        status, _ = await self.request(
+            "users",
+            "GET",
+            "/auth/v1/users",
+            started,
+            headers={"Authorization": f"Bearer {self.admin_token}"},
+        )
+        if status == 401:
+            # access tokens are short lived, later requests get a fresh one
+            await self.login_admin()
+
+    async def setup(self):
+        """Register the user pool and log every user in once"""
+        if "users" in self.routes:
+            await self.login_admin()
+        for _ in range(self.users):
+            await self.register()
+        if self.rate_limited:
+            print(
+                f"{self.rate_limited} setup requests were rate limited, "
+                f"only {len(self.emails)} of {self.users} users registered, "
+                "start the server with RATE_LIMITS= to disable rate limiting"
+            )
+        if not self.emails:
+            raise RuntimeError("could not register any load test user")
+        for _ in range(len(self.emails)):
+            await self.login()
+        # setup traffic is not part of the report
+        self.stats = {route: RouteStats() for route in ROUTES}
+        self.rate_limited = 0
+
+    def pick(self):
+        route = random.choices(self.routes, self.weights)[0]
+        return {
+            "register": self.register,
+            "login": self.login,
+            "refresh": self.refresh,
+            "users": self.list_users,
+        }[route]
+
+    async def closed_loop(self, duration, concurrency):
+        deadline = time.perf_counter() + duration
+
+        async def client():
+            while time.perf_counter() < deadline:
+                await self.pick()()
+
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    async def open_loop(self, duration, concurrency, rate):
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = set()
+
+        async def send(operation, started):
+            async with semaphore:
+                await operation(started)
+
+        start = time.perf_counter()
+        scheduled = start
+        while scheduled < start + duration:
+            scheduled += random.expovariate(rate)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(send(self.pick(), scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    async def run(self, duration, concurrency, rate=None):
+        start = time.perf_counter()
+        if rate:
+            await self.open_loop(duration, concurrency, rate)
+        else:
+            await self.closed_loop(duration, concurrency)
+        elapsed = time.perf_counter() - start
+        return {
+            "routes": {
+                route: self.stats[route].summary(elapsed)
+                for route in ROUTES
+                if self.stats[route].latencies
+            },
+            "rate_limited": self.rate_limited,
+        }
+
+
+def print_report(report):
+    header = f"{'route':<10}  {'requests':>8}  {'errors':>6}  {'req/s':>8}"
+    header += "".join(f"  {f'p{pct:g} ms':>9}" for pct in PERCENTILES)
+    print(header + f"  {'max ms':>9}")
+    for route, res in report["routes"].items():
+        line = (
+            f"{route:<10}  {res['requests']:>8}  {res['errors']:>6}  {res['rps']:>8.1f}"
+        )
+        line += "".join(f"  {res[f'p{pct:g}_ms']:>9.2f}" for pct in PERCENTILES)
+        print(line + f"  {res['max_ms']:>9.2f}")
+    total = sum(res["rps"] for res in report["routes"].values())
+    print(f"\ntotal throughput {total:.1f} req/s")
+    print(f"rate limited (429, not counted above) {report['rate_limited']}")
+
+
+async def run(args):
+    admin = None
+    if args.admin_email:
+        admin = (args.admin_email, args.admin_password)
+    elif args.mix.get("users"):
+        print("no --admin-email given, skipping GET /auth/v1/users traffic")
+        args.mix["users"] = 0
+        if not any(args.mix.values()):
+            raise SystemExit("traffic mix has no weight left")
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        generator = LoadGenerator(
+            session, args.url, args.mix, args.password, args.users, admin
+        )
+        await generator.setup()
+        return await generator.run(args.duration, args.concurrency, args.rate)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rate", type=float, help="requests/s, open loop")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--users", type=int, default=50, help="user pool size")
+    parser.add_argument("--password", default="loadgen-password")
+    parser.add_argument("--admin-email")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--json", dest="json_path", help="also write report here")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,96 @@
+"""Run the service-free benchmark suite and compare it with a saved baseline.
+
+Usage:
+    python -m tests.benchmarks                 # run and compare with baseline
+    python -m tests.benchmarks --save          # run and overwrite the baseline
+    python -m tests.benchmarks --tolerance 0.5 # allowed slowdown before failing
+
+Exits with status 1 when a benchmark is slower than the baseline by more than
+the tolerance. Benchmarks needing Redis or Postgres are run on their own.
+"""
+
+import argparse
+import json
+import platform
+import sys
+from importlib import import_module
+from pathlib import Path
+
+from tests.benchmarks.common import print_results
+
+SUITE = (
+    "tests.benchmarks.bench_hot_paths",
+    "tests.benchmarks.bench_json",
+    "tests.benchmarks.bench_request_bodies",
+    "tests.benchmarks.bench_user_fetch",
+)
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def run_suite(modules=SUITE):
+    results = {}
+    for name in modules:
+        results.update(import_module(name).run())
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"\n{'benchmark':<32}  {'baseline us':>12}  {'now us':>12}  {'ratio':>7}")
+    for name, res in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<32}  {'-':>12}  {res['median_us']:>12.3f}  {'new':>7}")
+            continue
+        ratio = res["median_us"] / base["median_us"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:<32}  {base['median_us']:>12.3f}  "
+            f"{res['median_us']:>12.3f}  {ratio:>7.2f}{flag}"
+        )
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--save", action="store_true", help="overwrite baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args(argv)
+
+    results = run_suite()
+    print_results(results)
+
+    if args.save:
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        print(f"\nbaseline saved to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"\nno baseline at {args.baseline}, run with --save first")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,66 @@
+"""Auth hot paths: hashing, token issue/refresh/decode, validation, serialization.
+
+Usage: python -m tests.benchmarks.bench_hot_paths
+"""
+
+import asyncio
+
+from sqlalchemy import select
+
+from helpers.utils import (
+    decode_token,
+    gen_token_for_user,
+    generate_password_hash,
+    get_refresh_token,
+)
+from models.users import PUBLIC_COLUMNS
+from schemas.users import LoginSchema, RegistrationSchema
+from tests.benchmarks.bench_user_fetch import make_engine
+from tests.benchmarks.common import measure, measure_async, print_results
+from views.users import serialize_user
+
+USER = {"id": 1, "email": "user@example.com", "is_superuser": True}
+REGISTRATION = {
+    "email": "user@example.com",
+    "password": "secret-password",
+    "password2": "secret-password",
+}
+LOGIN = {"email": "user@example.com", "password": "secret-password"}
+
+
+def users_page(size=100):
+    engine = make_engine(size)
+    with engine.connect() as conn:
+        return conn.execute(select(*PUBLIC_COLUMNS)).all()
+
+
+def run(number=2000, repeat=5):
+    tokens = asyncio.run(gen_token_for_user(USER))
+    refresh_payload = asyncio.run(decode_token(tokens["refresh_token"]))
+    rows = users_page()
+
+    return {
+        "generate_password_hash": measure_async(
+            lambda: generate_password_hash("secret-password"), 5, 3
+        ),
+        "gen_token_for_user": measure_async(
+            lambda: gen_token_for_user(USER), number, repeat
+        ),
+        "get_refresh_token": measure_async(
+            lambda: get_refresh_token(dict(refresh_payload)), number, repeat
+        ),
+        "decode_token": measure_async(
+            lambda: decode_token(tokens["access_token"]), number, repeat
+        ),
+        "registration_schema": measure(
+            lambda: RegistrationSchema(**REGISTRATION), number, repeat
+        ),
+        "login_schema": measure(lambda: LoginSchema(**LOGIN), number, repeat),
+        "user_list_rows_to_dicts_100": measure(
+            lambda: [serialize_user(row) for row in rows], number // 10, repeat
+        ),
+    }
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,67 @@
+"""Response building throughput of the JSON codecs.
+
+Builds the GET /auth/v1/users response for a page of users the way views
+did before the codec (isoformat + web.json_response) and with each codec.
+
+Usage: python -m tests.benchmarks.bench_json
+"""
+
+import importlib.util
+from datetime import UTC, datetime
+
+from aiohttp import web
+
+from helpers.json_codec import get_codec
+from tests.benchmarks.common import measure, print_results
+
+PAGE = [
+    {
+        "id": i,
+        "email": f"user{i}@example.com",
+        "is_active": True,
+        "is_superuser": False,
+        "created": datetime(2024, 1, 1, 12, 30, i % 60, 12345, tzinfo=UTC),
+        "last_login": datetime(2024, 6, 1, 8, 0, i % 60, tzinfo=UTC),
+        "confirmed": False,
+    }
+    for i in range(100)
+]
+
+
+def isoformat_json_response():
+    page = [
+        {
+            **user,
+            "created": user["created"].isoformat() if user["created"] else None,
+            "last_login": user["last_login"].isoformat()
+            if user["last_login"]
+            else None,
+        }
+        for user in PAGE
+    ]
+    return web.json_response(page)
+
+
+def codec_json_response(name):
+    dumps, _ = get_codec(name)
+
+    def build():
+        return web.Response(body=dumps(PAGE), content_type="application/json")
+
+    return build
+
+
+def run(number=2000, repeat=5):
+    results = {
+        "users_page_isoformat_stdlib": measure(isoformat_json_response, number, repeat),
+        "users_page_codec_json": measure(codec_json_response("json"), number, repeat),
+    }
+    if importlib.util.find_spec("orjson"):
+        results["users_page_codec_orjson"] = measure(
+            codec_json_response("orjson"), number, repeat
+        )
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
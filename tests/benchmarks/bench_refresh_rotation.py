@@ -0,0 +1,78 @@
+"""Refresh session rotation: separate round trips vs one server-side script.
+
+Needs a Redis instance, the one from REDIS_LOCATION is used and only keys
+under ``refresh:``, ``refresh_family:`` and ``user_refresh:bench`` are touched.
+
+Usage: REDIS_LOCATION=redis://localhost:6379/0 \\
+    python -m tests.benchmarks.bench_refresh_rotation
+"""
+
+import asyncio
+from time import perf_counter
+from uuid import uuid4
+
+import redis.asyncio as redis
+
+from app.settings import redis_location
+from backends.redis import (
+    delete_refresh_session,
+    get_refresh_session,
+    rotate_refresh_session,
+    store_refresh_session,
+)
+from tests.benchmarks.common import print_results, summarize
+
+USER_ID = "bench"
+EXPIRE = 60
+
+
+async def get_then_rotate(redis_client, state):
+    # the flow before atomic rotation: GET, then delete old, then store new
+    new_jti = uuid4().hex
+    assert await get_refresh_session(redis_client, state["jti"])
+    await delete_refresh_session(redis_client, state["jti"], USER_ID)
+    await store_refresh_session(redis_client, new_jti, USER_ID, EXPIRE)
+    state["jti"] = new_jti
+
+
+async def rotate_in_script(redis_client, state):
+    new_jti = uuid4().hex
+    rotated = await rotate_refresh_session(
+        redis_client, state["jti"], new_jti, USER_ID, state["family"], EXPIRE
+    )
+    assert rotated == 1
+    state["jti"] = new_jti
+
+
+async def measure_flow(redis_client, flow, number, repeat):
+    jti = uuid4().hex
+    await store_refresh_session(redis_client, jti, USER_ID, EXPIRE)
+    state = {"jti": jti, "family": jti}
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            await flow(redis_client, state)
+        timings.append((perf_counter() - start) / number)
+    return summarize(timings, number, repeat)
+
+
+async def run(number=1000, repeat=5):
+    redis_client = await redis.from_url(redis_location)
+    try:
+        return {
+            "rotate_get_delete_set": await measure_flow(
+                redis_client, get_then_rotate, number, repeat
+            ),
+            "rotate_lua_script": await measure_flow(
+                redis_client, rotate_in_script, number, repeat
+            ),
+        }
+    finally:
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    if not redis_location:
+        raise SystemExit("REDIS_LOCATION is not set")
+    print_results(asyncio.run(run()))
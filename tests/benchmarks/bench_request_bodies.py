@@ -0,0 +1,68 @@
+"""Request body decoding and validation of the auth endpoints.
+
+``*_body`` validates the raw bytes in one pass as the views do, ``*_body_dict``
+is how they did it before: decode to a dict, then build the model from it.
+
+Usage: python -m tests.benchmarks.bench_request_bodies
+"""
+
+from helpers.json_codec import dumps, loads
+from helpers.utils import get_data_from_request, validate_request
+from schemas.users import LoginSchema, RefreshTokenSchema, RegistrationSchema
+from tests.benchmarks.common import measure_async, print_results
+
+BODIES = {
+    "login": (
+        LoginSchema,
+        dumps({"email": "user@example.com", "password": "secret-password"}),
+    ),
+    "register": (
+        RegistrationSchema,
+        dumps(
+            {
+                "email": "user@example.com",
+                "password": "secret-password",
+                "password2": "secret-password",
+            }
+        ),
+    ),
+    "refresh": (RefreshTokenSchema, dumps({"refresh_token": "x" * 300})),
+}
+
+
+class JSONRequest:
+    """The parts of web.Request used to read a JSON body"""
+
+    content_type = "application/json"
+
+    def __init__(self, body):
+        self.body = body
+
+    async def read(self):
+        return self.body
+
+    async def text(self):
+        return self.body.decode("utf-8")
+
+    async def json(self, *, loads=loads):
+        return loads(await self.text())
+
+
+def run(number=5000, repeat=5):
+    results = {}
+    for name, (schema, body) in BODIES.items():
+        request = JSONRequest(body)
+
+        async def validate(schema=schema, request=request):
+            return await validate_request(request, schema)
+
+        async def decode_dict(schema=schema, request=request):
+            return schema(**await get_data_from_request(request))
+
+        results[f"{name}_body"] = measure_async(validate, number, repeat)
+        results[f"{name}_body_dict"] = measure_async(decode_dict, number, repeat)
+    return results
+
+
+if __name__ == "__main__":
+    print_results(run())
@@ -0,0 +1,77 @@
+"""ORM entities vs projected Core rows for the user lookups in backends.db.
+
+Runs the real ``backends.db`` functions against an in-memory sqlite
+database, so it needs no Postgres. Only the Python side differs between
+the two paths, which is exactly what is being compared.
+
+Usage: python -m tests.benchmarks.bench_user_fetch
+"""
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from backends.db import get_objects, get_user_by_email
+from models.users import LOGIN_COLUMNS, PUBLIC_COLUMNS, Base, User
+from tests.benchmarks.common import measure_async, print_results
+
+USERS = 1000
+
+
+class SyncSessionAdapter:
+    """Just enough of AsyncSession on top of a sync sqlite Session"""
+
+    def __init__(self, session):
+        self._session = session
+
+    async def execute(self, stmt):
+        return self._session.execute(stmt)
+
+
+def make_engine(users=USERS):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {"email": f"user{i}@example.com", "password": "x" * 100}
+                for i in range(users)
+            ],
+        )
+    return engine
+
+
+def run(number=200, repeat=5):
+    engine = make_engine()
+    email = f"user{USERS // 2}@example.com"
+
+    def session_call(func, *args, **kwargs):
+        # a fresh session per call, like a request does
+        async def call():
+            with Session(engine) as session:
+                return await func(SyncSessionAdapter(session), *args, **kwargs)
+
+        return call
+
+    return {
+        "user_by_email_orm": measure_async(
+            session_call(get_user_by_email, User, email), number, repeat
+        ),
+        "user_by_email_columns": measure_async(
+            session_call(get_user_by_email, User, email, columns=LOGIN_COLUMNS),
+            number,
+            repeat,
+        ),
+        f"objects_{USERS}_orm": measure_async(
+            session_call(get_objects, User), number // 20, repeat
+        ),
+        f"objects_{USERS}_columns": measure_async(
+            session_call(get_objects, User, columns=PUBLIC_COLUMNS),
+            number // 20,
+            repeat,
+        ),
+    }
+
+
+if __name__ == "__main__":
+    print_results(run())
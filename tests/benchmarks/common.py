@@ -0,0 +1,49 @@
+import asyncio
+from statistics import median
+from time import perf_counter
+
+
+def measure(func, number=1000, repeat=5):
+    """Time ``func()`` and return per call statistics in microseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((perf_counter() - start) / number)
+    return summarize(timings, number, repeat)
+
+
+def measure_async(coro_func, number=1000, repeat=5):
+    """Time ``await coro_func()`` inside one event loop"""
+
+    async def run():
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            for _ in range(number):
+                await coro_func()
+            timings.append((perf_counter() - start) / number)
+        return timings
+
+    return summarize(asyncio.run(run()), number, repeat)
+
+
+def summarize(timings, number, repeat):
+    return {
+        "min_us": round(min(timings) * 1e6, 3),
+        "median_us": round(median(timings) * 1e6, 3),
+        "ops_per_sec": round(1 / median(timings), 1),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def print_results(results):
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}}  {'median us':>12}  {'min us':>12}  {'ops/s':>12}")
+    for name, res in results.items():
+        print(
+            f"{name:<{width}}  {res['median_us']:>12.3f}  "
+            f"{res['min_us']:>12.3f}  {res['ops_per_sec']:>12.1f}"
+        )
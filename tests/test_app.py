@@ -23,3 +23,13 @@ def test_init_app():
     # We now have 3 startup handlers (pg init, redis init, and cleanup context)
     # instead of 4 because apispec is optional
     assert len(app.on_startup) >= 3
+
+
+def test_docs_are_not_mounted_by_default():
+    app = init_app(argv=None)
+    assert not any(
+        resource.canonical.startswith("/auth/v1/docs")
+        for resource in app.router.resources()
+    )
+    # nothing is introspected at startup any more
+    assert "swagger_dict" not in app
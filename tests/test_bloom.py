@@ -0,0 +1,98 @@
+from unittest import mock
+
+import pytest
+
+from backends.email_filter import EmailFilter
+from helpers.bloom import BloomFilter
+
+
+class TestBloomFilter:
+    """Test Bloom filter membership"""
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        emails = [f"user{i}@example.com" for i in range(1000)]
+        for email in emails:
+            bloom.add(email)
+        assert all(email in bloom for email in emails)
+        assert bloom.count == 1000
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"user{i}@example.com")
+        false_positives = sum(f"other{i}@example.com" in bloom for i in range(10000))
+        assert false_positives < 300
+        assert bloom.error_rate() == pytest.approx(0.01, rel=0.5)
+
+    def test_max_bytes_caps_memory(self):
+        bloom = BloomFilter(1_000_000, error_rate=0.001, max_bytes=1024)
+        assert bloom.nbytes == 1024
+        bloom.add("user@example.com")
+        assert "user@example.com" in bloom
+
+
+class TestEmailFilter:
+    """Test the registered email filter"""
+
+    async def test_everything_may_exist_before_build(self, mock_redis_client):
+        email_filter = EmailFilter(mock_redis_client)
+        assert await email_filter.may_exist("unknown@example.com")
+
+    async def test_definite_miss(self, mock_redis_client):
+        mock_redis_client.exists.return_value = 0
+        email_filter = EmailFilter(mock_redis_client)
+        email_filter.bloom = BloomFilter(100)
+        email_filter.bloom.add("user@example.com")
+
+        assert await email_filter.may_exist("user@example.com")
+        assert not await email_filter.may_exist("unknown@example.com")
+        mock_redis_client.exists.assert_called_once_with(
+            "recent_email:unknown@example.com"
+        )
+
+    async def test_recent_email_from_other_worker(self, mock_redis_client):
+        mock_redis_client.exists.return_value = 1
+        email_filter = EmailFilter(mock_redis_client)
+        email_filter.bloom = BloomFilter(100)
+
+        assert await email_filter.may_exist("new@example.com")
+        assert "new@example.com" in email_filter.bloom
+
+    async def test_redis_failure_falls_back_to_database(self, mock_redis_client):
+        mock_redis_client.exists.side_effect = ConnectionError
+        email_filter = EmailFilter(mock_redis_client)
+        email_filter.bloom = BloomFilter(100)
+
+        assert await email_filter.may_exist("unknown@example.com")
+        # a possible false negative is not cached
+        assert "unknown@example.com" not in email_filter.bloom
+
+    async def test_add_marks_recent_emails(self, mock_redis_client):
+        email_filter = EmailFilter(mock_redis_client, recent=60)
+        email_filter.bloom = BloomFilter(100)
+        with mock.patch("backends.email_filter.mark_recent_emails") as mark:
+            await email_filter.add("a@example.com", "b@example.com")
+        assert "a@example.com" in email_filter.bloom
+        assert "b@example.com" in email_filter.bloom
+        mark.assert_called_once_with(
+            mock_redis_client, ("a@example.com", "b@example.com"), 60
+        )
+
+    async def test_rebuild_streams_emails(self, mock_db_session, mock_redis_client):
+        async def rows():
+            for email in ("a@example.com", "b@example.com"):
+                yield mock.Mock(email=email)
+
+        mock_db_session.scalar = mock.AsyncMock(return_value=2)
+        mock_db_session.stream = mock.AsyncMock(return_value=rows())
+        session_ctx = mock.MagicMock()
+        session_ctx.__aenter__ = mock.AsyncMock(return_value=mock_db_session)
+        session_ctx.__aexit__ = mock.AsyncMock(return_value=False)
+
+        email_filter = EmailFilter(mock_redis_client)
+        bloom = await email_filter.rebuild(mock.Mock(return_value=session_ctx))
+
+        assert email_filter.bloom is bloom
+        assert bloom.count == 2
+        assert "a@example.com" in bloom
@@ -0,0 +1,43 @@
+from helpers.cache import ExpiringLRUCache
+
+
+class TestExpiringLRUCache:
+    """Test bounded LRU cache with per-entry expiry"""
+
+    def test_get_set(self):
+        cache = ExpiringLRUCache(maxsize=2)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_expiry(self):
+        cache = ExpiringLRUCache()
+        cache.set("a", 1, expires=100)
+        assert cache.get("a", now=99) == 1
+        assert cache.get("a", now=100) is None
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used(self):
+        cache = ExpiringLRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_disabled(self):
+        cache = ExpiringLRUCache(maxsize=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+    def test_delete_and_clear(self):
+        cache = ExpiringLRUCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.delete("a")
+        assert cache.get("a") is None
+        cache.clear()
+        assert len(cache) == 0
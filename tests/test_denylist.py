@@ -0,0 +1,117 @@
+import asyncio
+import time
+from unittest import mock
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+from app import middlewares
+from backends.denylist import TokenDenylist, parse_revocation, sync_token_denylist
+from backends.redis import load_revoked_tokens
+from helpers.utils import gen_token_for_user
+
+
+class TestTokenDenylist:
+    """Test the local revoked token copy"""
+
+    def test_expired_entries(self):
+        denylist = TokenDenylist()
+        denylist.add("live", time.time() + 60)
+        denylist.add("dead", time.time() - 1)
+        assert "live" in denylist
+        assert "dead" not in denylist
+        assert "other" not in denylist
+        denylist.purge()
+        assert len(denylist) == 1
+
+    def test_parse_revocation(self):
+        assert parse_revocation(b"abc 1700000000") == ("abc", 1700000000)
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = messages
+        self.subscribe = mock.AsyncMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        await asyncio.Event().wait()
+
+
+class TestDenylistSync:
+    """Test pub/sub mirroring of Redis revocations"""
+
+    async def test_snapshot_then_messages(self, mock_redis_client):
+        exp = int(time.time()) + 60
+        pubsub = FakePubSub(
+            [
+                {"type": "subscribe", "data": 1},
+                {"type": "message", "data": f"new {exp}".encode()},
+            ]
+        )
+        mock_redis_client.pubsub = mock.Mock(return_value=pubsub)
+        app = {"redis": mock_redis_client, "token_denylist": TokenDenylist()}
+
+        with mock.patch(
+            "backends.denylist.load_revoked_tokens",
+            mock.AsyncMock(return_value={"old": exp}),
+        ):
+            task = asyncio.create_task(sync_token_denylist(app))
+            for _ in range(5):
+                await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        pubsub.subscribe.assert_called_once_with("revoked_tokens")
+        assert "old" in app["token_denylist"]
+        assert "new" in app["token_denylist"]
+
+    async def test_load_revoked_tokens(self, mock_redis_client):
+        async def scan_iter(**kwargs):
+            for key in (b"revoked:a", b"revoked:b"):
+                yield key
+
+        mock_redis_client.scan_iter = scan_iter
+        mock_redis_client.mget = mock.AsyncMock(return_value=[b"1700000000", None])
+        assert await load_revoked_tokens(mock_redis_client) == {"a": 1700000000}
+
+
+class TestRevokedTokenMiddleware:
+    """Test revoked tokens are rejected with and without the claims cache"""
+
+    async def test_revoked_token(self):
+        token = (await gen_token_for_user({"id": 1, "email": "a@example.com"}))[
+            "access_token"
+        ]
+        app = web.Application()
+        app["token_denylist"] = TokenDenylist()
+
+        async def handler(request):
+            return request.get("user")
+
+        def request():
+            return make_mocked_request(
+                "GET", "/", headers={"Authorization": f"Bearer {token}"}, app=app
+            )
+
+        middlewares.jwt_cache.clear()
+        claims = await middlewares.cached_jwt_middleware(request(), handler)
+        app["token_denylist"].add(claims["jti"], claims["exp"])
+
+        # served from the claims cache
+        with pytest.raises(web.HTTPForbidden):
+            await middlewares.cached_jwt_middleware(request(), handler)
+
+        # verified again by aiohttp_jwt
+        middlewares.jwt_cache.clear()
+        with pytest.raises(web.HTTPForbidden):
+            await middlewares.cached_jwt_middleware(request(), handler)
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+from aiohttp import web
+
+from app.docs import build_spec, setup_docs
+
+pytest.importorskip("aiohttp_apispec")
+
+
+@pytest.fixture(scope="module")
+def spec():
+    return build_spec()
+
+
+def test_build_spec(spec):
+    assert spec["info"]["title"] == "Auth documentation"
+    assert "post" in spec["paths"]["/auth/v1/login"]
+    assert set(spec["paths"]["/auth/v1/users/{id}"]) >= {"get", "put", "delete"}
+
+
+async def test_docs_app_serves_built_spec(aiohttp_client, tmp_path, spec):
+    spec_file = tmp_path / "openapi.json"
+    spec_file.write_text(json.dumps(spec))
+    app = web.Application()
+    setup_docs(app, spec_file)
+    client = await aiohttp_client(app)
+
+    resp = await client.get("/auth/v1/docs/swagger.json")
+    assert resp.status == 200
+    assert await resp.json() == spec
+
+    resp = await client.get("/auth/v1/docs")
+    assert resp.status == 200
+    page = await resp.text()
+    assert 'url: "/auth/v1/docs/swagger.json"' in page
+    assert "/auth/v1/docs/static/swagger-ui.css" in page
+
+    resp = await client.get("/auth/v1/docs/static/swagger-ui.css")
+    assert resp.status == 200
+
+
+async def test_missing_spec(aiohttp_client, tmp_path):
+    app = web.Application()
+    setup_docs(app, tmp_path / "missing.json")
+    client = await aiohttp_client(app)
+    resp = await client.get("/auth/v1/docs/swagger.json")
+    assert resp.status == 404
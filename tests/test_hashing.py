@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+import pytest
+
+from backends.hashing import (
+    HashingExecutor,
+    close_hashing,
+    init_hashing,
+    setup_hashing,
+)
+from helpers.errors import HashingQueueFull
+from helpers.passwords import check_password, hash_password
+from helpers.utils import generate_password_hash
+
+
+class TestHashingExecutor:
+    """Test password hashing worker pool"""
+
+    async def test_run_returns_result_and_records_timing(self):
+        executor = HashingExecutor(max_workers=1)
+        try:
+            res = await executor.run(hash_password, "secret")
+        finally:
+            await executor.shutdown()
+        assert check_password("secret", res) == (True, False)
+        assert executor.calls == 1
+        assert executor.pending == 0
+        assert executor.total_time > 0
+        assert executor.max_time == executor.total_time
+
+    async def test_run_rejects_when_queue_is_full(self):
+        executor = HashingExecutor(max_workers=1, max_pending=1)
+        release = threading.Event()
+        try:
+            blocked = asyncio.ensure_future(executor.run(release.wait))
+            await asyncio.sleep(0)
+            with pytest.raises(HashingQueueFull):
+                await executor.run(hash_password, "secret")
+            release.set()
+            await blocked
+        finally:
+            release.set()
+            await executor.shutdown()
+        assert executor.rejected == 1
+        assert executor.calls == 1
+
+    async def test_process_pool(self):
+        executor = HashingExecutor(kind="process", max_workers=1)
+        try:
+            res = await executor.run(hash_password, "secret")
+        finally:
+            await executor.shutdown()
+        assert check_password("secret", res) == (True, False)
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            HashingExecutor(kind="gpu")
+
+    async def test_generate_password_hash_uses_executor(self):
+        executor = HashingExecutor(max_workers=1)
+        try:
+            hashed = await generate_password_hash("secret", executor)
+        finally:
+            await executor.shutdown()
+        assert check_password("secret", hashed) == (True, False)
+        assert executor.calls == 1
+
+    async def test_init_and_close_hashing(self):
+        app = {"hashing_config": {"kind": "thread", "max_workers": 2}}
+        await init_hashing(app)
+        assert isinstance(app["hashing"], HashingExecutor)
+        await close_hashing(app)
+
+    def test_setup_hashing(self):
+        class MockApp(dict):
+            def __init__(self):
+                super().__init__()
+                self.on_startup = []
+                self.on_cleanup = []
+
+        app = MockApp()
+        setup_hashing(app, kind="process", max_workers=4, max_pending=8)
+        assert app["hashing_config"] == {
+            "kind": "process",
+            "max_workers": 4,
+            "max_pending": 8,
+        }
+        assert app.on_startup == [init_hashing]
+        assert app.on_cleanup == [close_hashing]
@@ -0,0 +1,58 @@
+import json
+from datetime import UTC, datetime
+
+import pytest
+
+from helpers.json_codec import default, get_codec, json_response
+
+DATA = {
+    "id": 1,
+    "email": "user@example.com",
+    "created": datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC),
+    "last_login": None,
+}
+
+
+class TestJsonCodec:
+    """Test pluggable JSON codec"""
+
+    def test_stdlib_serializes_datetime(self):
+        dumps, loads = get_codec("json")
+        res = dumps(DATA)
+        assert isinstance(res, bytes)
+        assert loads(res)["created"] == "2024-01-02T03:04:05+00:00"
+
+    def test_orjson_matches_stdlib(self):
+        pytest.importorskip("orjson")
+        stdlib_dumps, _ = get_codec("json")
+        dumps, loads = get_codec("orjson")
+        assert loads(dumps(DATA)) == json.loads(stdlib_dumps(DATA))
+
+    def test_module_returning_str_is_encoded(self):
+        dumps, loads = get_codec("json")
+        module_dumps, module_loads = get_codec("tests.test_json_codec")
+        assert module_dumps(DATA) == dumps(DATA)
+        assert module_loads is loads_str
+
+    def test_default_rejects_unknown_types(self):
+        with pytest.raises(TypeError):
+            default(object())
+
+    def test_json_response(self):
+        resp = json_response(DATA, status=201, headers={"X-Test": "1"})
+        assert resp.status == 201
+        assert resp.content_type == "application/json"
+        assert resp.headers["X-Test"] == "1"
+        assert json.loads(resp.body)["email"] == "user@example.com"
+
+
+# lets this module act as a third party codec in the test above
+def dumps(obj, default=None):
+    return json.dumps(obj, default=default)
+
+
+def loads_str(s):
+    return json.loads(s)
+
+
+loads = loads_str
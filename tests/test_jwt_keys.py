@@ -0,0 +1,145 @@
+import jwt
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+from app import middlewares
+from helpers.jwt_keys import jwk_thumbprint, load_keyring
+
+pytest.importorskip("cryptography")
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa  # noqa: E402
+
+
+def write_private_key(path, key):
+    path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    return str(path)
+
+
+def write_public_key(path, key):
+    path.write_bytes(
+        key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def rotated_keyring(tmp_path, rsa_key):
+    """EdDSA signing key with the previous RS256 key kept for verification"""
+    new_key = ed25519.Ed25519PrivateKey.generate()
+    return load_keyring(
+        "EdDSA",
+        "secret",
+        write_private_key(tmp_path / "new.pem", new_key),
+        [write_public_key(tmp_path / "old.pub", rsa_key)],
+    )
+
+
+class TestKeyRing:
+    """Test token signing keys and rotation"""
+
+    def test_rfc7638_thumbprint(self):
+        jwk = {
+            "kty": "RSA",
+            "n": "0vx7agoebGcQSuuPiLJXZptN9nndrQmbXEps2aiAFbWhM78LhWx4cbbfAAtVT86zwu1RK7aPFFx"
+            "uhDR1L6tSoc_BJECPebWKRXjBZCiFV4n3oknjhMstn64tZ_2W-5JsGY4Hc5n9yBXArwl93lqt7_RN"
+            "5w6Cf0h4QyQ5v-65YGjQR0_FDW2QvzqY368QQMicAtaSqzs8KJZgnYb9c7d0zgdAZHzu6qMQvRL5"
+            "hajrn1n91CbOpbISD08qNLyrdkt-bFTWhAI4vMQFh6WeZu0fM4lFd2NcRwr3XPksINHaQ-G_xBniI"
+            "qbw0Ls1jF44-csFCur-kEgU8awapJzKnqDKgw",
+            "e": "AQAB",
+            "alg": "RS256",
+            "kid": "2011-04-29",
+        }
+        assert jwk_thumbprint(jwk) == "NzbLsXh8uDCcd-6MNwXF4W_7noWXFZAfHkxZsRGC9Xs"
+
+    def test_hmac_has_no_kid_or_jwks(self):
+        keyring = load_keyring("HS256", "secret")
+        token = keyring.encode({"user_id": 1})
+        assert "kid" not in jwt.get_unverified_header(token)
+        assert keyring.decode(token) == {"user_id": 1}
+        assert keyring.jwks() == {"keys": []}
+
+    def test_asymmetric_requires_private_key(self):
+        with pytest.raises(ValueError):
+            load_keyring("RS256", "secret")
+
+    def test_sign_with_kid_and_verify_rotated_key(self, rotated_keyring, rsa_key):
+        token = rotated_keyring.encode({"user_id": 1})
+        header = jwt.get_unverified_header(token)
+        assert header["alg"] == "EdDSA"
+        assert header["kid"] == rotated_keyring.default.kid
+        assert rotated_keyring.decode(token) == {"user_id": 1}
+
+        old_kid = next(kid for kid in rotated_keyring.keys if kid != header["kid"])
+        old_token = jwt.encode(
+            {"user_id": 2}, rsa_key, "RS256", headers={"kid": old_kid}
+        )
+        assert rotated_keyring.decode(old_token) == {"user_id": 2}
+
+    def test_unknown_key_is_rejected(self, rotated_keyring):
+        other = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        token = jwt.encode({"user_id": 1}, other, "RS256", headers={"kid": "nope"})
+        with pytest.raises(jwt.InvalidTokenError):
+            rotated_keyring.decode(token)
+
+    def test_jwks(self, rotated_keyring):
+        keys = rotated_keyring.jwks()["keys"]
+        assert [(key["kty"], key["alg"]) for key in keys] == [
+            ("OKP", "EdDSA"),
+            ("RSA", "RS256"),
+        ]
+        assert all(key["use"] == "sig" and "d" not in key for key in keys)
+        assert [key["kid"] for key in keys] == list(rotated_keyring.keys)
+
+    async def test_middleware_verifies_with_the_token_key(
+        self, monkeypatch, rotated_keyring, rsa_key
+    ):
+        verifiers = {
+            key.kid: middlewares.JWTMiddleware(
+                secret_or_pub_key=key.pem,
+                request_property="user",
+                algorithms=[key.algorithm],
+                credentials_required=False,
+            )
+            for key in rotated_keyring.keys.values()
+        }
+        monkeypatch.setattr(middlewares, "keyring", rotated_keyring)
+        monkeypatch.setattr(middlewares, "jwt_verifiers", verifiers)
+        middlewares.jwt_cache.clear()
+
+        async def handler(request):
+            return request.get("user")
+
+        old_kid = list(rotated_keyring.keys)[1]
+        for token in (
+            rotated_keyring.encode({"user_id": 1}),
+            jwt.encode({"user_id": 1}, rsa_key, "RS256", headers={"kid": old_kid}),
+        ):
+            request = make_mocked_request(
+                "GET", "/", headers={"Authorization": f"Bearer {token}"}
+            )
+            assert await middlewares.cached_jwt_middleware(request, handler) == {
+                "user_id": 1
+            }
+
+        forged = jwt.encode({"user_id": 1}, "secret", "HS256", headers={"kid": old_kid})
+        request = make_mocked_request(
+            "GET", "/", headers={"Authorization": f"Bearer {forged}"}
+        )
+        with pytest.raises(web.HTTPUnauthorized):
+            await middlewares.cached_jwt_middleware(request, handler)
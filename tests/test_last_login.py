@@ -0,0 +1,81 @@
+import asyncio
+from datetime import UTC, datetime
+from unittest import mock
+
+import pytest
+
+from backends.last_login import LastLoginBuffer, close_last_login_buffer
+
+T1 = datetime(2024, 1, 1, tzinfo=UTC)
+T2 = datetime(2024, 1, 2, tzinfo=UTC)
+
+
+def session_factory(session):
+    ctx = mock.MagicMock()
+    ctx.__aenter__ = mock.AsyncMock(return_value=session)
+    ctx.__aexit__ = mock.AsyncMock(return_value=False)
+    return mock.Mock(return_value=ctx)
+
+
+class TestLastLoginBuffer:
+    """Test write-behind of login times"""
+
+    def test_keeps_latest_login_per_user(self):
+        buffer = LastLoginBuffer(batch_size=10)
+        buffer.record(1, T1)
+        buffer.record(1, T2)
+        assert len(buffer) == 1
+        assert not buffer.full.is_set()
+
+    def test_bounded(self):
+        buffer = LastLoginBuffer(batch_size=2, max_pending=2)
+        assert buffer.record(1, T1)
+        assert buffer.record(2, T1)
+        assert buffer.full.is_set()
+        assert not buffer.record(3, T1)
+        # users already waiting are still updated
+        assert buffer.record(1, T2)
+        assert (len(buffer), buffer.dropped) == (2, 1)
+
+    async def test_flush_in_batches(self):
+        buffer = LastLoginBuffer(batch_size=2)
+        for user_id in range(5):
+            buffer.record(user_id, T1)
+        with mock.patch(
+            "backends.last_login.update_latest_values", mock.AsyncMock()
+        ) as update:
+            assert await buffer.flush(session_factory(mock.AsyncMock())) == 5
+        assert [len(call.args[3]) for call in update.call_args_list] == [2, 2, 1]
+        assert update.call_args.args[2] == "last_login"
+        assert len(buffer) == 0
+
+    async def test_failed_flush_keeps_newer_logins(self):
+        buffer = LastLoginBuffer(batch_size=1)
+        buffer.record(1, T1)
+        buffer.record(2, T1)
+
+        async def fail(session, obj, attribute, rows):
+            buffer.record(2, T2)
+            raise ConnectionError
+
+        with mock.patch("backends.last_login.update_latest_values", fail):
+            with pytest.raises(ConnectionError):
+                await buffer.flush(session_factory(mock.AsyncMock()))
+        assert buffer._pending == {1: T1, 2: T2}
+
+    async def test_final_flush_on_shutdown(self):
+        buffer = LastLoginBuffer()
+        buffer.record(1, T1)
+        task = asyncio.create_task(asyncio.Event().wait())
+        app = {
+            "last_login_buffer": buffer,
+            "last_login_task": task,
+            "db_session": session_factory(mock.AsyncMock()),
+        }
+        with mock.patch(
+            "backends.last_login.update_latest_values", mock.AsyncMock()
+        ) as update:
+            await close_last_login_buffer(app)
+        assert task.cancelled()
+        update.assert_called_once()
+        assert update.call_args.args[3] == [(1, T1)]
@@ -0,0 +1,95 @@
+import argparse
+
+import pytest
+
+from scripts.loadgen import RouteStats, parse_mix, percentile, print_report
+
+
+class TestParseMix:
+    """Test the --mix argument of the load generator"""
+
+    def test_weights(self):
+        assert parse_mix("login=60, refresh=40") == {"login": 60.0, "refresh": 40.0}
+
+    @pytest.mark.parametrize(
+        "value", ["login=", "login=lots", "login=-1", "login=nan", "login=inf"]
+    )
+    def test_bad_weight(self, value):
+        with pytest.raises(argparse.ArgumentTypeError, match="bad weight"):
+            parse_mix(value)
+
+    @pytest.mark.parametrize("value", ["logout=10", "login=10,=5", ""])
+    def test_unknown_route(self, value):
+        with pytest.raises(argparse.ArgumentTypeError, match="unknown route"):
+            parse_mix(value)
+
+    def test_no_weight(self):
+        with pytest.raises(argparse.ArgumentTypeError, match="no weight"):
+            parse_mix("login=0,users=0")
+
+
+class TestPercentile:
+    """Test the nearest-rank percentile"""
+
+    def test_empty(self):
+        assert percentile([], 99) == 0.0
+
+    @pytest.mark.parametrize("pct", [50, 99, 99.9])
+    def test_single_sample(self, pct):
+        assert percentile([0.25], pct) == 0.25
+
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 95) == 95
+        assert percentile(values, 99.9) == 100
+
+    def test_p99_9_needs_a_thousand_samples(self):
+        values = list(range(1, 2001))
+        assert percentile(values, 99) == 1980
+        assert percentile(values, 99.9) == 1998
+
+
+class TestReport:
+    """Test the summary of each route and the printed report"""
+
+    def test_summary(self):
+        stats = RouteStats()
+        for status, elapsed in [(200, 0.004), (200, 0.001), (404, 0.002), (500, 0.1)]:
+            stats.record(status, elapsed)
+        summary = stats.summary(duration=2)
+        assert summary["requests"] == 4
+        assert summary["errors"] == 2
+        assert summary["rps"] == 2.0
+        assert summary["statuses"] == {"200": 2, "404": 1, "500": 1}
+        assert summary["p50_ms"] == pytest.approx(2)
+        assert summary["p99.9_ms"] == pytest.approx(100)
+        assert summary["max_ms"] == pytest.approx(100)
+
+    def test_empty_summary(self):
+        summary = RouteStats().summary(duration=0)
+        assert summary["requests"] == 0
+        assert summary["rps"] == 0.0
+        assert summary["p99_ms"] == summary["max_ms"] == 0.0
+
+    def test_print_report(self, capsys):
+        stats = RouteStats()
+        stats.record(200, 0.003)
+        print_report(
+            {
+                "routes": {
+                    "login": stats.summary(duration=1),
+                    "users": RouteStats().summary(duration=1),
+                },
+                "rate_limited": 7,
+            }
+        )
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].split() == [
+            "route", "requests", "errors", "req/s",
+            "p50", "ms", "p95", "ms", "p99", "ms", "p99.9", "ms", "max", "ms",
+        ]  # fmt: skip
+        assert lines[1].split() == ["login", "1", "0", "1.0", *["3.00"] * 5]
+        assert lines[2].split() == ["users", "0", "0", "0.0", *["0.00"] * 5]
+        assert "total throughput 1.0 req/s" in lines
+        assert lines[-1] == "rate limited (429, not counted above) 7"
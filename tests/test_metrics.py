@@ -0,0 +1,142 @@
+from unittest import mock
+
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request, unused_port
+
+from app.metrics import setup_metrics, start_metrics_server, stop_metrics_server
+from app.middlewares import metrics_middleware
+from helpers.metrics import (
+    HTTP_REQUESTS,
+    HTTP_REQUESTS_IN_PROGRESS,
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    timed,
+)
+
+
+class TestMetricTypes:
+    """Test Prometheus text exposition"""
+
+    def test_counter(self):
+        counter = Counter("requests_total", "Requests", ("route",))
+        counter.inc("login")
+        counter.inc("login", value=2)
+        assert counter.get("login") == 3
+        assert counter.render() == [
+            "# HELP requests_total Requests",
+            "# TYPE requests_total counter",
+            'requests_total{route="login"} 3',
+        ]
+
+    def test_gauge(self):
+        gauge = Gauge("in_progress", "In progress")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert gauge.get() == 1
+        gauge.set(value=5)
+        assert gauge.render()[-1] == "in_progress 5"
+
+    def test_histogram(self):
+        histogram = Histogram("latency", "Latency", ("route",), buckets=(0.1, 1))
+        histogram.observe(0.1, "login")
+        histogram.observe(0.5, "login")
+        histogram.observe(5, "login")
+        assert histogram.count("login") == 3
+        assert histogram.render()[2:] == [
+            'latency_bucket{route="login",le="0.1"} 1',
+            'latency_bucket{route="login",le="1"} 2',
+            'latency_bucket{route="login",le="+Inf"} 3',
+            'latency_sum{route="login"} 5.6',
+            'latency_count{route="login"} 3',
+        ]
+
+    def test_registry(self):
+        registry = Registry()
+        registry.register(Counter("a_total", "A")).inc()
+        assert registry.render().endswith("a_total 1\n")
+
+    async def test_timed(self):
+        histogram = Histogram("call", "Call", ("operation",))
+
+        @timed(histogram, "op")
+        async def call():
+            return 42
+
+        assert await call() == 42
+        assert histogram.count("op") == 1
+
+
+class TestMetricsMiddleware:
+    """Test per route request metrics"""
+
+    @staticmethod
+    def make_request(name):
+        request = make_mocked_request("GET", "/auth/v1/login")
+        route = mock.Mock()
+        route.name = name
+        request._match_info = mock.Mock(route=route)
+        return request
+
+    async def test_records_status(self):
+        before = HTTP_REQUESTS.get("test_ok", "GET", 201)
+
+        async def handler(request):
+            assert HTTP_REQUESTS_IN_PROGRESS.get("test_ok") == 1
+            return web.Response(status=201)
+
+        await metrics_middleware(self.make_request("test_ok"), handler)
+        assert HTTP_REQUESTS.get("test_ok", "GET", 201) == before + 1
+        assert HTTP_REQUESTS_IN_PROGRESS.get("test_ok") == 0
+
+    async def test_records_http_exception(self):
+        async def handler(request):
+            raise web.HTTPNotFound()
+
+        try:
+            await metrics_middleware(self.make_request(None), handler)
+        except web.HTTPNotFound:
+            pass
+        assert HTTP_REQUESTS.get("unmatched", "GET", 404) >= 1
+
+
+class TestMetricsEndpoint:
+    """Test /metrics exposition"""
+
+    async def test_metrics_on_main_router(self, aiohttp_client):
+        app = web.Application()
+        setup_metrics(app)
+        client = await aiohttp_client(app)
+        resp = await client.get("/metrics")
+        assert resp.status == 200
+        assert resp.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE http_requests_total counter" in await resp.text()
+
+    async def test_metrics_on_own_listener(self, aiohttp_client):
+        app = web.Application()
+        port = unused_port()
+        setup_metrics(app, host="127.0.0.1", port=port)
+        assert app.router.named_resources().get("metrics") is None
+        await start_metrics_server(app)
+        try:
+            client = await aiohttp_client(web.Application())
+            async with client.session.get(f"http://127.0.0.1:{port}/metrics") as resp:
+                assert resp.status == 200
+        finally:
+            await stop_metrics_server(app)
+
+
+def test_db_queries_are_observed():
+    from sqlalchemy import create_engine, text
+
+    from backends.db import observe_queries
+    from helpers.metrics import DB_QUERY_DURATION
+
+    engine = create_engine("sqlite://")
+    observe_queries(engine)
+    before = DB_QUERY_DURATION.count("SELECT")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert DB_QUERY_DURATION.count("SELECT") == before + 1
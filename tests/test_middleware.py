@@ -1,5 +1,7 @@
 from unittest import mock
 
+import pytest
+
 from app import middlewares
 from helpers import errors
 
@@ -43,3 +45,97 @@ async def test_error_middleware_403():
             request=errors.UserIsNotActivated, handler=handler_func
         )
     assert res == 403
+
+
+async def test_error_middleware_503():
+    with mock.patch("app.middlewares.handle_http_error", handle_http_error):
+        res = await middlewares.error_middleware(
+            request=errors.HashingQueueFull, handler=handler_func
+        )
+    assert res == 503
+
+
+class TestCachedJWTMiddleware:
+    """Test verified token claims cache"""
+
+    @staticmethod
+    async def make_token(**claims):
+        from helpers.utils import gen_token_for_user
+
+        token = await gen_token_for_user({"id": 1, "email": "a@example.com", **claims})
+        return token["access_token"]
+
+    @staticmethod
+    def make_request(token):
+        from aiohttp.test_utils import make_mocked_request
+
+        return make_mocked_request(
+            "GET", "/auth/v1/users", headers={"Authorization": f"Bearer {token}"}
+        )
+
+    @staticmethod
+    async def handler(request):
+        return request.get("user")
+
+    def setup_method(self):
+        middlewares.jwt_cache.clear()
+        middlewares.jwt_cache.hits = middlewares.jwt_cache.misses = 0
+
+    async def test_second_request_is_served_from_cache(self):
+        token = await self.make_token()
+        first = await middlewares.cached_jwt_middleware(
+            self.make_request(token), self.handler
+        )
+        with mock.patch("jwt.decode") as decode:
+            second = await middlewares.cached_jwt_middleware(
+                self.make_request(token), self.handler
+            )
+        decode.assert_not_called()
+        assert first == second
+        assert first["user_id"] == 1
+        assert middlewares.jwt_cache.hits == 1
+
+    async def test_expired_entry_goes_through_verification(self):
+        import hashlib
+        import time
+
+        from aiohttp import web
+
+        from helpers.jwt_keys import keyring
+
+        exp = int(time.time()) - 1
+        token = keyring.encode({"user_id": 1, "exp": exp})
+        key = hashlib.sha256(token.encode()).digest()
+        middlewares.jwt_cache.set(key, {"user_id": 1, "exp": exp}, exp)
+        with pytest.raises(web.HTTPUnauthorized):
+            await middlewares.cached_jwt_middleware(
+                self.make_request(token), self.handler
+            )
+
+    async def test_invalid_token_is_not_cached(self):
+        from aiohttp import web
+
+        for _ in range(2):
+            with pytest.raises(web.HTTPUnauthorized):
+                await middlewares.cached_jwt_middleware(
+                    self.make_request("asdf.qwer.zxcv"), self.handler
+                )
+        assert len(middlewares.jwt_cache) == 0
+
+    async def test_malformed_header_keeps_jwt_middleware_semantics(self):
+        from aiohttp import web
+        from aiohttp.test_utils import make_mocked_request
+
+        request = make_mocked_request(
+            "GET", "/", headers={"Authorization": "Bearer a b"}
+        )
+        with pytest.raises(web.HTTPForbidden):
+            await middlewares.cached_jwt_middleware(request, self.handler)
+
+    async def test_no_token(self):
+        from aiohttp.test_utils import make_mocked_request
+
+        res = await middlewares.cached_jwt_middleware(
+            make_mocked_request("GET", "/"), self.handler
+        )
+        assert res is None
@@ -0,0 +1,111 @@
+import pytest
+
+from helpers.passwords import (
+    HASHERS,
+    LegacyPBKDF2Hasher,
+    PBKDF2SHA256Hasher,
+    PBKDF2SHA512Hasher,
+    calibrate,
+    check_password,
+    dummy_check_password,
+    get_hasher,
+    hash_password,
+    identify_hasher,
+)
+from helpers.utils import (
+    generate_password_hash,
+    generate_password_hashes,
+    verify_password,
+)
+
+
+class TestHashers:
+    """Test encoded password hash format"""
+
+    def test_encode_format(self):
+        encoded = PBKDF2SHA256Hasher(1000).encode("secret", "salt")
+        algorithm, iterations, salt, digest = encoded.split("$")
+        assert algorithm == "pbkdf2_sha256"
+        assert iterations == "1000"
+        assert salt == "salt"
+        assert digest
+
+    def test_salt_is_per_hash(self):
+        hasher = PBKDF2SHA256Hasher(1000)
+        assert hasher.encode("secret") != hasher.encode("secret")
+
+    def test_verify(self):
+        hasher = PBKDF2SHA512Hasher(1000)
+        encoded = hasher.encode("secret")
+        assert hasher.verify("secret", encoded)
+        assert not hasher.verify("wrong", encoded)
+
+    def test_must_update(self):
+        encoded = PBKDF2SHA256Hasher(1000).encode("secret")
+        assert PBKDF2SHA256Hasher(2000).must_update(encoded)
+        assert not PBKDF2SHA256Hasher(1000).must_update(encoded)
+
+    def test_registry(self):
+        assert set(HASHERS) == {"pbkdf2_sha256", "pbkdf2_sha512"}
+        assert isinstance(get_hasher("pbkdf2_sha512", 1000), PBKDF2SHA512Hasher)
+        with pytest.raises(ValueError):
+            get_hasher("md5", 1)
+
+    def test_identify_hasher(self):
+        hasher = identify_hasher(PBKDF2SHA512Hasher(1234).encode("secret"))
+        assert isinstance(hasher, PBKDF2SHA512Hasher)
+        assert hasher.iterations == 1234
+        assert isinstance(identify_hasher("bGVnYWN5"), LegacyPBKDF2Hasher)
+        with pytest.raises(ValueError):
+            identify_hasher("md5$1$salt$digest")
+
+
+class TestCheckPassword:
+    """Test verification and rehash detection"""
+
+    def test_current_hash(self):
+        assert check_password("secret", hash_password("secret")) == (True, False)
+        assert check_password("wrong", hash_password("secret")) == (False, False)
+
+    def test_outdated_iterations(self):
+        encoded = PBKDF2SHA256Hasher(1000).encode("secret")
+        assert check_password("secret", encoded) == (True, True)
+
+    def test_other_algorithm(self):
+        encoded = PBKDF2SHA512Hasher(1000).encode("secret")
+        assert check_password("secret", encoded) == (True, True)
+
+    def test_legacy_hash(self):
+        encoded = LegacyPBKDF2Hasher().encode("secret")
+        assert "$" not in encoded
+        assert check_password("secret", encoded) == (True, True)
+        assert check_password("wrong", encoded) == (False, False)
+
+    def test_unknown_format(self):
+        assert check_password("secret", "md5$1$salt$digest") == (False, False)
+
+    def test_truncated_hash(self):
+        assert check_password("x", "pbkdf2_sha256$1000") == (False, False)
+        assert check_password("x", "pbkdf2_sha256$") == (False, False)
+        assert check_password("x", "pbkdf2_sha256$ten$salt$digest") == (False, False)
+
+    def test_dummy_check_is_never_valid(self):
+        assert dummy_check_password("secret") == (False, False)
+
+    async def test_async_helpers(self):
+        encoded = await generate_password_hash("secret")
+        assert await verify_password("secret", encoded) == (True, False)
+
+
+async def test_generate_password_hashes_keeps_order():
+    passwords = [f"secret{i}" for i in range(5)]
+    hashes = await generate_password_hashes(passwords, chunk_size=2)
+    assert len(hashes) == 5
+    for password, encoded in zip(passwords, hashes, strict=True):
+        assert check_password(password, encoded) == (True, False)
+
+
+def test_calibrate():
+    iterations, elapsed = calibrate(target_seconds=0.005, samples=1)
+    assert iterations >= 1000
+    assert elapsed > 0
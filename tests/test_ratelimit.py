@@ -0,0 +1,155 @@
+from unittest import mock
+
+import pytest
+from aiohttp import web
+
+from app.middlewares import setup_middlewares
+from backends.ratelimit import (
+    RateLimiter,
+    TokenBuckets,
+    check_rate_limits,
+    parse_rate_limits,
+    rate_limit_key,
+)
+from helpers.json_codec import loads
+from helpers.utils import validate_request
+from schemas.users import schemas
+
+
+class TestRateLimitConfig:
+    """Test per route limit parsing"""
+
+    def test_parse(self):
+        limits = parse_rate_limits(
+            "login:ip=30/60, login:email=10/300,register:ip=5/3600"
+        )
+        assert limits == {
+            "login": [("ip", 30, 60), ("email", 10, 300)],
+            "register": [("ip", 5, 3600)],
+        }
+        assert parse_rate_limits("") == {}
+
+    @pytest.mark.parametrize("value", ["login=30/60", "login:ip=30", "login:user=1/1"])
+    def test_parse_errors(self, value):
+        with pytest.raises(ValueError):
+            parse_rate_limits(value)
+
+
+class TestTokenBuckets:
+    """Test the in-process pre-filter"""
+
+    def test_rejects_when_empty_and_refills(self):
+        buckets = TokenBuckets()
+        assert [buckets.take("k", 2, 10, now=100) for _ in range(3)] == [0, 0, 5]
+        assert buckets.take("k", 2, 10, now=105) == 0
+        assert buckets.take("other", 2, 10, now=105) == 0
+
+
+class TestSlidingWindow:
+    """Test the Redis sliding window call"""
+
+    async def test_keys_and_args(self, mock_redis_client):
+        script = mock.AsyncMock(return_value=1500)
+        mock_redis_client.register_script = mock.Mock(return_value=script)
+        retry = await check_rate_limits(
+            mock_redis_client, [("a", 10, 60), ("b", 5, 300)], now=600.5
+        )
+        assert retry == 2
+        script.assert_called_once_with(
+            keys=["a:10", "a:9", "b:2", "b:1"],
+            args=[600500, 10, 60000, 5, 300000],
+        )
+
+
+class TestRateLimiter:
+    """Test limit checks"""
+
+    async def test_checks_every_scope_with_identity(self, mock_redis_client):
+        limiter = RateLimiter(
+            mock_redis_client, {"login": [("ip", 5, 60), ("email", 3, 60)]}
+        )
+        with mock.patch(
+            "backends.ratelimit.check_rate_limits", mock.AsyncMock(return_value=0)
+        ) as check:
+            assert await limiter.check("login", {"ip": "1.2.3.4", "email": None}) == 0
+            assert await limiter.check("register", {"ip": "1.2.3.4"}) == 0
+        checks = check.call_args.args[1]
+        assert checks == [(rate_limit_key("login", "ip", "1.2.3.4", 60), 5, 60)]
+        check.assert_called_once()
+
+    async def test_fails_open_without_redis(self, mock_redis_client):
+        limiter = RateLimiter(mock_redis_client, {"login": [("ip", 5, 60)]})
+        with mock.patch(
+            "backends.ratelimit.check_rate_limits",
+            mock.AsyncMock(side_effect=ConnectionError),
+        ):
+            assert await limiter.check("login", {"ip": "1.2.3.4"}) == 0
+
+    def test_client_ip_behind_proxy(self, mock_redis_client):
+        request = mock.Mock(
+            remote="10.0.0.1", headers={"X-Forwarded-For": "6.6.6.6, 1.2.3.4"}
+        )
+        assert RateLimiter(mock_redis_client, {}).client_ip(request) == "10.0.0.1"
+        limiter = RateLimiter(mock_redis_client, {}, proxy_count=1)
+        assert limiter.client_ip(request) == "1.2.3.4"
+
+
+class TestRateLimitMiddleware:
+    """Test 429 responses"""
+
+    async def test_too_many_requests(self, aiohttp_client, mock_redis_client):
+        async def login(request):
+            return web.json_response(await request.json())
+
+        app = web.Application()
+        app.router.add_post("/login", login, name="login")
+        setup_middlewares(app)
+        app["rate_limiter"] = RateLimiter(
+            mock_redis_client, {"login": [("ip", 10, 60), ("email", 2, 60)]}
+        )
+
+        with mock.patch(
+            "backends.ratelimit.check_rate_limits", mock.AsyncMock(return_value=0)
+        ) as check:
+            client = await aiohttp_client(app)
+            statuses = []
+            for email in ("A@example.com", "a@example.com", "a@example.com "):
+                resp = await client.post("/login", json={"email": email})
+                statuses.append(resp.status)
+
+        assert statuses == [200, 200, 429]
+        assert resp.headers["Retry-After"] == "30"
+        assert "login" in (await resp.json())["message"]
+        assert check.call_count == 2
+
+    async def test_email_limit_decodes_body_once(
+        self, aiohttp_client, mock_redis_client
+    ):
+        async def login(request):
+            validated = await validate_request(request, schemas.login)
+            return web.json_response({"email": validated.email})
+
+        app = web.Application()
+        app.router.add_post("/login", login, name="login")
+        setup_middlewares(app)
+        app["rate_limiter"] = RateLimiter(
+            mock_redis_client, {"login": [("email", 10, 60)]}
+        )
+
+        with (
+            mock.patch(
+                "backends.ratelimit.check_rate_limits", mock.AsyncMock(return_value=0)
+            ),
+            mock.patch("helpers.utils.loads", wraps=loads) as decode,
+            mock.patch("helpers.utils.validate_json") as validate_json,
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.post(
+                "/login", json={"email": "a@example.com", "password": "secret"}
+            )
+
+        assert resp.status == 200
+        assert (await resp.json())["email"] == "a@example.com"
+        # validated from the body the email limit decoded, not parsed again
+        decode.assert_called_once()
+        validate_json.assert_not_called()
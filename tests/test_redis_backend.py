@@ -3,11 +3,19 @@ from unittest.mock import AsyncMock, MagicMock
 import pytest
 
 from backends.redis import (
+    ROTATE_REFRESH_SESSION,
     close_redis,
+    delete_refresh_session,
     get_redis_key,
+    get_refresh_session,
     init_redis,
+    list_user_sessions,
+    revoke_token,
+    revoke_user_sessions,
+    rotate_refresh_session,
     set_redis_key,
     setup_redis,
+    store_refresh_session,
 )
 
 
@@ -95,3 +103,91 @@ class TestRedisBackend:
         )
         assert result is True
         mock_redis_client.set.assert_called_once_with("test_key", "test_value", ex=100)
+
+
+def make_pipeline(redis_client, result=None):
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=result or [])
+    ctx = MagicMock()
+    ctx.__aenter__ = AsyncMock(return_value=pipe)
+    ctx.__aexit__ = AsyncMock(return_value=False)
+    redis_client.pipeline = MagicMock(return_value=ctx)
+    return pipe
+
+
+class TestRefreshSessions:
+    """Test jti keyed refresh sessions"""
+
+    async def test_store_refresh_session(self, mock_redis_client):
+        pipe = make_pipeline(mock_redis_client)
+        await store_refresh_session(mock_redis_client, "abc", 7, 100)
+        pipe.set.assert_any_call("refresh:abc", 7, ex=100)
+        pipe.set.assert_any_call("refresh_family:abc", "abc", ex=100)
+        pipe.sadd.assert_called_once_with("user_refresh:7", "abc")
+        pipe.expire.assert_called_once()
+        pipe.execute.assert_called_once()
+
+    async def test_store_refresh_session_family(self, mock_redis_client):
+        pipe = make_pipeline(mock_redis_client)
+        await store_refresh_session(mock_redis_client, "abc", 7, 100, family="fam")
+        pipe.set.assert_any_call("refresh_family:fam", "abc", ex=100)
+
+    async def test_rotate_refresh_session(self, mock_redis_client):
+        script = AsyncMock(return_value=1)
+        mock_redis_client.register_script = MagicMock(return_value=script)
+        res = await rotate_refresh_session(mock_redis_client, "old", "new", 7, "f", 50)
+        assert res == 1
+        mock_redis_client.register_script.assert_called_once_with(
+            ROTATE_REFRESH_SESSION
+        )
+        assert script.call_args.kwargs["keys"] == [
+            "refresh:old",
+            "refresh:new",
+            "refresh_family:f",
+            "user_refresh:7",
+        ]
+        assert script.call_args.kwargs["args"][:4] == ["old", "new", 7, 50]
+
+    async def test_get_refresh_session(self, mock_redis_client):
+        mock_redis_client.get.return_value = b"7"
+        assert await get_refresh_session(mock_redis_client, "abc") == b"7"
+        mock_redis_client.get.assert_called_once_with("refresh:abc")
+
+    async def test_delete_refresh_session(self, mock_redis_client):
+        pipe = make_pipeline(mock_redis_client)
+        await delete_refresh_session(mock_redis_client, "abc", 7)
+        pipe.delete.assert_called_once_with("refresh:abc")
+        pipe.srem.assert_called_once_with("user_refresh:7", "abc")
+
+    async def test_list_user_sessions_prunes_stale(self, mock_redis_client):
+        mock_redis_client.smembers = AsyncMock(return_value={b"a", b"b"})
+        mock_redis_client.mget = AsyncMock(
+            side_effect=lambda keys: [b"7" if k == "refresh:a" else None for k in keys]
+        )
+        mock_redis_client.srem = AsyncMock()
+        assert await list_user_sessions(mock_redis_client, 7) == ["a"]
+        mock_redis_client.srem.assert_called_once_with("user_refresh:7", "b")
+
+    async def test_list_user_sessions_empty(self, mock_redis_client):
+        mock_redis_client.smembers = AsyncMock(return_value=set())
+        assert await list_user_sessions(mock_redis_client, 7) == []
+
+    async def test_revoke_user_sessions(self, mock_redis_client):
+        mock_redis_client.smembers = AsyncMock(return_value={b"a"})
+        assert await revoke_user_sessions(mock_redis_client, 7) == 1
+        mock_redis_client.delete.assert_called_once_with("refresh:a", "user_refresh:7")
+
+
+class TestRevokedTokens:
+    """Test access token revocation"""
+
+    async def test_revoke_token(self, mock_redis_client):
+        pipe = make_pipeline(mock_redis_client)
+        assert await revoke_token(mock_redis_client, "abc", 1100, now=1000) is True
+        pipe.set.assert_called_once_with("revoked:abc", 1100, ex=100)
+        pipe.publish.assert_called_once_with("revoked_tokens", "abc 1100")
+
+    async def test_revoke_expired_token(self, mock_redis_client):
+        pipe = make_pipeline(mock_redis_client)
+        assert await revoke_token(mock_redis_client, "abc", 900, now=1000) is False
+        pipe.execute.assert_not_called()
@@ -1,6 +1,10 @@
+from unittest import mock
+
 import pytest
+from aiohttp.test_utils import make_mocked_request
 
 from helpers.errors import (
+    BadRequest,
     PasswordsDontMatch,
     RecordNotFound,
     RefreshTokenNotFound,
@@ -10,7 +14,12 @@ from helpers.utils import (
     decode_token,
     gen_token_for_user,
     generate_password_hash,
+    get_bool_query_param,
+    get_int_query_param,
     get_refresh_token,
+    get_validator,
+    validate_json,
+    validate_request,
 )
 from schemas.users import schemas
 
@@ -172,3 +181,81 @@ class TestErrors:
         error = RefreshTokenNotFound("Refresh token not found")
         assert str(error) == "Refresh token not found"
         assert isinstance(error, Exception)
+
+
+class TestQueryParams:
+    """Test query string helpers"""
+
+    @staticmethod
+    def make_request(query):
+        from aiohttp.test_utils import make_mocked_request
+
+        return make_mocked_request("GET", f"/auth/v1/users?{query}")
+
+    def test_int_param(self):
+        request = self.make_request("limit=10")
+        assert get_int_query_param(request, "limit") == 10
+        assert get_int_query_param(request, "after", default=3) == 3
+
+    def test_int_param_invalid(self):
+        request = self.make_request("limit=ten")
+        with pytest.raises(BadRequest):
+            get_int_query_param(request, "limit")
+
+    def test_int_param_bounds(self):
+        request = self.make_request("limit=0")
+        with pytest.raises(BadRequest):
+            get_int_query_param(request, "limit", minimum=1)
+        request = self.make_request("limit=5000")
+        with pytest.raises(BadRequest):
+            get_int_query_param(request, "limit", maximum=1000)
+
+    def test_bool_param(self):
+        assert get_bool_query_param(self.make_request("stream=true"), "stream")
+        assert not get_bool_query_param(self.make_request("stream=0"), "stream")
+        assert not get_bool_query_param(self.make_request(""), "stream")
+
+
+class TestRequestValidation:
+    """Test request bodies validated straight from bytes"""
+
+    def test_validate_json(self):
+        body = b'{"email": "user@example.com", "password": "secret"}'
+        validated = validate_json(schemas.login, body)
+        assert validated.email == "user@example.com"
+
+    def test_model_validator_error(self):
+        body = b'{"email": "a@example.com", "password": "a", "password2": "b"}'
+        with pytest.raises(BadRequest, match="body: Value error, passwords do not"):
+            validate_json(schemas.registration, body)
+
+    def test_invalid_json(self):
+        with pytest.raises(BadRequest, match="body: Invalid JSON"):
+            validate_json(schemas.login, b"{")
+
+    def test_nested_location(self):
+        with pytest.raises(BadRequest, match="tokens.1: Input should be"):
+            validate_json(schemas.introspection, b'{"tokens": ["a", 1]}')
+
+    def test_type_adapter_is_cached(self):
+        assert validate_json(list[int], b"[1, 2]") == [1, 2]
+        assert get_validator(list[int]) is get_validator(list[int])
+        assert get_validator(schemas.login) is schemas.login
+
+    async def test_form_body(self):
+        request = mock.MagicMock(content_type="application/x-www-form-urlencoded")
+        request.post = mock.AsyncMock(
+            return_value={"email": "user@example.com", "password": "secret"}
+        )
+        validated = await validate_request(request, schemas.login)
+        assert validated.password == "secret"
+
+    async def test_decoded_body_is_reused(self):
+        request = make_mocked_request(
+            "POST", "/", headers={"Content-Type": "application/json"}
+        )
+        request["data"] = {"email": "user@example.com", "password": "secret"}
+        with mock.patch.object(request, "read", mock.AsyncMock()) as read:
+            validated = await validate_request(request, schemas.login)
+        assert validated.email == "user@example.com"
+        read.assert_not_called()
@@ -0,0 +1,163 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+from backends.redis import cache_user, get_cached_user, invalidate_cached_users
+from backends.user_cache import CachedUser, UserCache, sync_user_cache
+from helpers.errors import RecordNotFound
+from helpers.json_codec import dumps
+from tests.test_redis_backend import make_pipeline
+
+ROW = (7, "a@example.com", "hash", True, False)
+
+
+class TestUserCache:
+    """Test the read-through user cache"""
+
+    @pytest.fixture
+    def cache(self, mock_redis_client):
+        cache = UserCache(mock_redis_client, ttl=60, local_ttl=5)
+        cache.subscribed = True
+        return cache
+
+    async def test_miss_loads_and_caches(self, cache, mock_redis_client):
+        load = mock.AsyncMock(return_value=ROW)
+        with (
+            mock.patch(
+                "backends.user_cache.get_cached_user",
+                mock.AsyncMock(return_value=(None, "3")),
+            ),
+            mock.patch("backends.user_cache.cache_user", mock.AsyncMock()) as store,
+        ):
+            user = await cache.get("a@example.com", load)
+            assert user == CachedUser(*ROW)
+            assert user.password == "hash"
+            store.assert_called_once_with(
+                mock_redis_client, "a@example.com", dumps(user._asdict()), "3", 60
+            )
+            # the second lookup doesn't leave the process
+            assert await cache.get("a@example.com", load) == user
+        load.assert_called_once()
+
+    async def test_redis_hit(self, cache):
+        load = mock.AsyncMock()
+        value = dumps(CachedUser(*ROW)._asdict())
+        with mock.patch(
+            "backends.user_cache.get_cached_user",
+            mock.AsyncMock(return_value=(value, "0")),
+        ):
+            assert await cache.get("a@example.com", load) == CachedUser(*ROW)
+        load.assert_not_called()
+
+    async def test_not_found_is_not_cached(self, cache):
+        load = mock.AsyncMock(side_effect=RecordNotFound("not found"))
+        with mock.patch(
+            "backends.user_cache.get_cached_user",
+            mock.AsyncMock(return_value=(None, "0")),
+        ):
+            with pytest.raises(RecordNotFound):
+                await cache.get("a@example.com", load)
+        assert len(cache.local) == 0
+
+    async def test_redis_failure_uses_database(self, cache):
+        load = mock.AsyncMock(return_value=ROW)
+        with mock.patch(
+            "backends.user_cache.get_cached_user",
+            mock.AsyncMock(side_effect=ConnectionError),
+        ):
+            assert await cache.get("a@example.com", load) == ROW
+        load.assert_called_once()
+
+    async def test_invalidated_during_load_is_not_kept(self, cache):
+        async def load():
+            cache.forget(["a@example.com"])
+            return ROW
+
+        with (
+            mock.patch(
+                "backends.user_cache.get_cached_user",
+                mock.AsyncMock(return_value=(None, "0")),
+            ),
+            mock.patch("backends.user_cache.cache_user", mock.AsyncMock()),
+        ):
+            await cache.get("a@example.com", load)
+        assert len(cache.local) == 0
+
+    async def test_unsubscribed_skips_local_copy(self, cache):
+        cache.subscribed = False
+        with (
+            mock.patch(
+                "backends.user_cache.get_cached_user",
+                mock.AsyncMock(return_value=(None, "0")),
+            ),
+            mock.patch("backends.user_cache.cache_user", mock.AsyncMock()),
+        ):
+            await cache.get("a@example.com", mock.AsyncMock(return_value=ROW))
+        assert len(cache.local) == 0
+
+    async def test_invalidate(self, cache, mock_redis_client):
+        cache.local.set("a@example.com", CachedUser(*ROW))
+        with mock.patch(
+            "backends.user_cache.invalidate_cached_users", mock.AsyncMock()
+        ) as invalidate:
+            await cache.invalidate("a@example.com")
+        assert len(cache.local) == 0
+        invalidate.assert_called_once_with(
+            mock_redis_client, ("a@example.com",), b'["a@example.com"]', 60
+        )
+
+    async def test_sync_drops_invalidated_records(self, cache, mock_redis_client):
+        cache.local.set("a@example.com", CachedUser(*ROW))
+        received = asyncio.Event()
+
+        class PubSub:
+            subscribe = mock.AsyncMock()
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *args):
+                return False
+
+            async def listen(self):
+                yield {"type": "subscribe", "data": 1}
+                cache.local.set("a@example.com", CachedUser(*ROW))
+                yield {"type": "message", "data": b'["a@example.com"]'}
+                received.set()
+                await asyncio.Event().wait()
+
+        mock_redis_client.pubsub = mock.Mock(return_value=PubSub())
+        task = asyncio.create_task(sync_user_cache({"user_cache": cache}))
+        await asyncio.wait_for(received.wait(), 1)
+        assert cache.subscribed
+        assert len(cache.local) == 0
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not cache.subscribed
+
+
+class TestUserCacheRedis:
+    """Test the Redis side of the user cache"""
+
+    async def test_get_cached_user(self, mock_redis_client):
+        mock_redis_client.mget = mock.AsyncMock(return_value=[b"{}", b"2"])
+        assert await get_cached_user(mock_redis_client, "a") == (b"{}", "2")
+        mock_redis_client.mget.assert_called_once_with(["user:a", "user_gen:a"])
+
+    async def test_cache_user_checks_generation(self, mock_redis_client):
+        script = mock.AsyncMock(return_value=1)
+        mock_redis_client.register_script = mock.Mock(return_value=script)
+        await cache_user(mock_redis_client, "a", b"{}", "2", 60)
+        assert script.call_args.kwargs == {
+            "keys": ["user:a", "user_gen:a"],
+            "args": ["2", b"{}", 60],
+        }
+
+    async def test_invalidate_cached_users(self, mock_redis_client):
+        pipe = make_pipeline(mock_redis_client)
+        await invalidate_cached_users(mock_redis_client, ["a", "b"], b"[]", 60)
+        assert pipe.incr.call_count == 2
+        pipe.delete.assert_any_call("user:b")
+        pipe.publish.assert_called_once_with("user_invalidations", b"[]")
@@ -0,0 +1,768 @@
+import json
+from collections import namedtuple
+from datetime import UTC, datetime
+from types import SimpleNamespace
+from unittest import mock
+
+import jwt
+import pytest
+from aiohttp import web
+
+import compatibility_patch  # noqa: F401
+from app.middlewares import setup_middlewares
+from backends.denylist import TokenDenylist
+from backends.email_filter import EmailFilter
+from backends.last_login import LastLoginBuffer
+from backends.user_cache import CachedUser
+from helpers.bloom import BloomFilter
+from helpers.errors import RecordNotFound
+from helpers.utils import gen_token_for_user
+from models.users import PUBLIC_COLUMNS
+from routes.auth import setup_routes
+from views.users import user_etag
+
+
+def make_user(user_id, **kwargs):
+    values = {
+        "id": user_id,
+        "email": f"user{user_id}@example.com",
+        "password": "hash",
+        "is_active": True,
+        "is_superuser": False,
+        "created": datetime(2024, 1, 1, tzinfo=UTC),
+        "last_login": None,
+        "confirmed": False,
+    }
+    values.update(kwargs)
+    return SimpleNamespace(**values)
+
+
+@pytest.fixture
+def app(mock_db_session, mock_redis_client):
+    app = web.Application()
+    setup_routes(app)
+    setup_middlewares(app)
+
+    session_ctx = mock.MagicMock()
+    session_ctx.__aenter__ = mock.AsyncMock(return_value=mock_db_session)
+    session_ctx.__aexit__ = mock.AsyncMock(return_value=False)
+    app["db_session"] = mock.Mock(return_value=session_ctx)
+    app["redis"] = mock_redis_client
+    app["hashing"] = None
+    return app
+
+
+@pytest.fixture
+async def admin_headers():
+    token = await gen_token_for_user(
+        {"id": 1, "email": "admin@example.com", "is_superuser": True}
+    )
+    return {"Authorization": f"Bearer {token['access_token']}"}
+
+
+class TestUserListView:
+    """Test GET /auth/v1/users"""
+
+    async def test_requires_admin(self, aiohttp_client, app):
+        client = await aiohttp_client(app)
+        resp = await client.get("/auth/v1/users")
+        assert resp.status == 401
+
+    async def test_first_page_has_next_link(self, aiohttp_client, app, admin_headers):
+        users = [make_user(i) for i in range(1, 4)]
+        with mock.patch(
+            "views.users.get_objects", mock.AsyncMock(return_value=users)
+        ) as get_objects:
+            client = await aiohttp_client(app)
+            resp = await client.get("/auth/v1/users?limit=2", headers=admin_headers)
+        assert resp.status == 200
+        body = await resp.json()
+        assert [u["id"] for u in body] == [1, 2]
+        assert body[0]["created"] == "2024-01-01T00:00:00+00:00"
+        assert get_objects.call_args.kwargs["after"] is None
+        assert get_objects.call_args.kwargs["limit"] == 3
+        assert resp.headers["Link"] == '</auth/v1/users?limit=2&after=2>; rel="next"'
+
+    async def test_last_page_has_no_link(self, aiohttp_client, app, admin_headers):
+        with mock.patch(
+            "views.users.get_objects", mock.AsyncMock(return_value=[make_user(5)])
+        ) as get_objects:
+            client = await aiohttp_client(app)
+            resp = await client.get(
+                "/auth/v1/users?limit=2&after=4", headers=admin_headers
+            )
+        assert resp.status == 200
+        assert "Link" not in resp.headers
+        assert get_objects.call_args.kwargs["after"] == 4
+        assert get_objects.call_args.kwargs["limit"] == 3
+
+    async def test_invalid_limit(self, aiohttp_client, app, admin_headers):
+        client = await aiohttp_client(app)
+        resp = await client.get("/auth/v1/users?limit=-1", headers=admin_headers)
+        assert resp.status == 400
+
+    async def test_stream(self, aiohttp_client, app, admin_headers):
+        async def rows(*args, **kwargs):
+            for i in range(1, 4):
+                yield make_user(i)
+
+        with mock.patch("views.users.stream_objects", rows):
+            client = await aiohttp_client(app)
+            resp = await client.get("/auth/v1/users?stream=1", headers=admin_headers)
+        assert resp.status == 200
+        body = json.loads(await resp.read())
+        assert [u["id"] for u in body] == [1, 2, 3]
+
+    async def test_stream_empty(self, aiohttp_client, app, admin_headers):
+        async def rows(*args, **kwargs):
+            return
+            yield
+
+        with mock.patch("views.users.stream_objects", rows):
+            client = await aiohttp_client(app)
+            resp = await client.get("/auth/v1/users?stream=1", headers=admin_headers)
+        assert json.loads(await resp.read()) == []
+
+
+def make_row(user_id, **kwargs):
+    user = vars(make_user(user_id, **kwargs))
+    Row = namedtuple("Row", [column.key for column in PUBLIC_COLUMNS])
+    return Row(**{field: user[field] for field in Row._fields})
+
+
+class TestUserExport:
+    """Test GET /auth/v1/users/export"""
+
+    async def test_ndjson_with_filters(self, aiohttp_client, app, admin_headers):
+        calls = []
+
+        async def rows(*args, **kwargs):
+            calls.append(kwargs)
+            for i in range(1, 4):
+                yield make_row(i)
+
+        with mock.patch("views.users.stream_objects", rows):
+            client = await aiohttp_client(app)
+            resp = await client.get(
+                "/auth/v1/users/export?created_after=2024-01-01"
+                "&created_before=2024-02-01T00:00:00Z&is_active=true",
+                headers=admin_headers,
+            )
+        assert resp.status == 200
+        assert resp.content_type == "application/x-ndjson"
+        lines = (await resp.text()).splitlines()
+        assert [json.loads(line)["id"] for line in lines] == [1, 2, 3]
+        filters = [str(f) for f in calls[0]["filters"]]
+        assert filters == [
+            '"user".created >= :created_1',
+            '"user".created < :created_1',
+            '"user".is_active IS true',
+        ]
+
+    async def test_csv(self, aiohttp_client, app, admin_headers):
+        async def rows(*args, **kwargs):
+            yield make_row(1)
+            yield make_row(2, email="b@example.com", is_active=False)
+
+        with mock.patch("views.users.stream_objects", rows):
+            client = await aiohttp_client(app)
+            resp = await client.get(
+                "/auth/v1/users/export?format=csv", headers=admin_headers
+            )
+        assert resp.status == 200
+        assert resp.content_type == "text/csv"
+        assert "users.csv" in resp.headers["Content-Disposition"]
+        lines = (await resp.text()).splitlines()
+        assert (
+            lines[0] == "id,email,is_active,is_superuser,created,last_login,confirmed"
+        )
+        assert (
+            lines[2] == "2,b@example.com,False,False,2024-01-01T00:00:00+00:00,,False"
+        )
+
+    async def test_bad_params(self, aiohttp_client, app, admin_headers):
+        client = await aiohttp_client(app)
+        resp = await client.get(
+            "/auth/v1/users/export?format=xml", headers=admin_headers
+        )
+        assert resp.status == 400
+        resp = await client.get(
+            "/auth/v1/users/export?created_after=yesterday", headers=admin_headers
+        )
+        assert resp.status == 400
+
+
+class TestUserImport:
+    """Test POST /auth/v1/users/import"""
+
+    async def test_per_line_results(self, aiohttp_client, app, admin_headers):
+        body = "\n".join(
+            [
+                json.dumps({"email": "new@example.com", "password": "secret"}),
+                "{not json",
+                "",
+                json.dumps({"email": "old@example.com", "password": "secret"}),
+                json.dumps({"email": "bad-email", "password": "secret"}),
+                json.dumps({"email": "new@example.com", "password": "again"}),
+            ]
+        )
+        with (
+            mock.patch(
+                "views.users.generate_password_hashes",
+                mock.AsyncMock(side_effect=lambda pwds, executor: ["h"] * len(pwds)),
+            ),
+            mock.patch(
+                "views.users.copy_insert_objects",
+                mock.AsyncMock(return_value=[{"id": 5, "email": "new@example.com"}]),
+            ) as copy,
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.post(
+                "/auth/v1/users/import", data=body, headers=admin_headers
+            )
+        assert resp.status == 200
+        assert resp.content_type == "application/x-ndjson"
+        results = [json.loads(line) for line in (await resp.text()).splitlines()]
+        assert [(r["line"], r["status"]) for r in results] == [
+            (1, "created"),
+            (2, "invalid"),
+            (4, "duplicate"),
+            (5, "invalid"),
+            (6, "duplicate"),
+        ]
+        assert results[0]["id"] == 5
+        assert "email" in results[3]["error"]
+        records = copy.call_args.args[3]
+        assert [record[0] for record in records] == [
+            "new@example.com",
+            "old@example.com",
+            "new@example.com",
+        ]
+
+    async def test_requires_admin(self, aiohttp_client, app):
+        client = await aiohttp_client(app)
+        resp = await client.post("/auth/v1/users/import", data="")
+        assert resp.status == 401
+
+
+class TestUserDetailView:
+    """Test /auth/v1/users/{id} with conditional requests"""
+
+    async def test_get_with_etag(self, aiohttp_client, app, admin_headers):
+        row = make_row(7)
+        with mock.patch(
+            "views.users.get_object_by_pk", mock.AsyncMock(return_value=row)
+        ) as get_object:
+            client = await aiohttp_client(app)
+            resp = await client.get("/auth/v1/users/7", headers=admin_headers)
+            assert resp.status == 200
+            assert (await resp.json())["email"] == "user7@example.com"
+            etag = resp.headers["ETag"]
+            assert etag == f'"{user_etag(row)}"'
+
+            resp = await client.get(
+                "/auth/v1/users/7", headers={**admin_headers, "If-None-Match": etag}
+            )
+            assert resp.status == 304
+            assert resp.headers["ETag"] == etag
+        assert get_object.call_args.args[3] == 7
+
+    async def test_get_not_found(self, aiohttp_client, app, admin_headers):
+        with mock.patch(
+            "views.users.get_object_by_pk",
+            mock.AsyncMock(side_effect=RecordNotFound("not found")),
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.get("/auth/v1/users/7", headers=admin_headers)
+        assert resp.status == 404
+
+    async def test_patch_if_match(self, aiohttp_client, app, admin_headers):
+        old = make_row(7)
+        new = make_row(7, email="new@example.com", is_active=False)
+        app["user_cache"] = mock.Mock(invalidate=mock.AsyncMock())
+        with (
+            mock.patch(
+                "views.users.get_object_by_pk", mock.AsyncMock(return_value=old)
+            ),
+            mock.patch(
+                "views.users.update_object_by_pk", mock.AsyncMock(return_value=new)
+            ) as update,
+            mock.patch("views.users.revoke_user_sessions", mock.AsyncMock()) as revoke,
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.patch(
+                "/auth/v1/users/7",
+                json={"email": "new@example.com", "is_active": False},
+                headers={**admin_headers, "If-Match": f'"{user_etag(old)}"'},
+            )
+        assert resp.status == 200
+        assert resp.headers["ETag"] == f'"{user_etag(new)}"'
+        assert update.call_args.args[4] == {
+            "email": "new@example.com",
+            "is_active": False,
+        }
+        assert set(app["user_cache"].invalidate.call_args.args) == {
+            "user7@example.com",
+            "new@example.com",
+        }
+        revoke.assert_called_once_with(app["redis"], 7)
+
+    async def test_patch_email_can_log_in(self, aiohttp_client, app, admin_headers):
+        email_filter = EmailFilter(app["redis"])
+        email_filter.bloom = BloomFilter(1000)
+        email_filter.bloom.add("user7@example.com")
+        app["email_filter"] = email_filter
+        with (
+            mock.patch(
+                "views.users.get_object_by_pk", mock.AsyncMock(return_value=make_row(7))
+            ),
+            mock.patch(
+                "views.users.update_object_by_pk",
+                mock.AsyncMock(return_value=make_row(7, email="new@example.com")),
+            ),
+            mock.patch("backends.email_filter.mark_recent_emails", mock.AsyncMock()),
+            mock.patch(
+                "backends.email_filter.is_recent_email",
+                mock.AsyncMock(return_value=False),
+            ),
+            mock.patch(
+                "views.auth.get_user_by_email",
+                mock.AsyncMock(side_effect=RecordNotFound("not found")),
+            ) as get_user,
+            mock.patch("views.auth.dummy_verify_password", mock.AsyncMock()),
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.patch(
+                "/auth/v1/users/7",
+                json={"email": "new@example.com"},
+                headers={**admin_headers, "If-Match": "*"},
+            )
+            assert resp.status == 200
+            await client.post(
+                "/auth/v1/login",
+                json={"email": "new@example.com", "password": "secret"},
+            )
+        # the new email passes the filter and the login reaches the database
+        get_user.assert_called_once()
+        assert get_user.call_args.args[2] == "new@example.com"
+
+    async def test_cache_failure_after_update_is_raised(
+        self, aiohttp_client, app, admin_headers
+    ):
+        # a deactivated user must not keep logging in from a stale record
+        app["user_cache"] = mock.Mock(
+            invalidate=mock.AsyncMock(side_effect=ConnectionError)
+        )
+        with (
+            mock.patch(
+                "views.users.get_object_by_pk", mock.AsyncMock(return_value=make_row(7))
+            ),
+            mock.patch(
+                "views.users.update_object_by_pk",
+                mock.AsyncMock(return_value=make_row(7, is_active=False)),
+            ),
+            mock.patch("views.users.revoke_user_sessions", mock.AsyncMock()),
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.patch(
+                "/auth/v1/users/7",
+                json={"is_active": False},
+                headers={**admin_headers, "If-Match": "*"},
+            )
+        assert resp.status == 500
+
+    async def test_stale_if_match(self, aiohttp_client, app, admin_headers):
+        with (
+            mock.patch(
+                "views.users.get_object_by_pk", mock.AsyncMock(return_value=make_row(7))
+            ),
+            mock.patch("views.users.update_object_by_pk", mock.AsyncMock()) as update,
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.put(
+                "/auth/v1/users/7",
+                json={
+                    "email": "user7@example.com",
+                    "is_active": True,
+                    "is_superuser": False,
+                    "confirmed": True,
+                },
+                headers={**admin_headers, "If-Match": '"stale"'},
+            )
+        assert resp.status == 412
+        update.assert_not_called()
+
+    async def test_put_requires_all_fields(self, aiohttp_client, app, admin_headers):
+        client = await aiohttp_client(app)
+        resp = await client.put(
+            "/auth/v1/users/7", json={"is_active": True}, headers=admin_headers
+        )
+        assert resp.status == 400
+
+    async def test_delete(self, aiohttp_client, app, admin_headers):
+        with (
+            mock.patch(
+                "views.users.get_object_by_pk", mock.AsyncMock(return_value=make_row(7))
+            ),
+            mock.patch("views.users.delete_object_by_pk", mock.AsyncMock()) as delete,
+            mock.patch("views.users.revoke_user_sessions", mock.AsyncMock()),
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.delete(
+                "/auth/v1/users/7", headers={**admin_headers, "If-Match": "*"}
+            )
+        assert resp.status == 204
+        delete.assert_called_once()
+
+    async def test_requires_admin(self, aiohttp_client, app):
+        client = await aiohttp_client(app)
+        resp = await client.get("/auth/v1/users/7")
+        assert resp.status == 401
+
+
+class TestUserRegister:
+    """Test POST /auth/v1/register"""
+
+    async def test_passwords_dont_match(self, aiohttp_client, app):
+        client = await aiohttp_client(app)
+        resp = await client.post(
+            "/auth/v1/register",
+            json={"email": "a@example.com", "password": "a", "password2": "b"},
+        )
+        assert resp.status == 400
+        assert "passwords do not match" in (await resp.json())["message"]
+        app["db_session"].assert_not_called()
+
+    async def test_cache_failure_after_insert(self, aiohttp_client, app):
+        # nothing can be cached for a new email, the user is created anyway
+        app["user_cache"] = mock.Mock(
+            invalidate=mock.AsyncMock(side_effect=ConnectionError)
+        )
+        with (
+            mock.patch(
+                "views.auth.generate_password_hash", mock.AsyncMock(return_value="hash")
+            ),
+            mock.patch(
+                "views.auth.create_user",
+                mock.AsyncMock(return_value=make_user(7, email="a@example.com")),
+            ),
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.post(
+                "/auth/v1/register",
+                json={
+                    "email": "a@example.com",
+                    "password": "secret",
+                    "password2": "secret",
+                },
+            )
+        assert resp.status == 200
+        assert (await resp.json())["id"] == 7
+        app["user_cache"].invalidate.assert_called_once_with("a@example.com")
+
+    async def test_email_filter_failure_after_insert(self, aiohttp_client, app):
+        # the user is committed, a retry would only get "User already exists"
+        app["redis"].pipeline = mock.Mock(side_effect=ConnectionError)
+        app["email_filter"] = EmailFilter(app["redis"])
+        app["email_filter"].bloom = BloomFilter(1000)
+        with (
+            mock.patch(
+                "views.auth.generate_password_hash", mock.AsyncMock(return_value="hash")
+            ),
+            mock.patch(
+                "views.auth.create_user",
+                mock.AsyncMock(return_value=make_user(7, email="a@example.com")),
+            ),
+        ):
+            client = await aiohttp_client(app)
+            resp = await client.post(
+                "/auth/v1/register",
+                json={
+                    "email": "a@example.com",
+                    "password": "secret",
+                    "password2": "secret",
+                },
+            )
+        assert resp.status == 200
+        assert "a@example.com" in app["email_filter"].bloom
+
+    async def test_invalid_json(self, aiohttp_client, app):
+        client = await aiohttp_client(app)
+        resp = await client.post(
+            "/auth/v1/register",
+            data=b"{",
+            headers={"Content-Type": "application/json"},
+        )
+        assert resp.status == 400
+
+
+class TestUserLogin:
+    """Test POST /auth/v1/login"""
+
+    @staticmethod
+    async def login(client, email):
+        return await client.post(
+            "/auth/v1/login", json={"email": email, "password": "secret"}
+        )
+
+    async def test_filtered_unknown_email_skips_database(self, aiohttp_client, app):
+        app["email_filter"] = mock.Mock(may_exist=mock.AsyncMock(return_value=False))
+        with mock.patch(
+            "views.auth.dummy_verify_password", mock.AsyncMock()
+        ) as dummy_verify:
+            client = await aiohttp_client(app)
+            resp = await self.login(client, "unknown@example.com")
+        assert resp.status == 404
+        app["db_session"].assert_not_called()
+        dummy_verify.assert_called_once_with("secret", None)
+
+    async def test_unknown_email_hashes_like_a_wrong_password(
+        self, aiohttp_client, app
+    ):
+        with (
+            mock.patch(
+                "views.auth.get_user_by_email",
+                mock.AsyncMock(side_effect=RecordNotFound("not found")),
+            ),
+            mock.patch(
+                "views.auth.dummy_verify_password", mock.AsyncMock()
+            ) as dummy_verify,
+        ):
+            client = await aiohttp_client(app)
+            resp = await self.login(client, "unknown@example.com")
+        assert resp.status == 404
+        dummy_verify.assert_called_once_with("secret", None)
+
+    async def test_cached_user_skips_database(self, aiohttp_client, app):
+        user = CachedUser(7, "a@example.com", "hash", False, False)
+        app["user_cache"] = mock.Mock(get=mock.AsyncMock(return_value=user))
+        with mock.patch(
+            "views.auth.verify_password", mock.AsyncMock(return_value=(True, False))
+        ):
+            client = await aiohttp_client(app)
+            resp = await self.login(client, "a@example.com")
+        assert resp.status == 403
+        app["db_session"].assert_not_called()
+
+    async def test_rehash_survives_cache_failure(self, aiohttp_client, app):
+        # the stale cached hash still verifies the same password
+        user = CachedUser(7, "a@example.com", "hash", True, False)
+        app["user_cache"] = mock.Mock(
+            get=mock.AsyncMock(return_value=user),
+            invalidate=mock.AsyncMock(side_effect=ConnectionError),
+        )
+        with (
+            mock.patch(
+                "views.auth.verify_password", mock.AsyncMock(return_value=(True, True))
+            ),
+            mock.patch(
+                "views.auth.generate_password_hash", mock.AsyncMock(return_value="new")
+            ),
+            mock.patch("views.auth.update_object", mock.AsyncMock()) as update,
+            mock.patch("views.auth.store_refresh_session", mock.AsyncMock()),
+        ):
+            client = await aiohttp_client(app)
+            resp = await self.login(client, "a@example.com")
+        assert resp.status == 200
+        assert update.call_args.args[3] == {"password": "new"}
+
+    async def test_records_last_login(self, aiohttp_client, app):
+        user = CachedUser(7, "a@example.com", "hash", True, False)
+        app["user_cache"] = mock.Mock(get=mock.AsyncMock(return_value=user))
+        app["last_login_buffer"] = LastLoginBuffer()
+        with (
+            mock.patch(
+                "views.auth.verify_password", mock.AsyncMock(return_value=(True, False))
+            ),
+            mock.patch("views.auth.store_refresh_session", mock.AsyncMock()),
+        ):
+            client = await aiohttp_client(app)
+            resp = await self.login(client, "a@example.com")
+        assert resp.status == 200
+        assert list(app["last_login_buffer"]._pending) == [7]
+
+
+class TestRefreshToken:
+    """Test POST /auth/v1/refresh"""
+
+    @staticmethod
+    async def refresh(client, token):
+        return await client.post("/auth/v1/refresh", json={"refresh_token": token})
+
+    async def test_rotates_session_atomically(self, aiohttp_client, app):
+        tokens = await gen_token_for_user({"id": 7, "email": "a@example.com"})
+        with mock.patch(
+            "views.auth.rotate_refresh_session", mock.AsyncMock(return_value=1)
+        ) as rotate:
+            client = await aiohttp_client(app)
+            resp = await self.refresh(client, tokens["refresh_token"])
+        assert resp.status == 200
+        body = await resp.json()
+        old = jwt.decode(tokens["refresh_token"], options={"verify_signature": False})
+        new = jwt.decode(body["refresh_token"], options={"verify_signature": False})
+        _, old_jti, new_jti, user_id, family, expire = rotate.call_args.args
+        assert (old_jti, new_jti, user_id) == (old["jti"], new["jti"], 7)
+        assert family == new["fam"] == old["jti"]
+        assert new["exp"] == old["exp"]
+        assert 0 < expire <= new["exp"]
+
+    async def test_reused_token_revokes_family(self, aiohttp_client, app):
+        tokens = await gen_token_for_user({"id": 7, "email": "a@example.com"})
+        with mock.patch(
+            "views.auth.rotate_refresh_session", mock.AsyncMock(return_value=-1)
+        ):
+            client = await aiohttp_client(app)
+            resp = await self.refresh(client, tokens["refresh_token"])
+        assert resp.status == 404
+        assert "RefreshTokenReused" in (await resp.json())["message"]
+
+    async def test_legacy_token_is_migrated(self, aiohttp_client, app):
+        tokens = await gen_token_for_user({"id": 7, "email": "a@example.com"})
+        app["redis"].getdel = mock.AsyncMock(return_value=b"1")
+        with (
+            mock.patch(
+                "views.auth.rotate_refresh_session", mock.AsyncMock(return_value=0)
+            ),
+            mock.patch("views.auth.store_refresh_session", mock.AsyncMock()) as store,
+        ):
+            client = await aiohttp_client(app)
+            resp = await self.refresh(client, tokens["refresh_token"])
+        assert resp.status == 200
+        app["redis"].getdel.assert_called_once_with(tokens["refresh_token"])
+        store.assert_called_once()
+
+    async def test_unknown_token(self, aiohttp_client, app):
+        tokens = await gen_token_for_user({"id": 7, "email": "a@example.com"})
+        app["redis"].getdel = mock.AsyncMock(return_value=None)
+        with mock.patch(
+            "views.auth.rotate_refresh_session", mock.AsyncMock(return_value=0)
+        ):
+            client = await aiohttp_client(app)
+            resp = await self.refresh(client, tokens["refresh_token"])
+        assert resp.status == 404
+
+    async def test_access_token_is_rejected(self, aiohttp_client, app):
+        tokens = await gen_token_for_user({"id": 7, "email": "a@example.com"})
+        app["redis"].get.return_value = b"7"
+        client = await aiohttp_client(app)
+        resp = await self.refresh(client, tokens["access_token"])
+        assert resp.status == 404
+
+    async def test_invalid_token(self, aiohttp_client, app):
+        client = await aiohttp_client(app)
+        resp = await self.refresh(client, "asdf.qwer.zxcv")
+        assert resp.status == 404
+
+
+class TestLogout:
+    """Test POST /auth/v1/logout"""
+
+    async def test_revokes_tokens(self, aiohttp_client, app):
+        tokens = await gen_token_for_user({"id": 7, "email": "a@example.com"})
+        claims = jwt.decode(tokens["access_token"], options={"verify_signature": False})
+        app["token_denylist"] = TokenDenylist()
+        with (
+            mock.patch("views.auth.revoke_token", mock.AsyncMock()) as revoke,
+            mock.patch("views.auth.delete_refresh_session", mock.AsyncMock()) as delete,
+        ):
+            client = await aiohttp_client(app)
+            headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+            resp = await client.post("/auth/v1/logout", headers=headers)
+            assert resp.status == 200
+            revoke.assert_called_once_with(app["redis"], claims["jti"], claims["exp"])
+            delete.assert_called_once_with(app["redis"], claims["jti"], 7)
+            assert claims["jti"] in app["token_denylist"]
+
+            resp = await client.post("/auth/v1/logout", headers=headers)
+            assert resp.status == 403
+
+    async def test_refresh_token_is_rejected(self, aiohttp_client, app):
+        tokens = await gen_token_for_user({"id": 7, "email": "a@example.com"})
+        client = await aiohttp_client(app)
+        resp = await client.post(
+            "/auth/v1/logout",
+            headers={"Authorization": f"Bearer {tokens['refresh_token']}"},
+        )
+        assert resp.status == 400
+
+
+class TestIntrospection:
+    """Test POST /auth/v1/introspect"""
+
+    async def test_batch(self, aiohttp_client, app, admin_headers):
+        live = await gen_token_for_user({"id": 7, "email": "a@example.com"})
+        revoked = await gen_token_for_user({"id": 8, "email": "b@example.com"})
+        app["redis"].mget = mock.AsyncMock(return_value=[b"7", None])
+        tokens = [
+            live["access_token"],
+            live["refresh_token"],
+            "asdf.qwer.zxcv",
+            revoked["refresh_token"],
+        ]
+        client = await aiohttp_client(app)
+        resp = await client.post(
+            "/auth/v1/introspect", json={"tokens": tokens}, headers=admin_headers
+        )
+        assert resp.status == 200
+        results = (await resp.json())["tokens"]
+        assert [r["active"] for r in results] == [True, True, False, False]
+        assert results[0]["token_type"] == "access_token"
+        assert results[1]["user_id"] == 7
+        assert results[3] == {"active": False}
+        refresh_jti = jwt.decode(
+            live["refresh_token"], options={"verify_signature": False}
+        )["jti"]
+        (keys,) = app["redis"].mget.call_args.args
+        assert keys[0] == f"refresh:{refresh_jti}"
+        assert len(keys) == 2
+
+    async def test_requires_admin(self, aiohttp_client, app):
+        tokens = await gen_token_for_user({"id": 7, "email": "a@example.com"})
+        client = await aiohttp_client(app)
+        resp = await client.post(
+            "/auth/v1/introspect",
+            json={"tokens": [tokens["access_token"]]},
+            headers={"Authorization": f"Bearer {tokens['access_token']}"},
+        )
+        assert resp.status == 403
+
+    async def test_empty_list(self, aiohttp_client, app, admin_headers):
+        client = await aiohttp_client(app)
+        resp = await client.post(
+            "/auth/v1/introspect", json={"tokens": []}, headers=admin_headers
+        )
+        assert resp.status == 400
+
+
+class TestJWKS:
+    """Test GET /auth/v1/.well-known/jwks.json"""
+
+    async def test_cacheable_key_set(self, aiohttp_client, app):
+        client = await aiohttp_client(app)
+        resp = await client.get("/auth/v1/.well-known/jwks.json")
+        assert resp.status == 200
+        assert await resp.json() == {"keys": []}
+        assert resp.headers["Cache-Control"].startswith("public, max-age=")
+
+        resp = await client.get(
+            "/auth/v1/.well-known/jwks.json",
+            headers={"If-None-Match": resp.headers["ETag"]},
+        )
+        assert resp.status == 304
+
+
+class TestDatabasePoolStats:
+    """Test GET /auth/v1/stats/db"""
+
+    async def test_pool_stats(self, aiohttp_client, app, admin_headers):
+        app["engine"] = mock.Mock()
+        app["engine"].pool.stats.return_value = {"size": 10, "checked_out": 1}
+        client = await aiohttp_client(app)
+        resp = await client.get("/auth/v1/stats/db", headers=admin_headers)
+        assert resp.status == 200
+        assert await resp.json() == {"size": 10, "checked_out": 1}
+
+    async def test_requires_admin(self, aiohttp_client, app):
+        client = await aiohttp_client(app)
+        resp = await client.get("/auth/v1/stats/db")
+        assert resp.status == 401
@@ -0,0 +1,93 @@
+import signal
+from unittest import mock
+
+from app.workers import Supervisor
+from main import main, parse_args
+
+
+class TestSupervisor:
+    """Test pre-fork worker supervision"""
+
+    def test_restarts_crashed_worker_and_forwards_sigterm(self):
+        supervisor = Supervisor(2, target=mock.Mock(), restart_delay=0)
+        waits = iter([(101, 256), (102, 0), (103, 0)])
+
+        def wait():
+            pid, status = next(waits)
+            if pid == 102:
+                # SIGTERM arrives after the restart
+                supervisor.terminate(signal.SIGTERM, None)
+            return pid, status
+
+        with (
+            mock.patch("os.fork", side_effect=[101, 102, 103]) as fork,
+            mock.patch("os.wait", side_effect=wait),
+            mock.patch("os.kill") as kill,
+            mock.patch("signal.signal"),
+        ):
+            supervisor.run()
+
+        assert fork.call_count == 3
+        kill.assert_has_calls(
+            [mock.call(102, signal.SIGTERM), mock.call(103, signal.SIGTERM)],
+            any_order=True,
+        )
+        assert supervisor.children == {}
+
+    def test_no_restart_while_stopping(self):
+        supervisor = Supervisor(1, target=mock.Mock(), restart_delay=0)
+
+        def wait():
+            supervisor.terminate(signal.SIGTERM, None)
+            return 101, 0
+
+        with (
+            mock.patch("os.fork", return_value=101) as fork,
+            mock.patch("os.wait", side_effect=wait),
+            mock.patch("os.kill"),
+            mock.patch("signal.signal"),
+        ):
+            supervisor.run()
+        fork.assert_called_once()
+
+    def test_crash_loop_is_throttled(self):
+        supervisor = Supervisor(1, target=mock.Mock(), restart_delay=5)
+        waits = iter([(101, 256), (102, 0)])
+
+        def wait():
+            pid, status = next(waits)
+            if pid == 102:
+                supervisor.terminate(signal.SIGTERM, None)
+            return pid, status
+
+        with (
+            mock.patch("os.fork", side_effect=[101, 102]),
+            mock.patch("os.wait", side_effect=wait),
+            mock.patch("os.kill"),
+            mock.patch("signal.signal"),
+            mock.patch("time.sleep") as sleep,
+        ):
+            supervisor.run()
+        sleep.assert_called_once_with(5)
+
+
+class TestMain:
+    """Test server entry point"""
+
+    def test_parse_args(self):
+        assert parse_args(["--workers", "4"]).workers == 4
+        assert parse_args(None).workers == 1
+
+    def test_multiple_workers_use_supervisor(self):
+        with mock.patch("main.Supervisor") as supervisor:
+            main(["--workers", "3"])
+        assert supervisor.call_args.args[0] == 3
+        supervisor.return_value.run.assert_called_once()
+
+    def test_worker_shares_port(self):
+        with mock.patch("main.Supervisor") as supervisor:
+            main(["--workers", "2"])
+        target = supervisor.call_args.args[1]
+        with mock.patch("aiohttp.web.run_app") as run_app:
+            target(1)
+        assert run_app.call_args.kwargs["reuse_port"] is True
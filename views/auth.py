@@ -1,23 +1,38 @@
+from datetime import UTC, datetime
+from uuid import uuid4
+
+import jwt
 from aiohttp import web
-from pydantic import ValidationError as PydanticValidationError
+from aiohttp_jwt import login_required
 
 from app.settings import JWT_EXP_REFRESH_SECONDS
-from backends.db import create_user, get_user_by_email
-from backends.redis import get_redis_key, set_redis_key
+from backends.db import create_user, get_user_by_email, update_object
+from backends.redis import (
+    delete_refresh_session,
+    pop_redis_key,
+    revoke_token,
+    rotate_refresh_session,
+    store_refresh_session,
+)
+from backends.user_cache import try_invalidate_users
 from helpers.errors import (
-    PasswordsDontMatch,
+    BadRequest,
     RecordNotFound,
     RefreshTokenNotFound,
+    RefreshTokenReused,
     UserIsNotActivated,
 )
+from helpers.json_codec import json_response
 from helpers.utils import (
     decode_token,
+    dummy_verify_password,
     gen_token_for_user,
     generate_password_hash,
-    get_data_from_request,
     get_refresh_token,
+    validate_request,
+    verify_password,
 )
-from models.users import User
+from models.users import LOGIN_COLUMNS, User
 from schemas.users import schemas
 
 # Try to import aiohttp_apispec for documentation, but make it optional
@@ -55,36 +70,32 @@ class UserRegister(web.View):
         else lambda f: f
     )
     async def post(self):
-        data = await get_data_from_request(self.request)
-        try:
-            validated_data = schemas.registration(**data)
-        except PydanticValidationError as e:
-            # Convert Pydantic validation errors to a string for error handling
-            error_messages = [f"{err['loc'][0]}: {err['msg']}" for err in e.errors()]
-            error_str = "; ".join(error_messages)
-            raise ValueError(error_str) from e
-
-        if validated_data.password != validated_data.password2:
-            raise PasswordsDontMatch("Fields password and password2 don't match")
+        validated_data = await validate_request(self.request, schemas.registration)
 
         user_data = {
             "email": validated_data.email,
-            "password": await generate_password_hash(validated_data.password),
+            "password": await generate_password_hash(
+                validated_data.password, self.request.app["hashing"]
+            ),
             "is_active": True,
         }
 
         async with self.request.app["db_session"]() as session:
             user = await create_user(session, User, user_data)
 
+        await try_invalidate_users(self.request.app, user.email)
+        if "email_filter" in self.request.app:
+            await self.request.app["email_filter"].add(user.email)
+
         # Convert SQLAlchemy object to dict for JSON response
         response_data = {
             "id": user.id,
             "email": user.email,
             "is_active": user.is_active,
-            "created": user.created.isoformat() if user.created else None,
-            "last_login": user.last_login.isoformat() if user.last_login else None,
+            "created": user.created,
+            "last_login": user.last_login,
         }
-        return web.json_response(response_data, status=200)
+        return json_response(response_data, status=200)
 
 
 class UserLogin(web.View):
@@ -112,21 +123,39 @@ class UserLogin(web.View):
         else lambda f: f
     )
     async def post(self):
-        data = await get_data_from_request(self.request)
-        try:
-            validated_data = schemas.login(**data)
-        except PydanticValidationError as e:
-            # Convert Pydantic validation errors to a string for error handling
-            error_messages = [f"{err['loc'][0]}: {err['msg']}" for err in e.errors()]
-            error_str = "; ".join(error_messages)
-            raise ValueError(error_str) from e
+        validated_data = await validate_request(self.request, schemas.login)
 
-        async with self.request.app["db_session"]() as session:
-            user = await get_user_by_email(session, User, validated_data.email)
+        executor = self.request.app["hashing"]
+        email_filter = self.request.app.get("email_filter")
+        user_cache = self.request.app.get("user_cache")
+
+        async def load_user():
+            async with self.request.app["db_session"]() as session:
+                return await get_user_by_email(
+                    session, User, validated_data.email, columns=LOGIN_COLUMNS
+                )
+
+        try:
+            if email_filter is not None and not await email_filter.may_exist(
+                validated_data.email
+            ):
+                raise RecordNotFound(
+                    f"{User.__name__} with email={validated_data.email} is not found"
+                )
+            if user_cache is not None:
+                user = await user_cache.get(validated_data.email, load_user)
+            else:
+                user = await load_user()
+        except RecordNotFound:
+            # hash anyway, response times must not tell which emails exist
+            await dummy_verify_password(validated_data.password, executor)
+            raise
 
-        password_hash = await generate_password_hash(validated_data.password)
+        valid, must_update = await verify_password(
+            validated_data.password, user.password, executor
+        )
 
-        if user.password != password_hash:
+        if not valid:
             raise RecordNotFound(
                 f"{User.__name__} with email={validated_data.email} is not found"
             )
@@ -143,16 +172,26 @@ class UserLogin(web.View):
                 f"{User.__name__} with email={validated_data.email} is not activated"
             )
 
-        token = await gen_token_for_user(user_dict)
+        if must_update:
+            # stored hash uses outdated parameters, re-encode it with current ones
+            password_hash = await generate_password_hash(
+                validated_data.password, executor
+            )
+            async with self.request.app["db_session"]() as session:
+                await update_object(session, User, user.id, {"password": password_hash})
+            await try_invalidate_users(self.request.app, user.email)
+
+        if "last_login_buffer" in self.request.app:
+            self.request.app["last_login_buffer"].record(user.id)
 
-        await set_redis_key(
-            self.request.app["redis"],
-            token["refresh_token"],
-            "1",
-            JWT_EXP_REFRESH_SECONDS,
+        jti = uuid4().hex
+        token = await gen_token_for_user(user_dict, jti=jti)
+
+        await store_refresh_session(
+            self.request.app["redis"], jti, user.id, int(JWT_EXP_REFRESH_SECONDS)
         )
 
-        return web.json_response(token, status=200)
+        return json_response(token, status=200)
 
 
 class RefreshToken(web.View):
@@ -180,20 +219,71 @@ class RefreshToken(web.View):
         else lambda f: f
     )
     async def post(self):
-        data = await get_data_from_request(self.request)
+        validated_data = await validate_request(self.request, schemas.refresh_token)
+
+        redis_client = self.request.app["redis"]
         try:
-            validated_data = schemas.refresh_token(**data)
-        except PydanticValidationError as e:
-            # Convert Pydantic validation errors to a string for error handling
-            error_messages = [f"{err['loc'][0]}: {err['msg']}" for err in e.errors()]
-            error_str = "; ".join(error_messages)
-            raise ValueError(error_str) from e
-
-        cache = await get_redis_key(
-            self.request.app["redis"], validated_data.refresh_token
-        )
-        if not cache:
+            payload = await decode_token(validated_data.refresh_token)
+        except jwt.InvalidTokenError as e:
+            raise RefreshTokenNotFound("Refresh token not found") from e
+        if payload.get("token_type") != "refresh_token":
             raise RefreshTokenNotFound("Refresh token not found")
-        payload = await decode_token(validated_data.refresh_token)
-        token = await get_refresh_token(payload)
-        return web.json_response(token, status=200)
+
+        jti = uuid4().hex
+        user_id = payload["user_id"]
+        family = payload.get("fam", payload["jti"])
+        expire = max(1, payload["exp"] - int(datetime.now(UTC).timestamp()))
+
+        rotated = await rotate_refresh_session(
+            redis_client, payload["jti"], jti, user_id, family, expire
+        )
+        if rotated == -1:
+            raise RefreshTokenReused(
+                "Refresh token was already used, all tokens issued from it are revoked"
+            )
+        if rotated == 0:
+            # tokens issued before sessions were keyed by jti are stored
+            # under the whole token, accept them once and move them over
+            if not await pop_redis_key(redis_client, validated_data.refresh_token):
+                raise RefreshTokenNotFound("Refresh token not found")
+            await store_refresh_session(
+                redis_client, jti, user_id, expire, family=family
+            )
+
+        token = await get_refresh_token(payload, jti=jti)
+        return json_response(token, status=200)
+
+
+class Logout(web.View):
+    @(
+        docs(
+            tags=["user"],
+            summary="Logout method",
+            description="This method is used to revoke the access token it is "
+            "called with and the refresh session issued together with it",
+            responses={
+                200: {
+                    "description": "tokens revoked",
+                },
+                401: {
+                    "description": "no valid access token",
+                },
+            },
+        )
+        if apispec_available
+        else lambda f: f
+    )
+    @login_required
+    async def post(self):
+        claims = self.request["user"]
+        if claims.get("token_type") != "access_token":
+            raise BadRequest("Logout needs an access token")
+
+        redis_client = self.request.app["redis"]
+        # access and refresh token of one login or refresh share the jti
+        await revoke_token(redis_client, claims["jti"], claims["exp"])
+        await delete_refresh_session(redis_client, claims["jti"], claims["user_id"])
+        if "token_denylist" in self.request.app:
+            self.request.app["token_denylist"].add(claims["jti"], claims["exp"])
+
+        return json_response({"message": "Logged out"}, status=200)
@@ -0,0 +1,42 @@
+import importlib.util
+from pathlib import Path
+
+from aiohttp import web
+
+
+def swagger_ui_static():
+    # Swagger UI assets shipped with aiohttp-apispec, when it is installed
+    spec = importlib.util.find_spec("aiohttp_apispec")
+    if spec is None or spec.origin is None:
+        return None
+    return Path(spec.origin).parent / "static"
+
+
+class OpenAPISpecView(web.View):
+    """Serves the spec file built by scripts/build_openapi.py"""
+
+    async def get(self):
+        cache = self.request.app["docs_cache"]
+        if "spec" not in cache:
+            spec_file = self.request.app["docs_spec_file"]
+            try:
+                cache["spec"] = spec_file.read_bytes()
+            except FileNotFoundError as e:
+                raise web.HTTPNotFound(
+                    reason=f"{spec_file} is missing, build it with "
+                    "python scripts/build_openapi.py"
+                ) from e
+        return web.Response(body=cache["spec"], content_type="application/json")
+
+
+class SwaggerUIView(web.View):
+    async def get(self):
+        cache = self.request.app["docs_cache"]
+        if "index" not in cache:
+            router = self.request.app.router
+            index = (self.request.app["docs_static"] / "index.html").read_text()
+            static = str(router["docs_static"].url_for(filename="index.html"))
+            cache["index"] = index.replace(
+                "{{ path }}", str(router["docs_spec"].url_for())
+            ).replace("{{ static }}", static.rsplit("/", 1)[0])
+        return web.Response(text=cache["index"], content_type="text/html")
@@ -9,3 +9,61 @@ default_parameters = [
         "description": "Authorization HTTP header with JWT access token, like: **Bearer asdf.qwer.zxcv**",
     }
 ]
+
+pagination_parameters = [
+    {
+        "in": "query",
+        "name": "limit",
+        "type": "integer",
+        "required": "false",
+        "description": "Page size, the next page URL is returned in the **Link** header",
+    },
+    {
+        "in": "query",
+        "name": "after",
+        "type": "integer",
+        "required": "false",
+        "description": "Cursor, return users with id greater than this one",
+    },
+    {
+        "in": "query",
+        "name": "stream",
+        "type": "boolean",
+        "required": "false",
+        "description": "Stream all users after the cursor as one JSON array",
+    },
+]
+
+export_parameters = [
+    {
+        "in": "query",
+        "name": "format",
+        "type": "string",
+        "enum": ["ndjson", "csv"],
+        "required": "false",
+        "description": "Export format, **ndjson** (default) or **csv**",
+    },
+    {
+        "in": "query",
+        "name": "created_after",
+        "type": "string",
+        "format": "date-time",
+        "required": "false",
+        "description": "Only users created at or after this ISO 8601 datetime",
+    },
+    {
+        "in": "query",
+        "name": "created_before",
+        "type": "string",
+        "format": "date-time",
+        "required": "false",
+        "description": "Only users created before this ISO 8601 datetime",
+    },
+    {
+        "in": "query",
+        "name": "is_active",
+        "type": "boolean",
+        "required": "false",
+        "description": "Only active or only inactive users",
+    },
+]
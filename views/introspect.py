@@ -0,0 +1,84 @@
+import jwt
+from aiohttp import web
+from aiohttp_jwt import check_permissions, login_required, match_any
+
+from backends.redis import get_refresh_sessions
+from helpers.json_codec import json_response
+from helpers.jwt_keys import keyring
+from helpers.utils import validate_request
+from schemas.users import schemas
+from views.helpers.params import default_parameters
+
+# Try to import aiohttp_apispec for documentation, but make it optional
+try:
+    from aiohttp_apispec import docs
+
+    apispec_available = True
+except ImportError:
+    # Create a mock decorator that does nothing
+    def docs(**kwargs):
+        def decorator(func):
+            return func
+
+        return decorator
+
+    apispec_available = False
+
+# Mock responses if apispec is not available
+if not apispec_available:
+    responses_default = {}
+    response_400 = {}
+else:
+    from views.helpers.responses import response_400, responses_default
+
+
+class TokenIntrospection(web.View):
+    @(
+        docs(
+            tags=["internal"],
+            summary="Batch token introspection method",
+            description="This method is used by gateways to validate many access "
+            "and refresh tokens in one call. Returns the claims of every token "
+            "in request order, with active=false for invalid, expired or "
+            "revoked ones",
+            parameters=default_parameters,
+            responses={**responses_default, **response_400}
+            if apispec_available
+            else {},
+        )
+        if apispec_available
+        else lambda f: f
+    )
+    @login_required
+    @check_permissions(["admin", "introspect"], "scope", comparison=match_any)
+    async def post(self):
+        validated_data = await validate_request(self.request, schemas.introspection)
+
+        denylist = self.request.app.get("token_denylist") or ()
+        results = []
+        for token in validated_data.tokens:
+            try:
+                claims = keyring.decode(token)
+            except jwt.InvalidTokenError:
+                claims = None
+            if claims is None or claims.get("jti") in denylist:
+                results.append({"active": False})
+            else:
+                results.append({"active": True, **claims})
+
+        # refresh tokens are only live while their session exists,
+        # all of them are looked up with one MGET
+        refresh = [
+            result
+            for result in results
+            if result["active"] and result.get("token_type") == "refresh_token"
+        ]
+        sessions = await get_refresh_sessions(
+            self.request.app["redis"], [result["jti"] for result in refresh]
+        )
+        for result, session in zip(refresh, sessions, strict=True):
+            if session is None:
+                result.clear()
+                result["active"] = False
+
+        return json_response({"tokens": results})
@@ -0,0 +1,26 @@
+import hashlib
+
+from aiohttp import web
+
+from app.settings import JWKS_MAX_AGE
+from helpers.json_codec import dumps
+from helpers.jwt_keys import keyring
+
+# the key set only changes with a restart, encode it once
+JWKS_BODY = dumps(keyring.jwks())
+JWKS_ETAG = hashlib.sha256(JWKS_BODY).hexdigest()[:32]
+
+
+class JWKSView(web.View):
+    """Public keys for verifying access tokens without calling this service"""
+
+    async def get(self):
+        headers = {"Cache-Control": f"public, max-age={JWKS_MAX_AGE}"}
+        if any(tag.value == JWKS_ETAG for tag in self.request.if_none_match or ()):
+            response = web.Response(status=304, headers=headers)
+        else:
+            response = web.Response(
+                body=JWKS_BODY, content_type="application/json", headers=headers
+            )
+        response.etag = JWKS_ETAG
+        return response
@@ -0,0 +1,11 @@
+from aiohttp import web
+
+from helpers.metrics import REGISTRY
+
+
+class MetricsView(web.View):
+    async def get(self):
+        return web.Response(
+            text=REGISTRY.render(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
@@ -0,0 +1,46 @@
+from aiohttp import web
+from aiohttp_jwt import check_permissions, login_required, match_any
+
+from backends.db import get_pool_stats
+from helpers.json_codec import json_response
+from views.helpers.params import default_parameters
+
+# Try to import aiohttp_apispec for documentation, but make it optional
+try:
+    from aiohttp_apispec import docs
+
+    apispec_available = True
+except ImportError:
+    # Create a mock decorator that does nothing
+    def docs(**kwargs):
+        def decorator(func):
+            return func
+
+        return decorator
+
+    apispec_available = False
+
+# Mock responses if apispec is not available
+if not apispec_available:
+    responses_default = {}
+else:
+    from views.helpers.responses import responses_default
+
+
+class DatabasePoolStats(web.View):
+    @(
+        docs(
+            tags=["internal"],
+            summary="Database connection pool statistics",
+            description="This method is used to get connection pool occupancy, "
+            "checkout wait time and overflow usage of the serving worker",
+            parameters=default_parameters,
+            responses=responses_default,
+        )
+        if apispec_available
+        else lambda f: f
+    )
+    @login_required
+    @check_permissions("admin", "scope", comparison=match_any)
+    async def get(self):
+        return json_response(get_pool_stats(self.request.app["engine"]))
@@ -1,12 +1,48 @@
+import csv
+import hashlib
+import io
+from datetime import UTC, datetime
+
 from aiohttp import web
+from aiohttp.helpers import ETAG_ANY
 from aiohttp_jwt import check_permissions, login_required, match_any
-from pydantic import ValidationError as PydanticValidationError
 
-from backends.db import get_objects, insert_object
-from helpers.utils import generate_password_hash, get_data_from_request
-from models.users import User
+from app.settings import (
+    DB_STREAM_CHUNK_SIZE,
+    USERS_IMPORT_BATCH_SIZE,
+    USERS_MAX_PAGE_SIZE,
+    USERS_PAGE_SIZE,
+)
+from backends.db import (
+    copy_insert_objects,
+    delete_object_by_pk,
+    get_object_by_pk,
+    get_objects,
+    insert_object,
+    primary_key_statements,
+    stream_objects,
+    update_object_by_pk,
+)
+from backends.redis import revoke_user_sessions
+from backends.user_cache import invalidate_users, try_invalidate_users
+from helpers.errors import BadRequest, PreconditionFailed
+from helpers.json_codec import dumps, json_response
+from helpers.utils import (
+    generate_password_hash,
+    generate_password_hashes,
+    get_bool_query_param,
+    get_datetime_query_param,
+    get_int_query_param,
+    validate_json,
+    validate_request,
+)
+from models.users import PUBLIC_COLUMNS, User
 from schemas.users import schemas
-from views.helpers.params import default_parameters
+from views.helpers.params import (
+    default_parameters,
+    export_parameters,
+    pagination_parameters,
+)
 
 # Try to import aiohttp_apispec for documentation, but make it optional
 try:
@@ -32,13 +68,35 @@ else:
     from views.helpers.responses import response_400, response_404, responses_default
 
 
+# UserDetailView statements, built once instead of on every request
+USER_STATEMENTS = primary_key_statements(User, PUBLIC_COLUMNS)
+
+
+def user_etag(row):
+    # strong validator over the row values, no JSON encoding needed for a 304
+    return hashlib.blake2b(repr(tuple(row)).encode(), digest_size=16).hexdigest()
+
+
+def serialize_user(profile):
+    return {
+        "id": profile.id,
+        "email": profile.email,
+        "is_active": profile.is_active,
+        "is_superuser": profile.is_superuser,
+        "created": profile.created,
+        "last_login": profile.last_login,
+        "confirmed": profile.confirmed,
+    }
+
+
 class UserListView(web.View):
     @(
         docs(
             tags=["admin"],
             summary="Get list of users method",
-            description="This method is used to get all users from db",
-            parameters=default_parameters,
+            description="This method is used to get users from db page by page "
+            "(keyset pagination on id) or streamed as a single JSON array",
+            parameters=default_parameters + pagination_parameters,
             responses=responses_default,
         )
         if apispec_available
@@ -47,23 +105,55 @@ class UserListView(web.View):
     @login_required
     @check_permissions("admin", "scope", comparison=match_any)
     async def get(self):
+        after = get_int_query_param(self.request, "after", minimum=0)
+
+        if get_bool_query_param(self.request, "stream"):
+            limit = get_int_query_param(self.request, "limit", minimum=1)
+            return await self._stream_response(after, limit)
+
+        limit = get_int_query_param(
+            self.request,
+            "limit",
+            default=USERS_PAGE_SIZE,
+            minimum=1,
+            maximum=USERS_MAX_PAGE_SIZE,
+        )
         async with self.request.app["db_session"]() as session:
-            profiles = await get_objects(session, User)
-            result = []
-            for profile in profiles:
-                user_dict = {
-                    "id": profile.id,
-                    "email": profile.email,
-                    "is_active": profile.is_active,
-                    "is_superuser": profile.is_superuser,
-                    "created": profile.created.isoformat() if profile.created else None,
-                    "last_login": profile.last_login.isoformat()
-                    if profile.last_login
-                    else None,
-                    "confirmed": profile.confirmed,
-                }
-                result.append(user_dict)
-            return web.json_response(result)
+            # one extra row tells whether there is a next page
+            profiles = await get_objects(
+                session, User, after=after, limit=limit + 1, columns=PUBLIC_COLUMNS
+            )
+
+        result = [serialize_user(profile) for profile in profiles[:limit]]
+        response = json_response(result)
+        if len(profiles) > limit:
+            next_url = self.request.rel_url.update_query(
+                after=result[-1]["id"], limit=limit
+            )
+            response.headers["Link"] = f'<{next_url}>; rel="next"'
+        return response
+
+    async def _stream_response(self, after, limit):
+        response = web.StreamResponse()
+        response.content_type = "application/json"
+        await response.prepare(self.request)
+
+        separator = b"["
+        async with self.request.app["db_session"]() as session:
+            async for profile in stream_objects(
+                session,
+                User,
+                after=after,
+                limit=limit,
+                columns=PUBLIC_COLUMNS,
+                chunk_size=DB_STREAM_CHUNK_SIZE,
+            ):
+                await response.write(separator + dumps(serialize_user(profile)))
+                separator = b","
+
+        await response.write(b"[]" if separator == b"[" else b"]")
+        await response.write_eof()
+        return response
 
     @(
         docs(
@@ -81,43 +171,247 @@ class UserListView(web.View):
     @login_required
     @check_permissions("admin", "scope", comparison=match_any)
     async def post(self):
+        validated_data = await validate_request(self.request, schemas.user_create)
+        validated_dict = validated_data.model_dump()
+        validated_dict["password"] = await generate_password_hash(
+            validated_dict["password"], self.request.app["hashing"]
+        )
         async with self.request.app["db_session"]() as session:
-            data = await get_data_from_request(self.request)
-            try:
-                validated_data = schemas.user_create(**data)
-            except PydanticValidationError as e:
-                # Convert Pydantic validation errors to a string for error handling
-                error_messages = [
-                    f"{err['loc'][0]}: {err['msg']}" for err in e.errors()
-                ]
-                error_str = "; ".join(error_messages)
-                raise ValueError(error_str) from e
-
-            validated_dict = validated_data.model_dump()
-            validated_dict["password"] = await generate_password_hash(
-                validated_dict["password"]
-            )
             user = await insert_object(session, User, validated_dict)
-            result = {
-                "id": user.id,
-                "email": user.email,
-                "is_active": user.is_active,
-                "is_superuser": user.is_superuser,
-                "created": user.created.isoformat() if user.created else None,
-                "last_login": user.last_login.isoformat() if user.last_login else None,
-                "confirmed": user.confirmed,
+        await try_invalidate_users(self.request.app, user.email)
+        if "email_filter" in self.request.app:
+            await self.request.app["email_filter"].add(user.email)
+        return json_response(serialize_user(user), status=201)
+
+
+EXPORT_FIELDS = tuple(column.key for column in PUBLIC_COLUMNS)
+
+
+def ndjson_chunk(rows):
+    return b"".join(dumps(serialize_user(row)) + b"\n" for row in rows)
+
+
+def csv_chunk(rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        writer.writerow(
+            value.isoformat() if isinstance(value, datetime) else value for value in row
+        )
+    return buffer.getvalue().encode("utf-8")
+
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", ndjson_chunk),
+    "csv": ("text/csv", csv_chunk),
+}
+
+
+class UserExportView(web.View):
+    @(
+        docs(
+            tags=["admin"],
+            summary="Export users method",
+            description="This method is used to stream all users matching the "
+            "filters as NDJSON or CSV",
+            parameters=default_parameters + export_parameters,
+            responses=responses_default,
+        )
+        if apispec_available
+        else lambda f: f
+    )
+    @login_required
+    @check_permissions("admin", "scope", comparison=match_any)
+    async def get(self):
+        export_format = self.request.query.get("format", "ndjson")
+        if export_format not in EXPORT_FORMATS:
+            raise BadRequest(f"format: must be one of {', '.join(EXPORT_FORMATS)}")
+        content_type, encode = EXPORT_FORMATS[export_format]
+
+        filters = []
+        created_after = get_datetime_query_param(self.request, "created_after")
+        if created_after is not None:
+            filters.append(User.created >= created_after)
+        created_before = get_datetime_query_param(self.request, "created_before")
+        if created_before is not None:
+            filters.append(User.created < created_before)
+        is_active = get_bool_query_param(self.request, "is_active", default=None)
+        if is_active is not None:
+            filters.append(User.is_active.is_(is_active))
+
+        response = web.StreamResponse(
+            headers={
+                "Content-Type": content_type,
+                "Content-Disposition": f'attachment; filename="users.{export_format}"',
             }
-            return web.json_response(result, status=201)
+        )
+        await response.prepare(self.request)
+        if export_format == "csv":
+            await response.write(encode([], header=True))
+
+        # one chunk of rows in memory at a time, write() waits for slow clients
+        rows = []
+        async with self.request.app["db_session"]() as session:
+            async for row in stream_objects(
+                session,
+                User,
+                columns=PUBLIC_COLUMNS,
+                chunk_size=DB_STREAM_CHUNK_SIZE,
+                filters=filters,
+            ):
+                rows.append(row)
+                if len(rows) >= DB_STREAM_CHUNK_SIZE:
+                    await response.write(encode(rows))
+                    rows = []
+            if rows:
+                await response.write(encode(rows))
+
+        await response.write_eof()
+        return response
+
+
+IMPORT_COLUMNS = (
+    "email",
+    "password",
+    "is_active",
+    "is_superuser",
+    "confirmed",
+    "created",
+    "last_login",
+)
+
+
+class UserImportView(web.View):
+    @(
+        docs(
+            tags=["admin"],
+            summary="Bulk user import method",
+            description="This method is used to create users from an NDJSON body, "
+            "one user object per line. Responds with an NDJSON stream of "
+            "per-line results: created, duplicate or invalid",
+        )
+        if apispec_available
+        else lambda f: f
+    )
+    @login_required
+    @check_permissions("admin", "scope", comparison=match_any)
+    async def post(self):
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(self.request)
+
+        batch = []
+        lineno = 0
+        async for line in self.request.content:
+            lineno += 1
+            if not line.strip():
+                continue
+            batch.append((lineno, line))
+            if len(batch) >= USERS_IMPORT_BATCH_SIZE:
+                await self.import_batch(batch, response)
+                batch = []
+        if batch:
+            await self.import_batch(batch, response)
+
+        await response.write_eof()
+        return response
+
+    async def import_batch(self, batch, response):
+        results = {}
+        valid = []
+        for lineno, line in batch:
+            try:
+                user = validate_json(schemas.user_create, line)
+            except BadRequest as e:
+                results[lineno] = {"line": lineno, "status": "invalid", "error": str(e)}
+            else:
+                valid.append((lineno, user))
+
+        if valid:
+            hashes = await generate_password_hashes(
+                [user.password for _, user in valid], self.request.app["hashing"]
+            )
+            now = datetime.now(UTC)
+            records = [
+                (
+                    user.email,
+                    password_hash,
+                    user.is_active,
+                    user.is_superuser,
+                    user.confirmed,
+                    user.created or now,
+                    user.last_login,
+                )
+                for (_, user), password_hash in zip(valid, hashes, strict=True)
+            ]
+            async with self.request.app["db_session"]() as session:
+                rows = await copy_insert_objects(
+                    session,
+                    User,
+                    IMPORT_COLUMNS,
+                    records,
+                    conflict="email",
+                    returning=("id", "email"),
+                )
+            created = {row["email"]: row["id"] for row in rows}
+            await try_invalidate_users(self.request.app, *created)
+
+            if created and "email_filter" in self.request.app:
+                await self.request.app["email_filter"].add(*created)
+
+            for lineno, user in valid:
+                # a repeated email within the batch is a duplicate of the first one
+                user_id = created.pop(user.email, None)
+                results[lineno] = {
+                    "line": lineno,
+                    "status": "duplicate" if user_id is None else "created",
+                    "email": user.email,
+                }
+                if user_id is not None:
+                    results[lineno]["id"] = user_id
+
+        await response.write(
+            b"".join(dumps(results[n]) + b"\n" for n in sorted(results))
+        )
 
 
 class UserDetailView(web.View):
+    """User by id with strong ETags, ``If-Match`` guards every write"""
+
+    def get_user_id(self):
+        try:
+            return int(self.request.match_info["id"])
+        except ValueError as e:
+            raise BadRequest("id: must be an integer") from e
+
+    def check_if_match(self, row):
+        # strong comparison, weak tags never match
+        if_match = self.request.if_match
+        if if_match is not None and not any(
+            not tag.is_weak and tag.value in (user_etag(row), ETAG_ANY)
+            for tag in if_match
+        ):
+            raise PreconditionFailed(
+                f"{User.__name__} with id={row.id} was modified since it was read"
+            )
+
+    @staticmethod
+    def user_response(row):
+        response = json_response(serialize_user(row), status=200)
+        response.etag = user_etag(row)
+        return response
+
     @(
         docs(
             tags=["admin"],
             summary="Get user by id method",
-            description="This method is used to get user details by id",
+            description="This method is used to get user details by id, "
+            "responds 304 when If-None-Match has the current ETag",
             parameters=default_parameters,
-            responses=responses_default if apispec_available else {},
+            responses={**responses_default, **response_404}
+            if apispec_available
+            else {},
         )
         if apispec_available
         else lambda f: f
@@ -125,13 +419,52 @@ class UserDetailView(web.View):
     @login_required
     @check_permissions("admin", "scope", comparison=match_any)
     async def get(self):
-        return web.json_response({}, status=200)
+        user_id = self.get_user_id()
+        async with self.request.app["db_session"]() as session:
+            row = await get_object_by_pk(session, User, USER_STATEMENTS.select, user_id)
+
+        etag = user_etag(row)
+        if any(
+            tag.value in (etag, ETAG_ANY) for tag in self.request.if_none_match or ()
+        ):
+            response = web.Response(status=304)
+            response.etag = etag
+            return response
+        return self.user_response(row)
+
+    async def update_user(self, validated_data, partial):
+        values = validated_data.model_dump(exclude_unset=partial, exclude_none=True)
+        if not values:
+            raise BadRequest("Nothing to update")
+        if "password" in values:
+            # hashed before the row is locked
+            values["password"] = await generate_password_hash(
+                values["password"], self.request.app["hashing"]
+            )
+
+        user_id = self.get_user_id()
+        async with self.request.app["db_session"]() as session:
+            old = await get_object_by_pk(
+                session, User, USER_STATEMENTS.select_for_update, user_id
+            )
+            self.check_if_match(old)
+            user = await update_object_by_pk(
+                session, User, USER_STATEMENTS.update, user_id, values
+            )
+
+        await invalidate_users(self.request.app, *{old.email, user.email})
+        if user.email != old.email and "email_filter" in self.request.app:
+            await self.request.app["email_filter"].add(user.email)
+        if old.is_active and not user.is_active:
+            await revoke_user_sessions(self.request.app["redis"], user_id)
+        return self.user_response(user)
 
     @(
         docs(
             tags=["admin"],
             summary="Update all user details by id method",
-            description="This method is used to update all user details by id",
+            description="This method is used to update all user details by id, "
+            "responds 412 when If-Match doesn't have the current ETag",
             parameters=default_parameters,
             responses={**responses_default, **response_400, **response_404}
             if apispec_available
@@ -143,13 +476,15 @@ class UserDetailView(web.View):
     @login_required
     @check_permissions("admin", "scope", comparison=match_any)
     async def put(self):
-        return web.json_response({}, status=200)
+        validated_data = await validate_request(self.request, schemas.user_update)
+        return await self.update_user(validated_data, partial=False)
 
     @(
         docs(
             tags=["admin"],
             summary="Update user details partially by id method",
-            description="This method is used to update particular user details by id",
+            description="This method is used to update particular user details by "
+            "id, responds 412 when If-Match doesn't have the current ETag",
             parameters=default_parameters,
             responses={**responses_default, **response_400, **response_404}
             if apispec_available
@@ -161,15 +496,19 @@ class UserDetailView(web.View):
     @login_required
     @check_permissions("admin", "scope", comparison=match_any)
     async def patch(self):
-        return web.json_response({}, status=200)
+        validated_data = await validate_request(self.request, schemas.user_patch)
+        return await self.update_user(validated_data, partial=True)
 
     @(
         docs(
             tags=["admin"],
             summary="Delete user by id method",
-            description="This method is used to delete user by id",
+            description="This method is used to delete user by id, "
+            "responds 412 when If-Match doesn't have the current ETag",
             parameters=default_parameters,
-            responses=responses_default if apispec_available else {},
+            responses={**responses_default, **response_404}
+            if apispec_available
+            else {},
         )
         if apispec_available
         else lambda f: f
@@ -177,4 +516,14 @@ class UserDetailView(web.View):
     @login_required
     @check_permissions("admin", "scope", comparison=match_any)
     async def delete(self):
-        return web.json_response({}, status=200)
+        user_id = self.get_user_id()
+        async with self.request.app["db_session"]() as session:
+            old = await get_object_by_pk(
+                session, User, USER_STATEMENTS.select_for_update, user_id
+            )
+            self.check_if_match(old)
+            await delete_object_by_pk(session, User, USER_STATEMENTS.delete, user_id)
+
+        await invalidate_users(self.request.app, old.email)
+        await revoke_user_sessions(self.request.app["redis"], user_id)
+        return web.Response(status=204)